@@ -3,17 +3,34 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, font
 import os
 import threading
+import time
 import platform
 from pathlib import Path
 import sys
-import datetime
 import subprocess
 import webbrowser
 
 # Import custom modules
 import config
 import utils
+import parallel_scan
 import about_window
+import diagnostics_window
+import snapshot
+import snapshot_window
+import scan_file
+import scan_file_window
+import largest_items
+import largest_window
+import treemap_view
+import scan_metrics
+import scan_options
+import scanner
+import size_index
+import memory_cache
+import ui_pump
+import virtual_view
+import content_model
 
 class FolderExplorerApp:
     def __init__(self, root):
@@ -44,14 +61,46 @@ class FolderExplorerApp:
              self.history = [config.INITIAL_DIR]
         self.view_style = tk.StringVar(value="Details")
         self._threads_lock = threading.Lock()
-        self._calculation_threads = {}
+        self._pending_calculations = set()
+        self._view_cancel_token = scanner.CancellationToken() # Replaced (and cancelled) on every navigation
+        self._scan_scheduler = scanner.ScanScheduler(config.SCAN_MAX_WORKERS)
+        # Directory listings get their own small pool so they never queue behind size walks
+        self._listing_scheduler = scanner.ScanScheduler(max_workers=2)
+        self._listing_state = None # Progress of the listing currently being streamed in
+        # Completed subtree walks keyed by the folder they started from. Any descendant's size
+        # can be answered from these without another walk. Bounded by total node count.
+        self._scan_trees = memory_cache.LRUCache(config.SIZE_CACHE_MAX_NODES, weight_func=len, name="Folder sizes")
+        # Every walk also collects its folder's largest items (see _walk_folder), so the Largest Items
+        # window can reuse it: finished walks by the same key as _scan_trees, running ones by
+        # (options key, folder), and the cancel token of the window watching a running one
+        self._walked_largest = {}
+        self._running_largest = {}
+        self._largest_watchers = {}
+        # Recent directory listings keyed by path, bounded by total number of entries
+        self._listing_cache = memory_cache.LRUCache(config.LISTING_CACHE_MAX_ENTRIES, weight_func=lambda listing: len(listing[1]) + 1, name="Listings")
+        self._size_index = size_index.open_default_index() # None if disabled/unavailable
+        # Navigation tree nodes are listed and probed for subfolders off the main thread. Subfolder
+        # names per directory and "has subfolders" answers per directory are cached by mtime.
+        self._nav_scheduler = scanner.ScanScheduler(max_workers=2)
+        self._nav_cancel_token = scanner.CancellationToken() # Replaced (and cancelled) when the tree is rebuilt
+        self._nav_loading = set() # Nodes whose subfolders are being listed
+        self._nav_children_cache = memory_cache.LRUCache(config.NAV_CACHE_MAX_ENTRIES, weight_func=lambda listing: len(listing[1]) + 1, name="Navigation tree")
+        self._nav_probe_cache = memory_cache.LRUCache(config.NAV_PROBE_CACHE_MAX_ENTRIES, name="Subfolder probes")
+        # Cost of every folder size job, for the diagnostics window
+        self._scan_metrics = scan_metrics.MetricsLog()
+        self._profile_scans = config.SCAN_PROFILE_ENABLED # Read by scan workers; mirrors profile_scans_var
+        self._scan_options = scan_options.ScanOptions() # Replaced (never mutated) when the size mode changes
         # ** Default sort by the new 'name' column **
         self._tree_sort_column = "name"
         self._tree_sort_reverse = False
         self.status_var = tk.StringVar(value=config.STATUS_READY)
 
+        # All results from scan workers reach the UI through this one batched channel
+        self._ui_pump = ui_pump.UIUpdatePump(self.root)
+
         # --- GUI Setup ---
         self.setup_ui()
+        self._ui_pump.start()
 
         # --- Initial View and Load ---
         self.switch_content_view() # Place the initial view (Details)
@@ -61,6 +110,31 @@ class FolderExplorerApp:
 
     def setup_ui(self):
         """Creates and arranges the widgets."""
+        # --- Menu Bar ---
+        menu_bar = tk.Menu(self.root)
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="Cache Statistics...", command=self.show_cache_statistics)
+        tools_menu.add_command(label="Clear Size Index...", command=self.clear_size_index)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Scan Diagnostics...", command=self.show_scan_diagnostics)
+        self.profile_scans_var = tk.BooleanVar(value=self._profile_scans)
+        tools_menu.add_checkbutton(label="Profile Scans", variable=self.profile_scans_var,
+                                   command=lambda: setattr(self, "_profile_scans", self.profile_scans_var.get()))
+        tools_menu.add_separator()
+        tools_menu.add_command(label="Largest Items in This Folder...", command=self.show_largest_items)
+        tools_menu.add_command(label="Save Snapshot of This Folder...", command=self.save_snapshot)
+        tools_menu.add_command(label="Compare Snapshots...", command=self.compare_snapshots)
+        tools_menu.add_command(label="Save Scan File of This Folder...", command=self.save_scan_file)
+        tools_menu.add_command(label="Open Scan File...", command=self.open_scan_file)
+        tools_menu.add_separator()
+        self.size_mode_var = tk.StringVar(value=self._scan_options.size_mode)
+        tools_menu.add_radiobutton(label="Apparent Size", value=scan_options.SIZE_MODE_APPARENT, variable=self.size_mode_var, command=self.on_scan_options_change)
+        tools_menu.add_radiobutton(label="Disk Usage", value=scan_options.SIZE_MODE_DISK, variable=self.size_mode_var, command=self.on_scan_options_change)
+        self.one_file_system_var = tk.BooleanVar(value=self._scan_options.one_file_system)
+        tools_menu.add_checkbutton(label="Stay on One File System", variable=self.one_file_system_var, command=self.on_scan_options_change)
+        menu_bar.add_cascade(label="Tools", menu=tools_menu)
+        self.root.config(menu=menu_bar)
+
         # --- Top Frame ---
         top_frame = ttk.Frame(self.root, padding="5")
         top_frame.pack(side=tk.TOP, fill=tk.X)
@@ -77,7 +151,7 @@ class FolderExplorerApp:
         self.path_entry.bind("<FocusOut>", lambda e: self.current_path.set(self.history[-1] if self.history else config.INITIAL_DIR))
         view_label = ttk.Label(top_frame, text="View:")
         view_label.pack(side=tk.LEFT, padx=(0, 5))
-        view_options = ["Details", "List"]
+        view_options = ["Details", "List", "Treemap"]
         view_combo = ttk.Combobox(top_frame, textvariable=self.view_style, values=view_options, state="readonly", width=10)
         view_combo.pack(side=tk.LEFT, padx=(0, 5))
         view_combo.bind("<<ComboboxSelected>>", self.on_view_style_change)
@@ -111,15 +185,21 @@ class FolderExplorerApp:
         self.content_frame.grid_columnconfigure(0, weight=1)
 
         # --- Status Bar ---
-        status_bar = ttk.Label(self.root, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W, padding="2")
-        status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        status_frame = ttk.Frame(self.root)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        status_bar = ttk.Label(status_frame, textvariable=self.status_var, relief=tk.SUNKEN, anchor=tk.W, padding="2")
+        status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        diagnostics_button = ttk.Button(status_frame, text="Diagnostics", command=self.show_scan_diagnostics)
+        diagnostics_button.pack(side=tk.RIGHT)
 
 
     def create_content_widgets(self):
         """Creates the widgets for the different view styles in the content panel."""
         # --- Details View Widget ---
         # ** Use updated columns from config, which now includes 'name' **
-        self.details_tree = ttk.Treeview(self.content_frame, columns=config.TREEVIEW_COLUMNS_DETAILS, show="headings")
+        # Virtualized: only the rows on screen exist as Tk items, the rest live in details_view.model
+        self.details_view = virtual_view.VirtualTreeview(self.content_frame, config.TREEVIEW_COLUMNS_DETAILS)
+        self.details_tree = self.details_view.tree
 
         # ** Configure Headings and Columns based on config for Details view **
         for col in config.TREEVIEW_COLUMNS_DETAILS:
@@ -136,7 +216,8 @@ class FolderExplorerApp:
 
         # --- List View Widget ---
         # ** Use updated columns from config, which now includes 'name' **
-        self.list_tree = ttk.Treeview(self.content_frame, columns=config.TREEVIEW_COLUMNS_LIST, show="headings")
+        self.list_view = virtual_view.VirtualTreeview(self.content_frame, config.TREEVIEW_COLUMNS_LIST)
+        self.list_tree = self.list_view.tree
 
         # ** Configure Headings and Columns based on config for List view **
         for col in config.TREEVIEW_COLUMNS_LIST:
@@ -151,8 +232,11 @@ class FolderExplorerApp:
             self.list_tree.heading(col, text=text, anchor=anchor_tk, command=lambda c=col: self.sort_content_column(c, False))
             self.list_tree.column(col, width=width, stretch=stretch_tk, anchor=anchor_tk)
 
-        # --- Scrollbars (Common for content views) ---
-        self.content_vsb = ttk.Scrollbar(self.content_frame, orient="vertical")
+        # --- Treemap View Widget ---
+        # Layouts are computed on the listing workers, clicks drill down like a double-click
+        self.treemap_view = treemap_view.TreemapView(self.content_frame, self._listing_scheduler, self._ui_pump, on_open_folder=self.open_folder)
+
+        # --- Horizontal Scrollbar (Common for content views; each view owns its vertical one) ---
         self.content_hsb = ttk.Scrollbar(self.content_frame, orient="horizontal")
 
         # --- Bindings ---
@@ -162,23 +246,25 @@ class FolderExplorerApp:
 
     def switch_content_view(self):
         """Hides old view, shows and configures the new view based on self.view_style."""
-        self.details_tree.grid_forget()
-        self.list_tree.grid_forget()
-        self.content_vsb.grid_forget()
+        self.details_view.grid_forget()
+        self.list_view.grid_forget()
+        self.treemap_view.grid_forget()
         self.content_hsb.grid_forget()
 
+        if self.view_style.get() == "Treemap":
+            self.treemap_view.grid(row=0, column=0, sticky='nsew')
+            return
+
         current_view_widget = None
         if self.view_style.get() == "Details":
-            current_view_widget = self.details_tree
+            current_view_widget = self.details_view
         elif self.view_style.get() == "List":
-            current_view_widget = self.list_tree
+            current_view_widget = self.list_view
 
         if current_view_widget:
-            self.content_vsb.config(command=current_view_widget.yview)
-            self.content_hsb.config(command=current_view_widget.xview)
-            current_view_widget.configure(yscrollcommand=self.content_vsb.set, xscrollcommand=self.content_hsb.set)
+            self.content_hsb.config(command=current_view_widget.tree.xview)
+            current_view_widget.tree.configure(xscrollcommand=self.content_hsb.set)
             current_view_widget.grid(row=0, column=0, sticky='nsew')
-            self.content_vsb.grid(row=0, column=1, sticky='ns')
             self.content_hsb.grid(row=1, column=0, sticky='ew')
         else:
              messagebox.showinfo("View Error", f"Selected view '{self.view_style.get()}' is not available.")
@@ -190,6 +276,14 @@ class FolderExplorerApp:
         self.load_directory_content(self.current_path.get(), update_history=False, force_reload=True)
 
 
+    def on_scan_options_change(self):
+        """Called when the size mode or file system option changes in Tools; reloads the view with sizes under the new options."""
+        new_options = self._scan_options.replace(size_mode=self.size_mode_var.get(), one_file_system=self.one_file_system_var.get())
+        if new_options.key() == self._scan_options.key(): return
+        self._scan_options = new_options
+        self.load_directory_content(self.current_path.get(), update_history=False, force_reload=True)
+
+
     # --- Navigation Methods --- (No changes needed in navigate_from_entry, browse_directory, go_back, go_up, update_nav_buttons_state)
     def navigate_from_entry(self, event=None):
         """Attempts to navigate to the path entered in the path entry."""
@@ -271,86 +365,130 @@ class FolderExplorerApp:
         self.up_button.config(state=tk.NORMAL if can_go_up else tk.DISABLED)
 
 
-    # --- Navigation Tree Methods --- (No changes needed in populate_nav_tree, insert_dummy_nav_child, on_nav_tree_expand, on_nav_tree_select, select_nav_tree_item)
-    def populate_nav_tree(self, parent_id="", parent_path=None):
-        """Populates the navigation tree with directories. If parent_path is None, populates roots."""
-        target_node = parent_id if parent_id else ""
-        if parent_id:
-            try:
-                children = self.nav_tree.get_children(parent_id)
-                for child_id in children:
-                    try:
-                        if self.nav_tree.exists(child_id):
-                           item_text = self.nav_tree.item(child_id, 'text')
-                           if item_text == config.DUMMY_NODE_TEXT:
-                               self.nav_tree.delete(child_id)
-                    except tk.TclError: continue
-            except tk.TclError as e: print(f"Error getting children for nav node {parent_id}: {e}"); return
-
-        path_to_list = parent_path
-        if path_to_list is None:
-            try:
-                for item in self.nav_tree.get_children(): self.nav_tree.delete(item)
-            except tk.TclError as e: print(f"Error clearing nav tree: {e}")
-            root_items = []
-            if platform.system() == "Windows":
-                drives = [f"{chr(c)}:\\" for c in range(ord('A'), ord('Z') + 1) if Path(f"{chr(c)}:\\").exists()]
-                for drive in drives:
-                     try: res_drive = str(Path(drive).resolve()); root_items.append({'text': drive, 'iid': res_drive})
-                     except Exception as e: print(f"Error resolving drive {drive}: {e}")
-            else: # Linux/macOS
-                try: home_dir = str(Path.home().resolve()); root_items.append({'text': "~ Home", 'iid': home_dir})
-                except Exception as e: print(f"Error adding home directory: {e}")
-                try: root_dir = "/"; root_items.append({'text': "/ Root", 'iid': root_dir})
-                except Exception as e: print(f"Error adding root directory: {e}")
-                for place in ["/media", "/mnt"]:
-                    try:
-                        p_path = Path(place)
-                        if p_path.is_dir(): res_place = str(p_path.resolve()); root_items.append({'text': p_path.name, 'iid': res_place})
-                    except Exception as e: print(f"Error adding common place {place}: {e}")
-            for item in root_items:
-                try: node_id = self.nav_tree.insert(target_node, "end", text=item['text'], iid=item['iid'], open=False); self.insert_dummy_nav_child(node_id, item['iid'])
-                except Exception as e: print(f"Error inserting nav root {item['text']}: {e}")
-            return # End of initial population
-
-        # --- Expanding an existing node ---
+    # --- Navigation Tree Methods ---
+    def populate_nav_tree(self):
+        """Rebuilds the navigation tree with its root places. Subfolders are filled in when a node is expanded."""
+        with self._threads_lock:
+            self._nav_cancel_token.cancel()
+            self._nav_cancel_token = scanner.CancellationToken()
+        self._nav_loading.clear()
         try:
-            path_obj = Path(path_to_list)
-            if not path_obj.is_dir(): print(f"Error: Cannot expand nav node, path is not a directory: {path_to_list}"); return
-            subdirs = []
-            try:
-                with os.scandir(path_obj) as it:
-                    for entry in it:
-                        try:
-                            if entry.is_dir(follow_symlinks=False): subdirs.append({'name': entry.name, 'path': entry.path})
-                        except OSError: continue
-            except OSError as e: print(f"Error scanning directory for nav expansion {path_obj}: {e}"); return
-            subdirs.sort(key=lambda x: x['name'].lower())
-            for subdir in subdirs:
+            for item in self.nav_tree.get_children(): self.nav_tree.delete(item)
+        except tk.TclError as e: print(f"Error clearing nav tree: {e}")
+        root_items = []
+        if platform.system() == "Windows":
+            drives = [f"{chr(c)}:\\" for c in range(ord('A'), ord('Z') + 1) if Path(f"{chr(c)}:\\").exists()]
+            for drive in drives:
+                 try: res_drive = str(Path(drive).resolve()); root_items.append({'text': drive, 'iid': res_drive})
+                 except Exception as e: print(f"Error resolving drive {drive}: {e}")
+        else: # Linux/macOS
+            try: home_dir = str(Path.home().resolve()); root_items.append({'text': "~ Home", 'iid': home_dir})
+            except Exception as e: print(f"Error adding home directory: {e}")
+            try: root_dir = "/"; root_items.append({'text': "/ Root", 'iid': root_dir})
+            except Exception as e: print(f"Error adding root directory: {e}")
+            for place in ["/media", "/mnt"]:
                 try:
-                    res_path = str(Path(subdir['path']).resolve())
-                    if not self.nav_tree.exists(res_path):
-                         node_id = self.nav_tree.insert(parent_id, "end", text=subdir['name'], iid=res_path, open=False)
-                         self.insert_dummy_nav_child(node_id, res_path)
-                except Exception as e: print(f"Skipping nav item insert for {subdir['name']} under {parent_id}: {e}")
-        except Exception as e: print(f"Error expanding navigation tree node {path_to_list}: {e}")
-
-    def insert_dummy_nav_child(self, node_id, path):
-        """Inserts a dummy '...' node if the directory at 'path' contains subdirectories."""
-        try:
-            if not self.nav_tree.exists(node_id): return
-            if self.nav_tree.get_children(node_id): return
-            path_obj = Path(path)
-            has_subdirs = False
+                    p_path = Path(place)
+                    if p_path.is_dir(): res_place = str(p_path.resolve()); root_items.append({'text': p_path.name, 'iid': res_place})
+                except Exception as e: print(f"Error adding common place {place}: {e}")
+        inserted = []
+        for item in root_items:
+            try: inserted.append(self.nav_tree.insert("", "end", text=item['text'], iid=item['iid'], open=False))
+            except Exception as e: print(f"Error inserting nav root {item['text']}: {e}")
+        cancel_token = self._nav_cancel_token
+        self._nav_scheduler.submit(self._probe_nav_children, inserted, cancel_token, cancel_token=cancel_token)
+
+    def expand_nav_node(self, node_id):
+        """Replaces the dummy child of node_id with its subfolders, which are listed in the background."""
+        if node_id in self._nav_loading: return
+        self._nav_loading.add(node_id)
+        cancel_token = self._nav_cancel_token
+        self._nav_scheduler.submit(self._produce_nav_children, node_id, cancel_token, cancel_token=cancel_token)
+
+    def _produce_nav_children(self, parent_path, cancel_token):
+        """
+        (Nav Worker) Lists the subfolders of parent_path, from the caches if the folder is unchanged,
+        streams them to the main thread in chunks, then probes each of them for subfolders.
+        """
+        try: dir_mtime_ns = os.stat(parent_path).st_mtime_ns
+        except OSError: dir_mtime_ns = None
+        names = self._cached_subfolder_names(parent_path, dir_mtime_ns)
+        if names is None:
+            try: names = utils.list_subdirectories(parent_path, cancel_token)
+            except OSError as e:
+                print(f"Error scanning directory for nav expansion {parent_path}: {e}")
+                names = []
+            else:
+                if dir_mtime_ns is not None: self._nav_children_cache.put(parent_path, (dir_mtime_ns, names))
+        for start in range(0, len(names), config.LISTING_CHUNK_SIZE):
+            self._ui_pump.post(self._on_nav_children, cancel_token, parent_path, names[start:start + config.LISTING_CHUNK_SIZE])
+        self._ui_pump.post(self._on_nav_children_done, cancel_token, parent_path)
+        self._probe_nav_children([os.path.join(parent_path, name) for name in names], cancel_token)
+
+    def _cached_subfolder_names(self, folder_path, dir_mtime_ns):
+        """(Any Thread) Sorted subfolder names of folder_path from the nav cache or a cached content listing, or None."""
+        if dir_mtime_ns is None: return None
+        is_current = lambda listing: listing[0] == dir_mtime_ns
+        cached = self._nav_children_cache.get(folder_path, is_current)
+        if cached is not None: return cached[1]
+        # A folder already shown in the content panel needs no second read
+        listing = self._listing_cache.peek(folder_path)
+        if listing is None or not is_current(listing): return None
+        names = sorted((item['name'] for item in listing[1] if item.get('is_dir')), key=str.lower)
+        self._nav_children_cache.put(folder_path, (dir_mtime_ns, names))
+        return names
+
+    def _probe_nav_children(self, child_paths, cancel_token):
+        """(Nav Worker) Finds which of child_paths have subfolders and posts them in batches, so their nodes get an expand marker."""
+        found = []
+        flush_at = time.monotonic() + config.LISTING_FLUSH_INTERVAL
+        for count, child_path in enumerate(child_paths, 1):
+            if count % 64 == 0: cancel_token.raise_if_cancelled()
+            if self._has_subfolders(child_path): found.append(child_path)
+            if found and (len(found) >= config.LISTING_CHUNK_SIZE or time.monotonic() >= flush_at):
+                self._ui_pump.post(self._on_nav_probes, cancel_token, found)
+                found = []
+                flush_at = time.monotonic() + config.LISTING_FLUSH_INTERVAL
+        if found: self._ui_pump.post(self._on_nav_probes, cancel_token, found)
+
+    def _has_subfolders(self, folder_path):
+        """(Nav Worker) Whether folder_path has subfolders, answered from the caches while the folder's mtime is unchanged."""
+        try: dir_mtime_ns = os.stat(folder_path).st_mtime_ns
+        except OSError: return False
+        names = self._nav_children_cache.peek(folder_path)
+        if names is not None and names[0] == dir_mtime_ns: return bool(names[1])
+        probe = self._nav_probe_cache.get(folder_path, lambda probe: probe[0] == dir_mtime_ns)
+        if probe is not None: return probe[1]
+        has_subdirs = utils.has_subdirectories(folder_path)
+        self._nav_probe_cache.put(folder_path, (dir_mtime_ns, has_subdirs))
+        return has_subdirs
+
+    def _on_nav_children(self, cancel_token, parent_id, names):
+        """(Main Thread) Appends one chunk of subfolder nodes under parent_id."""
+        if cancel_token.cancelled or not self.nav_tree.exists(parent_id): return
+        for name in names:
+            child_id = os.path.join(parent_id, name)
             try:
-                with os.scandir(path_obj) as it: has_subdirs = any(entry.is_dir(follow_symlinks=False) for entry in it)
-            except (OSError, FileNotFoundError): pass
-            if has_subdirs and self.nav_tree.exists(node_id):
-                if not self.nav_tree.get_children(node_id):
-                     dummy_iid = f"{node_id}_dummy"
-                     if not self.nav_tree.exists(dummy_iid): self.nav_tree.insert(node_id, "end", text=config.DUMMY_NODE_TEXT, iid=dummy_iid)
+                if not self.nav_tree.exists(child_id): self.nav_tree.insert(parent_id, "end", text=name, iid=child_id, open=False)
+            except tk.TclError as e: print(f"Skipping nav item insert for {name} under {parent_id}: {e}")
+
+    def _on_nav_children_done(self, cancel_token, parent_id):
+        """(Main Thread) Removes the dummy child once all subfolders of parent_id are in place."""
+        if cancel_token.cancelled: return
+        self._nav_loading.discard(parent_id)
+        dummy_iid = f"{parent_id}_dummy"
+        try:
+            if self.nav_tree.exists(dummy_iid): self.nav_tree.delete(dummy_iid)
         except tk.TclError: pass
-        except Exception as e: print(f"Error checking/inserting dummy node for {path}: {e}")
+
+    def _on_nav_probes(self, cancel_token, node_ids):
+        """(Main Thread) Gives each of node_ids (found to have subfolders) a dummy child so it can be expanded."""
+        if cancel_token.cancelled: return
+        for node_id in node_ids:
+            try:
+                if not self.nav_tree.exists(node_id) or self.nav_tree.get_children(node_id): continue
+                self.nav_tree.insert(node_id, "end", text=config.DUMMY_NODE_TEXT, iid=f"{node_id}_dummy")
+            except tk.TclError: continue
 
     def on_nav_tree_expand(self, event=None):
         """Callback when a node in the navigation tree is expanded."""
@@ -361,7 +499,7 @@ class FolderExplorerApp:
                 if len(children) == 1:
                     dummy_id = children[0]
                     if self.nav_tree.exists(dummy_id) and self.nav_tree.item(dummy_id, 'text') == config.DUMMY_NODE_TEXT:
-                        self.populate_nav_tree(parent_id=node_id, parent_path=node_id)
+                        self.expand_nav_node(node_id)
             except tk.TclError as e: print(f"Error handling nav expand event for {node_id}: {e}")
 
     def on_nav_tree_select(self, event=None):
@@ -398,7 +536,7 @@ class FolderExplorerApp:
                         if len(children) == 1:
                             dummy_id = children[0]
                             if self.nav_tree.exists(dummy_id) and self.nav_tree.item(dummy_id, 'text') == config.DUMMY_NODE_TEXT:
-                                 self.populate_nav_tree(parent_id=parent, parent_path=parent)
+                                 self.expand_nav_node(parent)
             except tk.TclError: pass
             except Exception as e: print(f"Error in expand_parents for {item_id}: {e}")
         try:
@@ -474,103 +612,147 @@ class FolderExplorerApp:
         if update_history:
             if not self.history or norm_path != self.history[-1]: self.history.append(norm_path)
 
-        active_tree = self.details_tree if self.view_style.get() == "Details" else self.list_tree
-        if not active_tree: print("Error: No active content view widget found."); self.update_nav_buttons_state(); return
+        # Abort every walk still running or queued for the previous view
+        with self._threads_lock:
+            self._view_cancel_token.cancel()
+            self._view_cancel_token = scanner.CancellationToken()
+            self._pending_calculations.clear()
+        cancel_token = self._view_cancel_token
+
+        if self.view_style.get() == "Treemap":
+            self._listing_state = None
+            self._load_treemap(norm_path, path_obj.name, cancel_token)
+            self.update_nav_buttons_state()
+            return
+
+        active_view = self._active_content_view()
+        if not active_view: print("Error: No active content view widget found."); self.update_nav_buttons_state(); return
 
         try:
-            if active_tree.winfo_exists():
-                 children_to_delete = active_tree.get_children('')
-                 if children_to_delete: active_tree.delete(*children_to_delete)
+            if active_view.winfo_exists():
+                active_view.clear()
+                # Rows are merged into the active sort order as they arrive, and kept there as sizes come in
+                active_view.model.set_order(content_model.sort_attribute(self._tree_sort_column), self._tree_sort_reverse)
             else: return
-        except tk.TclError as e: print(f"Error clearing content tree: {e}")
-
-        with self._threads_lock: self._calculation_threads.clear()
+        except tk.TclError as e: print(f"Error clearing content view: {e}")
 
         self.status_var.set(config.STATUS_LOADING.format(name=path_obj.name))
-        self.root.update_idletasks()
 
-        items_data = []
-        perm_error_encountered = False
-        access_error_encountered = False
+        # The listing is read by a background producer and streamed in through the UI pump,
+        # so the window stays interactive however many entries the directory has
+        self._listing_state = {"path": norm_path, "name": path_obj.name, "view": active_view, "token": cancel_token,
+                               "count": 0, "jobs_queued": 0, "perm_error": False, "access_error": False}
+        self._listing_scheduler.submit(self._produce_listing, norm_path, cancel_token, cancel_token=cancel_token)
+        self.update_nav_buttons_state()
 
-        try:
-            with os.scandir(norm_path) as it:
-                for entry in it:
-                    info = {"name": entry.name, "path": entry.path, "is_symlink": entry.is_symlink()}
-                    try:
-                        stat_info = entry.stat(follow_symlinks=False)
-                        is_dir = entry.is_dir(follow_symlinks=False)
-                        if info["is_symlink"]: type_ = "Symbolic Link"
-                        elif is_dir: type_ = "Folder"
-                        else: type_ = "File"
-                        size_bytes = None
-                        if not is_dir and not info["is_symlink"]: size_bytes = stat_info.st_size
-                        # Get current time using external info: Sunday, May 4, 2025 at 7:50:19 PM WIB
-                        mod_time = datetime.datetime.fromtimestamp(stat_info.st_mtime).strftime(config.DATE_FORMAT) # Use real mtime
-                        info.update({"is_dir": is_dir and not info["is_symlink"], "type": type_, "size": size_bytes, "modified": mod_time})
-                    except PermissionError: info.update({"type": "Inaccessible", "size": None, "modified": "N/A", "is_dir": False}); perm_error_encountered = True
-                    except (FileNotFoundError, OSError) as e: print(f"Error stating {entry.path}: {e}"); info.update({"type": "Error", "size": None, "modified": "N/A", "is_dir": False}); access_error_encountered = True
-                    items_data.append(info)
-        except PermissionError as e: messagebox.showerror(config.ERROR_LISTING_TITLE, f"Permission denied listing directory:\n{norm_path}\n\n{e}"); self.status_var.set(config.STATUS_PERM_ERROR); self._revert_to_valid_history(); return
-        except FileNotFoundError as e: messagebox.showerror(config.ERROR_LISTING_TITLE, f"Directory not found:\n{norm_path}\n\n{e}"); self.status_var.set(config.STATUS_ERROR); self._revert_to_valid_history(); return
-        except Exception as e: messagebox.showerror(config.ERROR_LISTING_TITLE, config.ERROR_LISTING_MSG.format(path=norm_path, error=e)); self.status_var.set(config.STATUS_ERROR); self.update_nav_buttons_state()
-
-        threads_started = 0
-        requires_size_calc = (self.view_style.get() == "Details")
+    def _produce_listing(self, norm_path, cancel_token):
+        """(Listing Worker) Reads a directory, or its cached listing, and streams it to the main thread in chunks."""
+        try: dir_mtime_ns = os.stat(norm_path).st_mtime_ns
+        except OSError: dir_mtime_ns = None
+
+        # Re-use the listing from a recent visit if the directory itself has not changed since
+        cached_listing = None
+        if dir_mtime_ns is not None:
+            cached_listing = self._listing_cache.get(norm_path, lambda listing: listing[0] == dir_mtime_ns)
+
+        if cached_listing is not None:
+            items_data = cached_listing[1]
+            for start in range(0, len(items_data), config.LISTING_CHUNK_SIZE):
+                self._ui_pump.post(self._on_listing_chunk, cancel_token, items_data[start:start + config.LISTING_CHUNK_SIZE])
+        else:
+            items_data = []
+            try:
+                for chunk in utils.iter_directory_chunks(norm_path, config.LISTING_CHUNK_SIZE, cancel_token):
+                    items_data.extend(chunk)
+                    self._ui_pump.post(self._on_listing_chunk, cancel_token, chunk)
+            except OSError as e:
+                self._ui_pump.post(self._on_listing_error, cancel_token, norm_path, e)
+                return
+            # Only complete listings are cached
+            if dir_mtime_ns is not None: self._listing_cache.put(norm_path, (dir_mtime_ns, items_data))
+        self._ui_pump.post(self._on_listing_done, cancel_token)
+
+    def _current_listing(self, cancel_token):
+        """Returns the listing state if cancel_token still belongs to the displayed view, else None."""
+        state = self._listing_state
+        if cancel_token.cancelled or state is None or state["token"] is not cancel_token: return None
+        return state
+
+    def _on_listing_chunk(self, cancel_token, items_data):
+        """(Main Thread) Inserts one chunk of listed entries and queues size calculations for its folders."""
+        state = self._current_listing(cancel_token)
+        if state is None: return
+        active_view = state["view"]
+        requires_size_calc = (active_view == self.details_view)
+        new_rows = []
 
         for item in items_data:
             name = item["name"]
             fpath = item["path"]
             type_ = item["type"]
             is_dir = item.get("is_dir", False)
-            size_bytes = item["size"]
+            size_bytes = item.get("allocated") if self._scan_options.disk_usage else item["size"]
             mod = item["modified"]
             is_symlink = item["is_symlink"]
 
-            display_size = "N/A"; should_calculate = False
+            if type_ == "Inaccessible": state["perm_error"] = True
+            elif type_ == "Error": state["access_error"] = True
+
+            display_size = "N/A"; size_key = content_model.SIZE_KEY_UNKNOWN; should_calculate = False
             if type_ not in ["Inaccessible", "Error"]:
-                 if is_dir and requires_size_calc: display_size = "Calculating..."; should_calculate = True
+                 if is_dir and requires_size_calc:
+                     known_size = self._lookup_scanned_size(fpath, item.get("mtime_ns"))
+                     if known_size is not None: display_size = utils.format_size(known_size); size_key = known_size
+                     else: display_size = "Calculating..."; size_key = content_model.SIZE_KEY_PENDING; should_calculate = True
                  elif is_symlink: display_size = "N/A"
-                 elif size_bytes is not None: display_size = utils.format_size(size_bytes)
-                 elif not is_dir and not is_symlink: display_size = "Error"
+                 elif size_bytes is not None: display_size = utils.format_size(size_bytes); size_key = size_bytes
+                 elif not is_dir and not is_symlink: display_size = "Error"; size_key = content_model.SIZE_KEY_ERROR
 
             try:
-                if not active_tree.winfo_exists(): break
-
-                # ** Prepare values tuple including the name for the first column **
-                if active_tree == self.details_tree:
-                    values_tuple = (name, display_size, type_, mod) # Name first
-                else: # List view
-                     values_tuple = (name, display_size) # Name first
-
                 tags = [];
                 if is_dir: tags.append('folder')
                 elif is_symlink: tags.append('symlink')
                 else: tags.append('file')
                 if type_ in ["Inaccessible", "Error"]: tags.append('error')
 
-                # ** Insert item: text=name for hidden #0, values=values_tuple for visible columns **
-                item_id = active_tree.insert("", tk.END, text=name, values=values_tuple, iid=fpath, tags=tuple(tags))
+                # ** Rows live in the view's model; the path doubles as the item id **
+                new_rows.append(content_model.ContentRow(fpath, name, display_size, type_, mod, tuple(tags), size_key, item.get("mtime_ns")))
+                item_id = fpath
 
                 if should_calculate:
-                     thread = threading.Thread(target=self.calculate_and_update_size, args=(item_id, fpath, active_tree), daemon=True)
-                     with self._threads_lock: self._calculation_threads[item_id] = thread
-                     thread.start()
-                     threads_started += 1
-            except tk.TclError as e: print(f"Error inserting item '{name}' into tree: {e}"); continue
-            except Exception as e: print(f"General error processing/inserting item {name}: {e}"); continue
+                     with self._threads_lock: self._pending_calculations.add(item_id)
+                     self._scan_scheduler.submit(self.calculate_and_update_size, item_id, fpath, active_view, cancel_token, cancel_token=cancel_token)
+                     state["jobs_queued"] += 1
+            except Exception as e: print(f"General error processing item {name}: {e}"); continue
 
-        if self._tree_sort_column:
-             self.sort_content_column(self._tree_sort_column, self._tree_sort_reverse, initial_sort=True)
+        try:
+            if active_view.winfo_exists(): active_view.append_rows(new_rows)
+        except tk.TclError as e: print(f"Error adding rows to content view: {e}")
+        state["count"] += len(items_data)
+        self.status_var.set(config.STATUS_LISTING.format(name=state["name"], count=state["count"]))
+
+    def _on_listing_error(self, cancel_token, norm_path, e):
+        """(Main Thread) Reports a directory that could not be listed at all."""
+        if self._current_listing(cancel_token) is None: return
+        if isinstance(e, PermissionError): messagebox.showerror(config.ERROR_LISTING_TITLE, f"Permission denied listing directory:\n{norm_path}\n\n{e}"); self.status_var.set(config.STATUS_PERM_ERROR); self._revert_to_valid_history()
+        elif isinstance(e, FileNotFoundError): messagebox.showerror(config.ERROR_LISTING_TITLE, f"Directory not found:\n{norm_path}\n\n{e}"); self.status_var.set(config.STATUS_ERROR); self._revert_to_valid_history()
+        else: messagebox.showerror(config.ERROR_LISTING_TITLE, config.ERROR_LISTING_MSG.format(path=norm_path, error=e)); self.status_var.set(config.STATUS_ERROR); self.update_nav_buttons_state()
+
+    def _on_listing_done(self, cancel_token):
+        """(Main Thread) Sets the final status once the listing is complete. Rows are already in sort order."""
+        state = self._current_listing(cancel_token)
+        if state is None: return
 
         final_status = config.STATUS_READY
-        if threads_started > 0:
-             plural = 's' if threads_started != 1 else ''
-             final_status = config.STATUS_CALCULATING.format(count=threads_started, plural=plural)
-             self.root.after(2000 + threads_started * 50, self._check_calculation_status)
-        elif perm_error_encountered and access_error_encountered: final_status = config.STATUS_BOTH_ERROR
-        elif perm_error_encountered: final_status = config.STATUS_PERM_ERROR
-        elif access_error_encountered: final_status = config.STATUS_ACCESS_ERROR
+        jobs_queued = state["jobs_queued"]
+        with self._threads_lock: still_pending = bool(self._pending_calculations)
+        if jobs_queued > 0 and still_pending:
+             plural = 's' if jobs_queued != 1 else ''
+             final_status = config.STATUS_CALCULATING.format(count=jobs_queued, plural=plural)
+             self.root.after(2000, self._check_calculation_status)
+        elif state["perm_error"] and state["access_error"]: final_status = config.STATUS_BOTH_ERROR
+        elif state["perm_error"]: final_status = config.STATUS_PERM_ERROR
+        elif state["access_error"]: final_status = config.STATUS_ACCESS_ERROR
         self.status_var.set(final_status)
         self.update_nav_buttons_state()
 
@@ -615,43 +797,366 @@ class FolderExplorerApp:
              self.update_nav_buttons_state()
 
     def _check_calculation_status(self):
-        """Checks if folder size calculation threads are still running and updates status."""
+        """Checks if folder size calculations are still pending and updates status."""
         if not self.root.winfo_exists(): return
         with self._threads_lock:
-            if not self._calculation_threads:
+            if not self._pending_calculations:
                 if config.STATUS_CALCULATING.split('{')[0] in self.status_var.get():
                     self.status_var.set(config.STATUS_READY)
             else:
                  self.root.after(2000, self._check_calculation_status)
 
-    def calculate_and_update_size(self, item_id, folder_path, target_tree):
-        """(Thread Target) Calculates folder size and schedules UI update."""
+    def calculate_and_update_size(self, item_id, folder_path, target_view, cancel_token):
+        """(Scan Worker) Calculates folder size and schedules UI update. Aborts quietly once cancel_token is cancelled."""
         calculated_size_bytes = None; formatted_size = "Error"
+        metrics = scan_metrics.ScanMetrics(folder_path, config.SCAN_BACKEND); outcome = "failed"
+        options = self._scan_options
         try:
-            calculated_size_bytes = utils.get_folder_size(folder_path)
-            if calculated_size_bytes is not None: formatted_size = utils.format_size(calculated_size_bytes)
+            # A still-valid size from a previous session saves the walk entirely
+            indexed = self._index_lookup(folder_path, options.key())
+            cancel_token.raise_if_cancelled()
+            if indexed is not None:
+                calculated_size_bytes = indexed[0]
+                metrics.source = "index"; metrics.set_totals(*indexed[:3])
+            else:
+                def report_progress(size_bytes, file_count, dir_count):
+                    growing_size = config.SIZE_GROWING_FORMAT.format(size=utils.format_size(size_bytes))
+                    self._ui_pump.post(self.update_tree_item_size, item_id, growing_size, size_bytes, target_view, key=("size", item_id))
+                with scan_metrics.profiled(metrics, self._profile_scans):
+                    tree = self._walk_folder(folder_path, cancel_token, report_progress, options, metrics=metrics)
+                if tree is not None: calculated_size_bytes = tree.total_size()
+            if calculated_size_bytes is not None: formatted_size = utils.format_size(calculated_size_bytes); outcome = "done"
             else: formatted_size = "N/A"
-        except Exception as e: print(f"Error calculating size for thread {folder_path}: {e}"); formatted_size = "Error"
+        except scanner.ScanCancelled: outcome = "cancelled" # The view this job belonged to is gone
+        except Exception as e: print(f"Error calculating size for {folder_path}: {e}"); formatted_size = "Error"; metrics.count_error(type(e).__name__)
         finally:
-            try:
-                if target_tree.winfo_exists():
-                     # Pass raw bytes for potential future use in sorting
-                     self.root.after(0, self.update_tree_item_size, item_id, formatted_size, calculated_size_bytes, target_tree)
-            except Exception as e: print(f"Error scheduling size update for {item_id}: {e}")
+            metrics.finish(outcome)
+            self._scan_metrics.add(metrics)
+            if not cancel_token.cancelled:
+                # Pass raw bytes for potential future use in sorting
+                self._ui_pump.post(self.update_tree_item_size, item_id, formatted_size, calculated_size_bytes, target_view, key=("size", item_id))
             with self._threads_lock:
-                if item_id in self._calculation_threads: del self._calculation_threads[item_id]
-                if not self._calculation_threads:
-                    if config.STATUS_CALCULATING.split('{')[0] in self.status_var.get():
-                        self.root.after(10, lambda: self.status_var.set(config.STATUS_READY))
+                # Once cancelled, the pending set already belongs to a newer view
+                if not cancel_token.cancelled:
+                    self._pending_calculations.discard(item_id)
+                    if not self._pending_calculations:
+                        self._ui_pump.post(self._on_calculations_finished, key="calculations-finished")
+
+    def _on_calculations_finished(self):
+        """(Main Thread) Resets the status bar once the last folder size has arrived."""
+        with self._threads_lock:
+            if self._pending_calculations: return # A newer view started calculating meanwhile
+        if config.STATUS_CALCULATING.split('{')[0] in self.status_var.get():
+            self.status_var.set(config.STATUS_READY)
 
 
-    def update_tree_item_size(self, item_id, formatted_size, size_bytes, target_tree):
-        """(Main Thread) Updates the size value in the specified Treeview item."""
+    def clear_size_index(self):
+        """Wipes the persistent size index after confirmation."""
+        if not self._size_index:
+            messagebox.showinfo(config.CONFIRM_CLEAR_INDEX_TITLE, config.INFO_INDEX_DISABLED_MSG)
+            return
+        try:
+            count = self._size_index.entry_count()
+            if messagebox.askyesno(config.CONFIRM_CLEAR_INDEX_TITLE, config.CONFIRM_CLEAR_INDEX_MSG.format(count=count)):
+                self._size_index.clear()
+        except Exception as e: messagebox.showerror(config.CONFIRM_CLEAR_INDEX_TITLE, f"Could not clear the size index:\n{e}")
+
+    def show_largest_items(self):
+        """
+        Shows the largest files and folders below the current folder. A finished walk of it answers at
+        once, and a size or treemap walk of it still running is watched instead of walking it twice.
+        Otherwise it is walked, and a cached walk covering it fills the folder list in the meantime.
+        """
+        folder_path = os.path.normpath(self.current_path.get())
+        options = self._scan_options
+        cancel_token = scanner.CancellationToken()
+        largest = self._cached_largest_items(folder_path)
+        if largest is None:
+            with self._threads_lock: largest = self._running_largest.get((options.key(), folder_path))
+        needs_walk = largest is None
+        if needs_walk:
+            largest = largest_items.LargestItems()
+            found = self._find_scanned_node(folder_path)
+            if found is not None: largest.add_tree_folders(*found) # Replaced by the new walk's folders when it is done
+        if largest.outcome is None:
+            with self._threads_lock: self._largest_watchers[largest] = cancel_token
+
+        def close():
+            cancel_token.cancel()
+            with self._threads_lock:
+                if self._largest_watchers.get(largest) is cancel_token: del self._largest_watchers[largest]
+
+        largest_window.show_largest_items_window(self.root, folder_path, largest, on_close=close, on_open_folder=self.open_folder)
+        if needs_walk:
+            self._scan_scheduler.submit(self._produce_largest_items, folder_path, largest, cancel_token, options, cancel_token=cancel_token)
+
+    def _cached_largest_items(self, folder_path):
+        """
+        A finished LargestItems for folder_path from a cached walk that is still valid, or None. A walk
+        of a parent folder only answers if its file list surely holds all of this folder's largest files.
+        """
+        try: mtime_ns = os.stat(folder_path).st_mtime_ns
+        except OSError: return None
+        found = self._find_scanned_node(folder_path, mtime_ns)
+        if found is None: return None
+        tree, index = found
+        with self._threads_lock: walked = self._walked_largest.get((tree.options_key, tree.root_path))
+        if walked is None: return None # Cached by a walk that did not collect them (e.g. Save Scan)
+        files = walked.files()
+        if index != 0:
+            prefix = os.path.join(folder_path, '')
+            cut_short = len(files) >= walked.count
+            files = [item for item in files if item[1].startswith(prefix)]
+            # Once the parent's list was full, smaller files of this folder may have been left out of it
+            if cut_short and len(files) < walked.count: return None
+        largest = largest_items.LargestItems(walked.count)
+        largest.add_files(files)
+        largest.add_tree_folders(tree, index)
+        largest.set_progress(tree.total_size(index), tree.file_count(index), tree.dir_count(index))
+        largest.finish("done")
+        return largest
+
+    def _produce_largest_items(self, folder_path, largest, cancel_token, options):
+        """(Scan Worker) The walk behind a Largest Items window that no cached or running walk could answer."""
+        try: self._walk_folder(folder_path, cancel_token, None, options, largest=largest)
+        except scanner.ScanCancelled: pass
+        except Exception as e: print(f"Error finding largest items in {folder_path}: {e}")
+
+    def _walk_folder(self, folder_path, cancel_token, progress_callback, options, metrics=None, largest=None):
+        """
+        (Scan Worker) Walks folder_path with parallel_scan.scan_folder_tree, caches the tree and adds it
+        to the size index. The walk also collects the folder's largest items (into 'largest' if given),
+        kept with the cached tree and, while it runs, offered to any Largest Items window opened for it.
+        If the walk is cancelled while such a window is watching it, a walk of the window's own finishes
+        the job. Returns the tree, or None if the folder is inaccessible.
+        """
+        key = (options.key(), os.path.normpath(folder_path))
+        largest = largest or largest_items.LargestItems()
+        def report_progress(size_bytes, file_count, dir_count):
+            largest.set_progress(size_bytes, file_count, dir_count)
+            if progress_callback: progress_callback(size_bytes, file_count, dir_count)
+        with self._threads_lock: self._running_largest.setdefault(key, largest)
+        outcome = "failed"
         try:
-             if target_tree.winfo_exists() and target_tree.exists(item_id):
-                 # ** Update the 'size' column specifically **
-                 target_tree.set(item_id, column="size", value=formatted_size)
-                 # TODO: Store size_bytes if needed for more accurate size sorting later
+            tree = parallel_scan.scan_folder_tree(folder_path, cancel_token, report_progress, metrics=metrics, options=options, largest=largest)
+            if tree is not None:
+                self._store_scan_tree(tree, largest)
+                self._index_store(tree)
+                outcome = "done"
+            return tree
+        except scanner.ScanCancelled:
+            outcome = "cancelled"
+            raise
+        finally:
+            with self._threads_lock:
+                if self._running_largest.get(key) is largest: del self._running_largest[key]
+                watcher = self._largest_watchers.get(largest) if outcome == "cancelled" else None
+            if watcher is not None and not watcher.cancelled:
+                largest.clear_files()
+                self._scan_scheduler.submit(self._produce_largest_items, folder_path, largest, watcher, options, cancel_token=watcher)
+            else: largest.finish(outcome)
+
+    def save_snapshot(self):
+        """Asks for a file name, then scans the current folder in the background and saves the result as a snapshot."""
+        folder_path = self.current_path.get()
+        folder_name = os.path.basename(folder_path.rstrip(os.sep)) or "root"
+        file_path = filedialog.asksaveasfilename(title=config.SNAPSHOT_SAVE_TITLE, defaultextension=config.SNAPSHOT_FILE_EXTENSION,
+                                                 filetypes=[("Scan snapshots", "*" + config.SNAPSHOT_FILE_EXTENSION), ("All files", "*.*")],
+                                                 initialfile=f"{folder_name}-{time.strftime('%Y%m%d-%H%M')}{config.SNAPSHOT_FILE_EXTENSION}")
+        if not file_path: return
+        self.status_var.set(config.STATUS_SNAPSHOT_SCANNING.format(name=folder_name))
+        self._scan_scheduler.submit(self._produce_snapshot, folder_path, folder_name, file_path, self._scan_options)
+
+    def _produce_snapshot(self, folder_path, folder_name, file_path, options):
+        """(Worker Thread) Walks folder_path and writes the snapshot file."""
+        try:
+            tree = parallel_scan.scan_folder_tree(folder_path, options=options)
+            if tree is None: raise OSError(f"Cannot scan {folder_path}")
+            count = snapshot.write_snapshot(tree, file_path)
+        except (OSError, snapshot.SnapshotError) as e:
+            self._ui_pump.post(self._on_snapshot_error, e)
+            return
+        self._ui_pump.post(self.status_var.set, config.STATUS_SNAPSHOT_SAVED.format(name=folder_name, count=count))
+
+    def _on_snapshot_error(self, e):
+        self.status_var.set(config.STATUS_ERROR)
+        messagebox.showerror(config.ERROR_SNAPSHOT_TITLE, f"Could not save the snapshot:\n{e}")
+
+    def compare_snapshots(self):
+        """Asks for an older and a newer snapshot file and shows which folders grew between them."""
+        filetypes = [("Scan snapshots", "*" + config.SNAPSHOT_FILE_EXTENSION), ("All files", "*.*")]
+        old_path = filedialog.askopenfilename(title=config.SNAPSHOT_OPEN_OLD_TITLE, filetypes=filetypes)
+        if not old_path: return
+        new_path = filedialog.askopenfilename(title=config.SNAPSHOT_OPEN_NEW_TITLE, filetypes=filetypes, initialdir=os.path.dirname(old_path))
+        if not new_path: return
+        snapshot_window.show_snapshot_diff_window(self.root, old_path, new_path, on_open_folder=self.open_folder)
+
+    def save_scan_file(self):
+        """Asks for a file name, then scans the current folder in the background and saves the complete tree as a scan file."""
+        folder_path = self.current_path.get()
+        folder_name = os.path.basename(folder_path.rstrip(os.sep)) or "root"
+        file_path = filedialog.asksaveasfilename(title=config.SCAN_FILE_SAVE_TITLE, defaultextension=config.SCAN_FILE_EXTENSION,
+                                                 filetypes=[("Scan files", "*" + config.SCAN_FILE_EXTENSION), ("All files", "*.*")],
+                                                 initialfile=f"{folder_name}-{time.strftime('%Y%m%d-%H%M')}{config.SCAN_FILE_EXTENSION}")
+        if not file_path: return
+        self.status_var.set(config.STATUS_SCAN_FILE_SCANNING.format(name=folder_name))
+        self._scan_scheduler.submit(self._produce_scan_file, folder_path, folder_name, file_path, self._scan_options)
+
+    def _produce_scan_file(self, folder_path, folder_name, file_path, options):
+        """(Worker Thread) Walks folder_path and writes the scan file."""
+        try:
+            tree = parallel_scan.scan_folder_tree(folder_path, options=options)
+            if tree is None: raise OSError(f"Cannot scan {folder_path}")
+            count = scan_file.write_scan_file(tree, file_path)
+        except OSError as e:
+            self._ui_pump.post(self._on_scan_file_error, e)
+            return
+        self._store_scan_tree(tree)
+        self._ui_pump.post(self.status_var.set, config.STATUS_SCAN_FILE_SAVED.format(name=folder_name, count=count))
+
+    def _on_scan_file_error(self, e):
+        self.status_var.set(config.STATUS_ERROR)
+        messagebox.showerror(config.ERROR_SCAN_FILE_TITLE, f"Could not use the scan file:\n{e}")
+
+    def open_scan_file(self):
+        """Asks for a scan file and browses it; the file is memory-mapped, not read, so this is immediate at any size."""
+        file_path = filedialog.askopenfilename(title=config.SCAN_FILE_OPEN_TITLE,
+                                               filetypes=[("Scan files", "*" + config.SCAN_FILE_EXTENSION), ("All files", "*.*")])
+        if not file_path: return
+        try: tree = scan_file.open_scan_file(file_path)
+        except (OSError, scan_file.ScanFileError) as e:
+            self._on_scan_file_error(e)
+            return
+        scan_file_window.show_scan_file_window(self.root, tree, file_path, on_open_folder=self.open_folder)
+
+    def open_folder(self, folder_path):
+        """Navigates to folder_path (from the treemap or a report window), selecting it in the navigation tree if it is shown there."""
+        norm_path = str(Path(folder_path).resolve())
+        self.load_directory_content(norm_path)
+        if self.nav_tree.exists(norm_path): self.select_nav_tree_item(norm_path)
+        self.update_nav_buttons_state()
+
+    def show_scan_diagnostics(self):
+        diagnostics_window.show_diagnostics_window(self.root, self._scan_metrics)
+
+    def show_cache_statistics(self):
+        """Shows hit/miss counters of the in-memory caches."""
+        lines = []
+        for cache in (self._listing_cache, self._scan_trees, self._nav_children_cache, self._nav_probe_cache):
+            st = cache.stats()
+            lines.append(f"{st['name']}: {st['entries']} entries, {st['weight']:,} / {st['max_weight']:,} used\n"
+                         f"    hits {st['hits']:,}, misses {st['misses']:,} ({st['hit_rate']:.0%} hit rate), evictions {st['evictions']:,}")
+        messagebox.showinfo(config.CACHE_STATS_TITLE, "\n\n".join(lines))
+
+    def _store_scan_tree(self, tree, largest=None):
+        """
+        Keeps a finished subtree walk under (options key, root path), dropping older walks with those
+        options it fully covers. largest is the LargestItems the walk collected, if it did.
+        """
+        root_prefix = os.path.join(tree.root_path, '')
+        for covered in [key for key in self._scan_trees.keys() if key[0] == tree.options_key and key[1].startswith(root_prefix)]:
+            self._scan_trees.discard(covered)
+        key = (tree.options_key, tree.root_path)
+        self._scan_trees.put(key, tree)
+        with self._threads_lock:
+            if largest is not None: self._walked_largest[key] = largest
+            else: self._walked_largest.pop(key, None)
+            # Forget the largest items of walks the cache has dropped since
+            cached = set(self._scan_trees.keys())
+            for stale in [walked for walked in self._walked_largest if walked not in cached]: del self._walked_largest[stale]
+
+    def _index_lookup(self, folder_path, options_key):
+        """(Scan Worker) Size of folder_path from the persistent size index, or None. A failing index only counts as a miss."""
+        if not self._size_index: return None
+        try: return self._size_index.lookup(folder_path, options_key)
+        except size_index.ERRORS as e:
+            print(f"Size index lookup failed for {folder_path}: {e}")
+            return None
+
+    def _index_store(self, tree):
+        """(Scan Worker) Adds a finished walk to the persistent size index. A failure loses the cache entry, never the walk's result."""
+        if not self._size_index: return
+        try: self._size_index.store_tree(tree)
+        except size_index.ERRORS as e: print(f"Could not add {tree.root_path} to the size index: {e}")
+
+    def _lookup_scanned_size(self, folder_path, mtime_ns=None):
+        """
+        Returns the aggregated size of folder_path from a previous walk with the current scan options,
+        or None if unknown. If mtime_ns is given, a recorded size is only used while the folder's
+        mtime still matches.
+        """
+        found = self._find_scanned_node(folder_path, mtime_ns)
+        return found[0].total_size(found[1]) if found else None
+
+    def _find_scanned_node(self, folder_path, mtime_ns=None):
+        """(tree, index) of folder_path in a cached walk with the current scan options, or None (see _lookup_scanned_size)."""
+        folder_path = os.path.normpath(folder_path)
+        options_key = self._scan_options.key()
+        for candidate in [(options_key, folder_path), *((options_key, str(parent)) for parent in Path(folder_path).parents)]:
+            tree = self._scan_trees.peek(candidate)
+            if tree is None: continue
+            index = tree.find(folder_path)
+            if index is None: continue
+            if mtime_ns is not None and tree.mtime_of(index) != mtime_ns: break # Changed since that walk
+            self._scan_trees.get(candidate) # Count the hit and refresh recency
+            return tree, index
+        self._scan_trees.record_miss()
+        return None
+
+    # --- Treemap ---
+    def _load_treemap(self, norm_path, name, cancel_token):
+        """Shows norm_path in the treemap view, from a cached walk if one is still valid, else after walking it."""
+        try: mtime_ns = os.stat(norm_path).st_mtime_ns
+        except OSError: mtime_ns = None
+        found = self._find_scanned_node(norm_path, mtime_ns)
+        if found is not None:
+            self.treemap_view.show_tree(found[0], found[1], norm_path)
+            self.status_var.set(config.STATUS_READY)
+            return
+        self.treemap_view.show_message(config.STATUS_LOADING.format(name=name))
+        self.status_var.set(config.STATUS_CALCULATING.format(count=1, plural=""))
+        self._scan_scheduler.submit(self._produce_treemap_tree, norm_path, cancel_token, self._scan_options, cancel_token=cancel_token)
+
+    def _produce_treemap_tree(self, norm_path, cancel_token, options):
+        """(Scan Worker) Walks a folder for the treemap, reporting progress in the view; the tree is cached like any other walk."""
+        metrics = scan_metrics.ScanMetrics(norm_path, config.SCAN_BACKEND); outcome = "failed"
+        def report_progress(size_bytes, file_count, dir_count):
+            text = config.TREEMAP_SCANNING.format(size=utils.format_size(size_bytes), files=file_count, dirs=dir_count)
+            self._ui_pump.post(self._on_treemap_progress, cancel_token, text, key="treemap-progress")
+        try:
+            with scan_metrics.profiled(metrics, self._profile_scans):
+                tree = self._walk_folder(norm_path, cancel_token, report_progress, options, metrics=metrics)
+            if tree is not None: outcome = "done"
+            self._ui_pump.post(self._on_treemap_tree, cancel_token, tree, norm_path)
+        except scanner.ScanCancelled: outcome = "cancelled"
+        except Exception as e: print(f"Error scanning {norm_path} for the treemap: {e}"); metrics.count_error(type(e).__name__)
+        finally:
+            metrics.finish(outcome)
+            self._scan_metrics.add(metrics)
+
+    def _on_treemap_progress(self, cancel_token, text):
+        if not cancel_token.cancelled: self.treemap_view.show_message(text)
+
+    def _on_treemap_tree(self, cancel_token, tree, norm_path):
+        """(Main Thread) Displays a finished treemap walk, unless the user has moved on."""
+        if cancel_token.cancelled: return
+        self._ui_pump.discard("treemap-progress")
+        if tree is None:
+            self.treemap_view.show_message(config.ERROR_LISTING_MSG.format(path=norm_path, error="Folder could not be scanned"))
+            self.status_var.set(config.STATUS_ERROR)
+            return
+        self.treemap_view.show_tree(tree, 0, norm_path)
+        self.status_var.set(config.STATUS_READY)
+
+    def update_tree_item_size(self, item_id, formatted_size, size_bytes, target_view):
+        """(Main Thread) Updates the size value of a row in the specified content view."""
+        try:
+             if target_view.winfo_exists():
+                 # ** Keep the raw bytes as the sort key; the row is redrawn only if it is on screen **
+                 if size_bytes is not None: size_key = size_bytes
+                 elif formatted_size == "N/A": size_key = content_model.SIZE_KEY_UNKNOWN
+                 else: size_key = content_model.SIZE_KEY_ERROR
+                 target_view.update_row(item_id, size=formatted_size, size_key=size_key)
         except tk.TclError: pass
         except Exception as e: print(f"Error updating tree item size for {item_id}: {e}")
 
@@ -685,65 +1190,27 @@ class FolderExplorerApp:
 
 
     # --- Sorting ---
+    def _active_content_view(self):
+        """Returns the VirtualTreeview for the current view style."""
+        return self.details_view if self.view_style.get() == "Details" else self.list_view
+
     def sort_content_column(self, col, reverse, initial_sort=False):
-        """Sorts the active content treeview by the specified column."""
-        active_tree = self.details_tree if self.view_style.get() == "Details" else self.list_tree
-        if not active_tree or not isinstance(active_tree, ttk.Treeview) or not active_tree.winfo_exists():
-             print("Sort Error: Active treeview not available."); return
+        """Sorts the active content view by the specified column."""
+        active_view = self._active_content_view()
+        if not active_view or not active_view.winfo_exists():
+             print("Sort Error: Active content view not available."); return
 
         if not initial_sort:
             self._tree_sort_column = col; self._tree_sort_reverse = reverse
 
-        data = []
-        try:
-            children = active_tree.get_children('')
-            if not children: return
-            for item_id in children:
-                 if not active_tree.exists(item_id): continue
-                 # ** Get value using set() for the specified column identifier ('name', 'size', etc.) **
-                 try: sort_val = active_tree.set(item_id, col)
-                 except tk.TclError: sort_val = None # Column might not exist? Should not happen here.
-                 data.append((sort_val, item_id))
-        except tk.TclError as e: print(f"Error gathering data for sorting: {e}"); return
-
-        def get_sort_key(item_tuple):
-            val_str, item_id = item_tuple
-            # --- Size Column Sorting ---
-            if col == 'size':
-                if val_str == "Calculating...": return -3
-                if val_str == "Error": return -2
-                if val_str == "N/A": return -1
-                try:
-                    parts = val_str.split()
-                    if len(parts) == 2:
-                        num_str, unit = parts; num = float(num_str.replace(',', '')); unit = unit.upper()
-                        if unit in config.SIZE_UNITS: return int(num * (1024**config.SIZE_UNITS.index(unit)))
-                        elif val_str == f"0 {config.SIZE_UNITS[0]}": return 0
-                    elif val_str == f"0 {config.SIZE_UNITS[0]}": return 0
-                except (ValueError, IndexError, TypeError): print(f"Debug sort: Could not parse size '{val_str}' for {item_id}"); return -2
-                return -2
-            # --- Date Modified Column Sorting ---
-            elif col == 'modified':
-                 min_dt = datetime.datetime.min
-                 if val_str == "N/A": return min_dt
-                 try: return datetime.datetime.strptime(val_str, config.DATE_FORMAT)
-                 except (ValueError, TypeError): return min_dt
-            # --- Name ('name') or Type ('type') Column Sorting (Case-insensitive) ---
-            # ** Handles 'name' column explicitly along with other string-based columns like 'type' **
-            elif col == 'name' or col == 'type':
-                 return str(val_str).lower()
-            # --- Fallback for any other column (shouldn't happen with current config) ---
-            else:
-                 return str(val_str).lower() # Default case-insensitive string sort
+        if not len(active_view.model): return
 
-        try: data.sort(key=get_sort_key, reverse=reverse)
+        # ** Rows carry native keys (bytes, mtime_ns, lower-cased text): a plain keyed sort over the
+        #    model, then the view re-materializes its visible window once. The model keeps this
+        #    order incrementally from here on as sizes arrive. **
+        try: active_view.model.set_order(content_model.sort_attribute(col), reverse)
         except Exception as e: print(f"Error during sorting operation: {e}"); return
+        active_view.refresh()
 
-        try:
-            for idx, (sort_val_ignore, item_id) in enumerate(data):
-                 if active_tree.exists(item_id): active_tree.move(item_id, '', idx)
-        except tk.TclError as e: print(f"Error moving items during sort update: {e}")
-        except Exception as e: print(f"General error reordering tree items after sort: {e}")
-
-        try: active_tree.heading(col, command=lambda c=col: self.sort_content_column(c, not reverse))
+        try: active_view.tree.heading(col, command=lambda c=col: self.sort_content_column(c, not reverse))
         except tk.TclError: pass
@@ -0,0 +1,288 @@
+# async_scan.py
+# Asyncio scanning backend for high-latency filesystems (NFS, SMB, FUSE). A sequential walk
+# spends almost all its time waiting for one round trip after another; this one keeps many
+# directory reads in flight at once. Must not import tkinter (used by the command line).
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+import config # Import the configuration constants
+import utils
+import scan_tree
+import scan_options
+
+# How long the walk waits for a read to finish before checking its cancellation token again
+_CANCEL_POLL_S = 0.1
+
+
+class LocalFileSystem:
+    """
+    The blocking calls a directory read makes, on the real filesystem. The walk only reaches
+    the disk through these methods, so a stand-in (see LatencyFileSystem) can change their cost.
+    """
+    def open_directory(self, path):
+        return scan_options.open_directory(path)
+
+    def scandir(self, target):
+        return os.scandir(target)
+
+    def stat_entry(self, entry):
+        return entry.stat(follow_symlinks=False)
+
+    def close(self, fd):
+        os.close(fd)
+
+
+class LatencyFileSystem(LocalFileSystem):
+    """
+    LocalFileSystem that sleeps before every open, listing and stat, the way each of them is a
+    round trip to the server on a network mount. Lets the benefit of the asyncio backend be
+    measured on a local tree (see the scan_async benchmark).
+    """
+    def __init__(self, latency_s, base=None):
+        self.latency_s = latency_s
+        self.base = base or LocalFileSystem()
+
+    def open_directory(self, path):
+        time.sleep(self.latency_s)
+        return self.base.open_directory(path)
+
+    def scandir(self, target):
+        time.sleep(self.latency_s)
+        return self.base.scandir(target)
+
+    def stat_entry(self, entry):
+        time.sleep(self.latency_s)
+        return self.base.stat_entry(entry)
+
+    def close(self, fd):
+        self.base.close(fd)
+
+
+_shared_executor = None
+_shared_executor_lock = threading.Lock()
+
+def get_shared_executor():
+    """Returns the thread pool that runs the blocking calls of every asyncio walk, starting it on first use."""
+    global _shared_executor
+    with _shared_executor_lock:
+        if _shared_executor is None:
+            _shared_executor = concurrent.futures.ThreadPoolExecutor(config.ASYNC_SCAN_THREADS, thread_name_prefix="async-scan")
+        return _shared_executor
+
+
+def _list_directory(fs, path, boundary):
+    """
+    (Executor Thread) Opens and lists one directory. Returns (fd, dir_stat, files, subdirs, errors):
+    files are the DirEntry objects of its regular files, to be stat'ed by _stat_files relative to
+    fd, which stays open until the caller closes it; subdirs are the names of its subdirectories.
+    files is None (and nothing is left open) for a directory the boundary keeps the walk out of.
+    Raises OSError if the directory cannot be stat'ed.
+    """
+    fd, dir_stat = fs.open_directory(path)
+    try:
+        if not boundary.allows(path, dir_stat):
+            if fd is not None: fs.close(fd)
+            return None, dir_stat, None, None, None
+        files = []
+        subdirs = []
+        errors = {}
+        try:
+            with fs.scandir(path if fd is None else fd) as it:
+                for entry in it:
+                    try:
+                        # Same rules as utils.scan_folder_tree: symlinks are neither sized nor followed
+                        if entry.is_file(follow_symlinks=False): files.append(entry)
+                        elif entry.is_dir(follow_symlinks=False): subdirs.append(entry.name)
+                    except OSError as e:
+                        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        except OSError as e:
+            # Unreadable directory: it keeps its stat and whatever was listed before the error
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        return fd, dir_stat, files, subdirs, errors
+    except BaseException:
+        if fd is not None: fs.close(fd)
+        raise
+
+
+def _stat_files(fs, entries, prefix, disk_usage, file_threshold):
+    """
+    (Executor Thread) Stats a batch of file entries of one directory. Returns (own_bytes,
+    own_files, linked, big_files, errors): linked holds (dev, ino, allocated) of hard-linked
+    files in disk usage mode for the walk to de-duplicate, big_files the (size, path) of files
+    larger than file_threshold.
+    """
+    own_bytes = own_files = 0
+    linked = big_files = None
+    errors = {}
+    for entry in entries:
+        try:
+            entry_stat = fs.stat_entry(entry)
+        except OSError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            continue
+        own_files += 1
+        size = scan_options.allocated_size(entry_stat) if disk_usage else entry_stat.st_size
+        if file_threshold is not None and size > file_threshold:
+            if big_files is None: big_files = []
+            big_files.append((size, prefix + entry.name))
+        if disk_usage and entry_stat.st_nlink > 1 and entry_stat.st_ino:
+            if linked is None: linked = []
+            linked.append((entry_stat.st_dev, entry_stat.st_ino, size))
+        else:
+            own_bytes += size
+    return own_bytes, own_files, linked, big_files, errors
+
+
+def _timed(function, *args):
+    """(Executor Thread) Runs function(*args) and returns (its result, the CPU time it used)."""
+    started = time.thread_time()
+    result = function(*args)
+    return result, time.thread_time() - started
+
+
+class _OpenDirectory:
+    """Walk-side state of a directory whose file batches are still being stat'ed."""
+    __slots__ = ("index", "path", "prefix", "fd", "pending", "own_bytes", "own_files", "started")
+
+    def __init__(self, index, path, fd, own_bytes, started):
+        self.index = index
+        self.path = path
+        self.prefix = path if path.endswith(os.sep) else path + os.sep
+        self.fd = fd
+        self.pending = 0 # Batches not merged yet
+        self.own_bytes = own_bytes
+        self.own_files = 0
+        self.started = started
+
+
+def scan_folder_tree(folder_path, cancel_token=None, progress_callback=None, metrics=None, options=None, seen_links=None,
+                     largest=None, concurrency=None, fs=None):
+    """
+    Walks a folder like utils.scan_folder_tree and returns the same ScanTree (or None if the
+    top-level folder is inaccessible), but reads up to 'concurrency' directories at once
+    (default config.ASYNC_SCAN_CONCURRENCY). Listing a directory and stat'ing its files in
+    batches of config.ASYNC_SCAN_STAT_BATCH are separate jobs on the shared bounded executor,
+    so a huge directory does not serialize the walk either; building the tree, de-duplicating
+    hard links and reporting progress stay on the event loop, which runs in the calling thread.
+    fs replaces LocalFileSystem, e.g. with a LatencyFileSystem. Raises scanner.ScanCancelled if
+    cancel_token is cancelled during the walk. Must not be called from a thread that is
+    already running an event loop.
+    """
+    options = options or scan_options.ScanOptions()
+    start_path = os.path.normpath(os.fspath(folder_path))
+    if not os.path.isdir(start_path): return None
+    return asyncio.run(_walk(start_path, cancel_token, progress_callback, metrics, options, seen_links, largest,
+                             max(1, concurrency or config.ASYNC_SCAN_CONCURRENCY), fs or LocalFileSystem()))
+
+
+async def _walk(start_path, cancel_token, progress_callback, metrics, options, seen_links, largest, concurrency, fs):
+    loop = asyncio.get_running_loop()
+    executor = get_shared_executor()
+    sizer = scan_options.FileSizer(options, seen_links)
+    disk_usage = sizer.disk_usage
+    boundary = scan_options.ScanBoundary(options, start_path)
+    progress = utils.ScanProgress(progress_callback) if progress_callback else None
+    batch_size = max(1, config.ASYNC_SCAN_STAT_BATCH)
+    tree = scan_tree.ScanTree(start_path, options.key())
+    stack = [(0, start_path)] # (node index, path string) of directories not listed yet
+    batches = [] # (_OpenDirectory, entries) of file stats not submitted yet
+    in_flight = {} # asyncio future -> (executor future, job): (node index, path string, started) of a listing, or the _OpenDirectory of a stat batch
+    open_dirs = set() # _OpenDirectory objects still holding a descriptor
+    visited = set() # (device, inode) of visited directories, to prevent cycles through bind mounts
+    running_bytes = running_files = stat_calls = 0
+    worker_cpu = 0.0 # CPU time of the executor jobs; the loop thread's own is ScanMetrics.cpu_s
+
+    def close_directory(directory):
+        """Adds a directory's totals to the tree once all its batches are in, and closes its descriptor."""
+        nonlocal running_bytes, running_files
+        open_dirs.discard(directory)
+        if directory.fd is not None: fs.close(directory.fd)
+        tree.add_files(directory.index, directory.own_files, directory.own_bytes)
+        running_bytes += directory.own_bytes
+        running_files += directory.own_files
+        if metrics is not None: metrics.note_directory_time(directory.path, time.perf_counter() - directory.started)
+
+    def count_errors(errors):
+        if metrics is not None:
+            for kind, count in errors.items(): metrics.count_error(kind, count)
+
+    try:
+        while stack or batches or in_flight:
+            if cancel_token is not None: cancel_token.raise_if_cancelled()
+            # File batches of directories already open go first, so descriptors are released soon;
+            # then new directories, depth-first like the other walks so the stack stays small
+            while len(in_flight) < concurrency and (batches or stack):
+                if batches:
+                    directory, entries = batches.pop()
+                    threshold = largest.file_threshold if largest is not None else None
+                    job_future = executor.submit(_timed, _stat_files, fs, entries, directory.prefix, disk_usage, threshold)
+                    in_flight[asyncio.wrap_future(job_future, loop=loop)] = (job_future, directory)
+                else:
+                    index, path = stack.pop()
+                    job_future = executor.submit(_timed, _list_directory, fs, path, boundary)
+                    in_flight[asyncio.wrap_future(job_future, loop=loop)] = (job_future, (index, path, time.perf_counter()))
+            done, _pending = await asyncio.wait(in_flight, timeout=_CANCEL_POLL_S, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                _job_future, job = in_flight.pop(future)
+                if isinstance(job, _OpenDirectory):
+                    (own_bytes, own_files, linked, big_files, errors), cpu = future.result()
+                    worker_cpu += cpu
+                    stat_calls += own_files + sum(errors.values())
+                    if linked:
+                        for link_dev, link_ino, allocated in linked:
+                            if sizer.seen_links.add(link_dev, link_ino): own_bytes += allocated
+                    job.own_bytes += own_bytes
+                    job.own_files += own_files
+                    if big_files:
+                        for size, file_path in big_files: largest.add_file(size, file_path)
+                    count_errors(errors)
+                    job.pending -= 1
+                    if job.pending == 0: close_directory(job)
+                    continue
+
+                index, path, started = job
+                try:
+                    (fd, dir_stat, files, subdirs, errors), cpu = future.result()
+                except OSError as e:
+                    # Vanished or replaced by a file since it was listed - skip this directory
+                    if metrics is not None: metrics.count_error(type(e).__name__)
+                    continue
+                worker_cpu += cpu
+                stat_calls += 1
+                if files is None: continue # Other filesystem or pseudo filesystem
+                identity = (dir_stat.st_dev, dir_stat.st_ino)
+                if identity in visited:
+                    if fd is not None: fs.close(fd)
+                    continue
+                visited.add(identity)
+                tree.set_stat(index, dir_stat)
+                count_errors(errors)
+                directory = _OpenDirectory(index, path, fd, sizer.directory_bytes(dir_stat), started)
+                open_dirs.add(directory)
+                for name in subdirs: stack.append((tree.add_directory(index, name), directory.prefix + name))
+                # A large directory's files are stat'ed in several batches at once
+                for first in range(0, len(files), batch_size):
+                    batches.append((directory, files[first:first + batch_size]))
+                    directory.pending += 1
+                if directory.pending == 0: close_directory(directory)
+            if progress: progress.maybe_report(running_bytes, running_files, len(tree) - 1)
+    finally:
+        # Reads not started yet are dropped; running ones are waited for, since a listing may open a descriptor
+        running = [job_future for job_future, _job in in_flight.values() if not job_future.cancel()]
+        concurrent.futures.wait(running)
+        for job_future, job in in_flight.values():
+            if isinstance(job, tuple) and not job_future.cancelled() and job_future.exception() is None:
+                fd = job_future.result()[0][0]
+                if fd is not None: fs.close(fd)
+        for directory in open_dirs:
+            if directory.fd is not None: fs.close(directory.fd)
+        if metrics is not None: metrics.worker_cpu_s += worker_cpu
+
+    tree.finalize()
+    if largest is not None: largest.add_tree_folders(tree)
+    if metrics is not None:
+        metrics.stat_calls += stat_calls
+        metrics.set_totals(tree.total_size(), tree.file_count(), tree.dir_count())
+    return tree
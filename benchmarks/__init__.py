@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Benchmark suite; run it with `python -m benchmarks.bench` from the project directory.
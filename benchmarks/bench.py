@@ -0,0 +1,286 @@
+# benchmarks/bench.py
+# Benchmark runner. From the project directory:
+#   python -m benchmarks.bench                           # all profiles, results to bench_results.json
+#   python -m benchmarks.bench --profiles wide,tiny --scale 10 --repeat 5
+#   python -m benchmarks.bench --baseline old.json --fail-above 10
+#   python -m benchmarks.bench --cold                    # drop OS caches before every run (Linux, root)
+#   python -m benchmarks.bench --benchmarks scan_async --latency-ms 2 --async-concurrency 1
+# Every measurement runs in a freshly spawned interpreter, so peak RSS belongs to that
+# measurement alone and earlier runs leave nothing behind in the caches of this process.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+
+from benchmarks import treegen
+
+# Metrics where a larger value is better; for every other metric smaller is better
+HIGHER_IS_BETTER = ("entries_per_s",)
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where the resource module is unavailable."""
+    try: import resource
+    except ImportError: return None # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # Bytes on macOS, KiB elsewhere
+
+
+# --- Measurements (each runs in a spawned child and returns a dict of metrics) ---
+
+def measure_scan_tree(manifest, options):
+    import utils
+    start = time.perf_counter()
+    tree = utils.scan_folder_tree(manifest["root"])
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "entries_per_s": manifest["entries"] / elapsed,
+            "bytes": tree.total_size(), "files": tree.file_count()}
+
+def measure_scan_processes(manifest, options):
+    import parallel_scan
+    pool = parallel_scan.ProcessScanPool(options["processes"])
+    try:
+        start = time.perf_counter()
+        tree = pool.scan(manifest["root"])
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.shutdown()
+    return {"seconds": elapsed, "entries_per_s": manifest["entries"] / elapsed,
+            "bytes": tree.total_size(), "files": tree.file_count()}
+
+def measure_scan_async(manifest, options):
+    """The asyncio backend, optionally on a LatencyFileSystem that delays every open, listing and stat like a network mount."""
+    import async_scan
+    fs = async_scan.LatencyFileSystem(options["latency_ms"] / 1000) if options["latency_ms"] else None
+    start = time.perf_counter()
+    tree = async_scan.scan_folder_tree(manifest["root"], concurrency=options["async_concurrency"], fs=fs)
+    elapsed = time.perf_counter() - start
+    return {"seconds": elapsed, "entries_per_s": manifest["entries"] / elapsed,
+            "bytes": tree.total_size(), "files": tree.file_count()}
+
+def measure_listing(manifest, options):
+    """The worker half of load_directory_content on the profile's widest folder: time to the first chunk and to the end."""
+    import utils
+    start = time.perf_counter()
+    first_row = None
+    count = 0
+    for chunk in utils.iter_directory_chunks(manifest["widest_dir"]):
+        if first_row is None: first_row = time.perf_counter() - start
+        count += len(chunk)
+    elapsed = time.perf_counter() - start
+    return {"time_to_first_row_s": first_row or elapsed, "seconds": elapsed,
+            "entries_per_s": count / elapsed if elapsed else 0.0, "rows": count}
+
+def measure_sort(manifest, options):
+    """What sort_content_column does to the widest folder's rows: a full sort per column and direction, then one incremental flush."""
+    import utils
+    import content_model
+    rows = []
+    for chunk in utils.iter_directory_chunks(manifest["widest_dir"]):
+        for item in chunk:
+            size_key = item["size"] if item.get("size") is not None else content_model.SIZE_KEY_PENDING
+            rows.append(content_model.ContentRow(item["path"], item["name"], str(item.get("size")), item["type"],
+                                                 item["modified"], (), size_key, item.get("mtime_ns")))
+    model = content_model.ContentModel()
+    model.extend(rows)
+    full_sorts = []
+    for column in ("name", "size", "type", "modified"):
+        for descending in (False, True):
+            start = time.perf_counter()
+            model.set_order(content_model.sort_attribute(column), descending)
+            full_sorts.append(time.perf_counter() - start)
+
+    # Folder sizes arriving while sorted by size: the model repositions only the changed rows
+    model.set_order("size_key", True)
+    rng = random.Random(0)
+    changed = rng.sample(rows, min(len(rows), 500))
+    for row in changed: model.update(row, size_key=rng.randint(0, 1 << 40))
+    start = time.perf_counter()
+    model.flush()
+    flush = time.perf_counter() - start
+    return {"rows": len(rows), "sort_ms_median": statistics.median(full_sorts) * 1000,
+            "sort_ms_max": max(full_sorts) * 1000, "flush_500_updates_ms": flush * 1000}
+
+BENCHMARKS = {"scan_tree": measure_scan_tree,
+              "scan_processes": measure_scan_processes, "scan_async": measure_scan_async,
+              "listing": measure_listing, "sort": measure_sort}
+DEFAULT_BENCHMARKS = ("scan_tree", "listing", "sort")
+
+
+def _child_main(name, manifest, options, conn):
+    """(Spawned Process) Runs one measurement and sends back its metrics plus the process's peak RSS."""
+    sys.path.insert(0, options["project_dir"])
+    try:
+        metrics = BENCHMARKS[name](manifest, options)
+        metrics["peak_rss_mb"] = _peak_rss_mb()
+        conn.send(("ok", metrics))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def run_isolated(name, manifest, options):
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_child_main, args=(name, manifest, options, child_conn))
+    process.start()
+    child_conn.close()
+    status, payload = parent_conn.recv()
+    process.join()
+    if status != "ok": raise RuntimeError(f"{name} failed: {payload}")
+    return payload
+
+
+def drop_page_cache():
+    """
+    Empties the OS page, dentry and inode caches so the next scan reads metadata from disk.
+    Linux only and needs root; returns False where that is not possible.
+    """
+    try:
+        os.sync()
+        with open("/proc/sys/vm/drop_caches", "w") as f: f.write("3\n")
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+def summarize(samples):
+    """Median of every numeric metric over repeated runs, plus the minimum wall time."""
+    summary = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples if isinstance(sample.get(key), (int, float))]
+        if values and all(isinstance(value, int) for value in values): summary[key] = statistics.median_low(values)
+        elif values: summary[key] = statistics.median(values)
+    if "seconds" in summary: summary["seconds_min"] = min(sample["seconds"] for sample in samples)
+    return summary
+
+
+def check_totals(name, manifest, metrics):
+    """Returns a warning if a scan's totals do not match what the generator created."""
+    if "bytes" not in metrics: return None
+    expected_bytes = manifest["bytes"]
+    if manifest["denied_dirs"] and not os.access(manifest["denied_dirs"][0], os.R_OK):
+        expected_bytes -= manifest["denied_bytes"] # Running unprivileged: the pockets are invisible
+    if metrics["bytes"] != expected_bytes:
+        return f"{name} on {manifest['profile']}: got {metrics['bytes']} bytes, expected {expected_bytes}"
+    return None
+
+
+def compare(results, baseline):
+    """Returns rows of (profile, benchmark, metric, old, new, change %) where 'worse' change is positive."""
+    rows = []
+    for profile, benches in results.items():
+        for name, metrics in benches.items():
+            old_metrics = baseline.get(profile, {}).get(name, {})
+            for metric, new in metrics.items():
+                old = old_metrics.get(metric)
+                if not isinstance(old, (int, float)) or not old or metric in ("bytes", "files", "rows"): continue
+                change = (new - old) / old * 100
+                if metric in HIGHER_IS_BETTER: change = -change
+                rows.append((profile, name, metric, old, new, change))
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench", description="Folder Size Explorer benchmark suite.")
+    parser.add_argument("--profiles", default=",".join(treegen.PROFILES),
+                        help=f"Comma-separated tree profiles (default: all of {', '.join(treegen.PROFILES)}).")
+    parser.add_argument("--benchmarks", default=",".join(DEFAULT_BENCHMARKS),
+                        help=f"Comma-separated benchmarks from {', '.join(BENCHMARKS)} (default: {','.join(DEFAULT_BENCHMARKS)}).")
+    parser.add_argument("--scale", type=float, default=1.0, help="Tree size multiplier (default: 1.0; 'tiny' at 10 has one million files).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0).")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; medians are reported (default: 3).")
+    parser.add_argument("--cold", action="store_true",
+                        help="Drop the OS caches before every run to measure cold-cache scans (Linux, needs root).")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 2, help="Worker processes for scan_processes.")
+    parser.add_argument("--async-concurrency", type=int, default=None, metavar="N",
+                        help="Directory reads in flight for scan_async (default: config.ASYNC_SCAN_CONCURRENCY; 1 reads one at a time).")
+    parser.add_argument("--latency-ms", type=float, default=0.0, metavar="MS",
+                        help="Delay injected before every open, listing and stat of scan_async, to simulate a network filesystem (default: 0).")
+    parser.add_argument("--tree-dir", default=None,
+                        help="Where to generate trees. Trees there are reused across runs; by default a temporary directory is used and deleted.")
+    parser.add_argument("--output", "-o", default="bench_results.json", help="Results file (default: bench_results.json).")
+    parser.add_argument("--baseline", default=None, help="Earlier results file to compare against.")
+    parser.add_argument("--fail-above", type=float, default=None, metavar="PCT",
+                        help="With --baseline: exit with status 1 if any metric got worse by more than PCT percent.")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    profiles = [p for p in args.profiles.split(",") if p]
+    names = [n for n in args.benchmarks.split(",") if n]
+    for unknown in set(profiles) - set(treegen.PROFILES) | set(names) - set(BENCHMARKS):
+        print(f"Unknown profile or benchmark: {unknown}", file=sys.stderr); return 2
+
+    if args.cold and not drop_page_cache():
+        print("--cold needs root on Linux (writes /proc/sys/vm/drop_caches)", file=sys.stderr); return 2
+
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    options = {"project_dir": project_dir, "processes": args.processes,
+               "async_concurrency": args.async_concurrency, "latency_ms": args.latency_ms}
+    tree_dir = args.tree_dir or tempfile.mkdtemp(prefix="fse-bench-")
+    os.makedirs(tree_dir, exist_ok=True)
+    results, warnings = {}, []
+    try:
+        for profile in profiles:
+            start = time.perf_counter()
+            manifest = treegen.load_or_generate(tree_dir, profile, args.scale, args.seed)
+            print(f"[{profile}] {manifest['entries']:,} entries ready in {time.perf_counter() - start:.1f}s")
+            results[profile] = {}
+            for name in names:
+                samples = []
+                for _ in range(max(1, args.repeat)):
+                    if args.cold: drop_page_cache()
+                    samples.append(run_isolated(name, manifest, options))
+                results[profile][name] = summary = summarize(samples)
+                warning = check_totals(name, manifest, summary)
+                if warning: warnings.append(warning)
+                shown = ", ".join(f"{k}={v:,.3f}" if isinstance(v, float) else f"{k}={v:,}" for k, v in summary.items())
+                print(f"  {name:<16} {shown}")
+    finally:
+        if not args.tree_dir: treegen.remove_tree(tree_dir)
+
+    document = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                         "platform": platform.platform(), "cpu_count": os.cpu_count(), "commit": _git_commit(project_dir),
+                         "scale": args.scale, "seed": args.seed, "repeat": args.repeat, "cold": args.cold,
+                         "latency_ms": args.latency_ms, "async_concurrency": args.async_concurrency},
+                "results": results, "warnings": warnings}
+    with open(args.output, "w", encoding="utf-8") as f: json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+    for warning in warnings: print(f"WARNING: {warning}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f: baseline_document = json.load(f)
+        baseline = baseline_document["results"]
+        baseline_meta = baseline_document.get("meta", {})
+        if (baseline_meta.get("scale"), baseline_meta.get("seed")) != (args.scale, args.seed):
+            print(f"WARNING: baseline used scale {baseline_meta.get('scale')}, seed {baseline_meta.get('seed')}; numbers are not comparable", file=sys.stderr)
+        regressions = 0
+        print(f"\nCompared with {args.baseline} (positive = worse):")
+        for profile, name, metric, old, new, change in compare(results, baseline):
+            flag = ""
+            if args.fail_above is not None and change > args.fail_above: flag = "  <-- regression"; regressions += 1
+            print(f"  {profile:<9} {name:<16} {metric:<22} {old:>14,.3f} -> {new:>14,.3f}  {change:+7.1f}%{flag}")
+        if regressions: return 1
+    return 1 if warnings else 0
+
+
+def _git_commit(project_dir):
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_dir,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# benchmarks/treegen.py
+# Reproducible synthetic directory trees for the benchmark suite. The same profile, scale
+# and seed always produce the same names, sizes and layout.
+import os
+import json
+import stat
+import random
+import shutil
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+class TreeBuilder:
+    """Creates files, folders and symlinks below a root and keeps the totals a correct scan must report."""
+    def __init__(self, root, seed):
+        self.root = root
+        self.rng = random.Random(seed)
+        self.files = 0
+        self.bytes = 0
+        self.dirs = 0
+        self.symlinks = 0
+        self.denied_files = 0 # Files inside directories made unreadable; a non-root scan cannot see them
+        self.denied_bytes = 0
+        self.denied_dirs = []
+        self.widest_dir = root
+        self._widest_count = -1
+        self._payload = os.urandom(64 * 1024)
+        os.makedirs(root, exist_ok=True)
+
+    def make_dir(self, path):
+        os.mkdir(path)
+        self.dirs += 1
+        return path
+
+    def make_file(self, path, size):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            remaining = size
+            while remaining > 0:
+                remaining -= os.write(fd, self._payload[:min(remaining, len(self._payload))])
+        finally:
+            os.close(fd)
+        self.files += 1
+        self.bytes += size
+
+    def make_symlink(self, target, path, target_is_directory=False):
+        try:
+            os.symlink(target, path, target_is_directory=target_is_directory)
+            self.symlinks += 1
+        except (OSError, NotImplementedError):
+            pass # Windows without the symlink privilege: the profile just has fewer links
+
+    def fill(self, folder, count, min_size, max_size, prefix="f"):
+        """Creates 'count' files with random sizes in [min_size, max_size] directly in 'folder'."""
+        for i in range(count):
+            self.make_file(os.path.join(folder, f"{prefix}{i:06d}.dat"), self.rng.randint(min_size, max_size))
+        self.note_width(folder, count)
+
+    def note_width(self, folder, entries):
+        if entries > self._widest_count: self.widest_dir, self._widest_count = folder, entries
+
+    def deny(self, folder):
+        """Makes 'folder' unreadable once everything inside it has been created."""
+        self.denied_dirs.append(folder)
+
+    def manifest(self, profile, scale, seed):
+        return {"profile": profile, "scale": scale, "seed": seed, "root": self.root,
+                "files": self.files, "bytes": self.bytes, "dirs": self.dirs, "symlinks": self.symlinks,
+                "entries": self.files + self.dirs + self.symlinks,
+                "denied_files": self.denied_files, "denied_bytes": self.denied_bytes,
+                "denied_dirs": self.denied_dirs, "widest_dir": self.widest_dir}
+
+
+# --- Profiles ---
+# Each takes (builder, scale) and lays out its tree below builder.root.
+
+def build_wide(b, scale):
+    """One huge flat directory plus many small sibling folders."""
+    b.fill(b.root, int(20000 * scale), 0, 16384)
+    for i in range(int(2000 * scale)):
+        b.fill(b.make_dir(os.path.join(b.root, f"dir{i:05d}")), 5, 0, 4096)
+    b.note_width(b.root, int(20000 * scale) + int(2000 * scale))
+
+def build_deep(b, scale):
+    """Several long chains of nested folders with a few files on every level."""
+    for chain in range(max(1, int(20 * scale))):
+        folder = b.make_dir(os.path.join(b.root, f"chain{chain:03d}"))
+        for level in range(200): # Depth is fixed so paths stay well below PATH_MAX
+            b.fill(folder, 3, 0, 2048)
+            folder = b.make_dir(os.path.join(folder, "d"))
+
+def build_tiny(b, scale):
+    """Lots of tiny files (1,000 per folder); scale 10 gives one million."""
+    for i in range(max(1, int(100 * scale))):
+        b.fill(b.make_dir(os.path.join(b.root, f"bucket{i:05d}")), 1000, 0, 64)
+
+def build_symlinks(b, scale):
+    """Folders where most entries are symlinks: to files, to folders, dangling, and loops to ancestors."""
+    count = max(1, int(200 * scale))
+    for i in range(count):
+        folder = b.make_dir(os.path.join(b.root, f"links{i:04d}"))
+        b.fill(folder, 10, 0, 8192)
+        for j in range(50):
+            link = os.path.join(folder, f"link{j:03d}")
+            kind = j % 4
+            if kind == 0: b.make_symlink(os.path.join(folder, f"f{j % 10:06d}.dat"), link)
+            elif kind == 1: b.make_symlink(b.root, link, target_is_directory=True) # Loop back to the root
+            elif kind == 2: b.make_symlink(os.path.join(folder, "missing"), link)
+            else: b.make_symlink(os.path.join(b.root, f"links{(i + 1) % count:04d}"), link, target_is_directory=True)
+        b.note_width(folder, 60)
+
+def build_denied(b, scale):
+    """A normal tree with unreadable pockets; totals below them are only visible to root."""
+    for i in range(max(1, int(50 * scale))):
+        folder = b.make_dir(os.path.join(b.root, f"area{i:04d}"))
+        b.fill(folder, 20, 0, 8192)
+        if i % 5 == 0:
+            pocket = b.make_dir(os.path.join(folder, "private"))
+            before_files, before_bytes = b.files, b.bytes
+            b.fill(pocket, 50, 0, 8192)
+            b.fill(b.make_dir(os.path.join(pocket, "nested")), 20, 0, 8192)
+            b.denied_files += b.files - before_files
+            b.denied_bytes += b.bytes - before_bytes
+            b.deny(pocket)
+
+PROFILES = {"wide": build_wide, "deep": build_deep, "tiny": build_tiny,
+            "symlinks": build_symlinks, "denied": build_denied}
+
+
+def generate(base_dir, profile, scale=1.0, seed=0):
+    """
+    Builds one profile's tree at base_dir/<profile> (replacing any previous one) and returns its
+    manifest, which is also written to base_dir/<profile>.manifest.json for reuse.
+    """
+    root = os.path.join(base_dir, profile)
+    if os.path.exists(root): remove_tree(root)
+    builder = TreeBuilder(root, seed)
+    PROFILES[profile](builder, scale)
+    for folder in builder.denied_dirs: os.chmod(folder, 0)
+    manifest = builder.manifest(profile, scale, seed)
+    with open(root + MANIFEST_SUFFIX, "w", encoding="utf-8") as f: json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_or_generate(base_dir, profile, scale=1.0, seed=0):
+    """Reuses an existing tree if its manifest matches profile, scale and seed; otherwise generates it."""
+    try:
+        with open(os.path.join(base_dir, profile) + MANIFEST_SUFFIX, encoding="utf-8") as f: manifest = json.load(f)
+        if (manifest["scale"], manifest["seed"]) == (scale, seed) and os.path.isdir(manifest["root"]): return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    return generate(base_dir, profile, scale, seed)
+
+
+def remove_tree(path):
+    """Deletes a generated tree, restoring permissions on denied pockets first."""
+    for folder, dirnames, _files in os.walk(path):
+        for name in dirnames:
+            child = os.path.join(folder, name)
+            if not os.path.islink(child): os.chmod(child, stat.S_IRWXU)
+    shutil.rmtree(path)
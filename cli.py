@@ -0,0 +1,340 @@
+# cli.py
+# Headless command-line interface. Must never import tkinter (directly or through app.py),
+# so it starts quickly and works on servers without a display.
+import os
+import sys
+import csv
+import json
+import heapq
+import queue
+import argparse
+import config # Import the configuration constants
+import utils
+import scanner
+import parallel_scan
+import async_scan
+import scan_options
+import snapshot
+import scan_file
+import largest_items
+
+RECORD_FIELDS = ("path", "size", "files", "dirs", "depth")
+DIFF_FIELDS = ("path", "old_size", "new_size", "growth", "old_files", "new_files")
+LARGEST_FIELDS = ("kind", "path", "size")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="main.py", description=f"{config.APP_TITLE} {config.APP_VERSION} (command-line mode)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="Scan a folder and print per-directory totals.")
+    scan.add_argument("path", help="Folder to scan.")
+    scan.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl).")
+    scan.add_argument("--max-depth", type=int, default=None, metavar="N",
+                      help="Only report directories at most N levels below PATH (totals still include everything).")
+    scan.add_argument("--top", type=int, default=None, metavar="N",
+                      help="Only report the N largest directories, largest first (buffers instead of streaming).")
+    scan.add_argument("--jobs", type=int, default=config.SCAN_MAX_WORKERS, metavar="N",
+                      help=f"Number of subfolders scanned in parallel (default: {config.SCAN_MAX_WORKERS}).")
+    add_scan_option_arguments(scan)
+    scan.add_argument("--output", "-o", default="-", help="Output file (default: standard output).")
+
+    largest = subparsers.add_parser("largest", help="Scan a folder and list the largest files and folders anywhere below it.")
+    largest.add_argument("path", help="Folder to scan.")
+    largest.add_argument("--top", type=int, default=config.LARGEST_ITEMS_COUNT, metavar="N",
+                         help=f"Number of files and of folders to list (default: {config.LARGEST_ITEMS_COUNT}).")
+    largest.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl).")
+    add_scan_option_arguments(largest)
+    largest.add_argument("--output", "-o", default="-", help="Output file (default: standard output).")
+
+    save = subparsers.add_parser("snapshot", help="Scan a folder and save its per-directory totals as a snapshot file.")
+    save.add_argument("path", help="Folder to scan.")
+    save.add_argument("snapshot", help=f"Snapshot file to write (e.g. daily{config.SNAPSHOT_FILE_EXTENSION}).")
+    add_scan_option_arguments(save)
+
+    export = subparsers.add_parser("export", help="Scan a folder and save the complete result as a memory-mapped scan file.")
+    export.add_argument("path", help="Folder to scan.")
+    export.add_argument("scan_file", help=f"Scan file to write (e.g. home{config.SCAN_FILE_EXTENSION}).")
+    add_scan_option_arguments(export)
+
+    query = subparsers.add_parser("query", help="Print folder totals from a scan file without rescanning.")
+    query.add_argument("scan_file", help="Scan file written by 'export' or the GUI.")
+    query.add_argument("folder", nargs="?", default=None,
+                       help="Folder inside the scan to report, absolute or relative to the scanned folder (default: the scanned folder).")
+    query.add_argument("--max-depth", type=int, default=1, metavar="N",
+                       help="Report directories at most N levels below FOLDER (default: 1, its subfolders).")
+    query.add_argument("--top", type=int, default=None, metavar="N",
+                       help="Only report the N largest directories anywhere below FOLDER, largest first.")
+    query.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl).")
+    query.add_argument("--output", "-o", default="-", help="Output file (default: standard output).")
+
+    diff = subparsers.add_parser("diff", help="Compare two snapshots and list the directories that grew the most.")
+    diff.add_argument("old", help="Older snapshot file.")
+    diff.add_argument("new", help="Newer snapshot file.")
+    diff.add_argument("--top", type=int, default=20, metavar="N", help="Number of directories to list (default: 20).")
+    diff.add_argument("--max-depth", type=int, default=None, metavar="N",
+                      help="Only consider directories at most N levels below the snapshot root.")
+    diff.add_argument("--shrunk", action="store_true", help="List the directories that shrank the most instead.")
+    diff.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl).")
+    diff.add_argument("--output", "-o", default="-", help="Output file (default: standard output).")
+    return parser
+
+
+def add_scan_option_arguments(parser):
+    """Adds the options that control how folders are walked, shared by 'scan', 'largest', 'snapshot' and 'export'."""
+    parser.add_argument("--disk-usage", action="store_true",
+                        help="Report allocated disk usage (st_blocks) with hard-linked files counted once, like du, instead of apparent sizes.")
+    parser.add_argument("--one-file-system", "-x", action="store_true",
+                        help="Do not descend into directories on other filesystems (like du -x).")
+    parser.add_argument("--include-pseudo-fs", action="store_true",
+                        help="Also descend into pseudo filesystems such as /proc and /sys (skipped by default).")
+    parser.add_argument("--backend", choices=("threads", "processes", "asyncio"), default=config.SCAN_BACKEND,
+                        help="Walk subfolders in threads, split each walk across worker processes, or overlap many directory "
+                             f"reads with asyncio for network filesystems (default: {config.SCAN_BACKEND}).")
+    parser.add_argument("--processes", type=int, default=config.SCAN_PROCESSES, metavar="N",
+                        help=f"Worker processes for --backend processes (default: {config.SCAN_PROCESSES}).")
+    parser.add_argument("--concurrency", type=int, default=config.ASYNC_SCAN_CONCURRENCY, metavar="N",
+                        help=f"Directory reads kept in flight per walk with --backend asyncio (default: {config.ASYNC_SCAN_CONCURRENCY}).")
+
+
+def scan_options_from_args(args):
+    return scan_options.ScanOptions(scan_options.SIZE_MODE_DISK if args.disk_usage else scan_options.SIZE_MODE_APPARENT,
+                                    one_file_system=args.one_file_system,
+                                    excluded_fs_types=() if args.include_pseudo_fs else None)
+
+
+class RecordWriter:
+    """Writes directory records as JSON Lines or CSV, flushing after each so output streams."""
+    def __init__(self, out, fmt, fields=RECORD_FIELDS):
+        self.out = out
+        self.fmt = fmt
+        self.fields = fields
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(out)
+            self._csv.writerow(fields)
+
+    def write(self, record):
+        if self._csv is not None: self._csv.writerow([record[field] for field in self.fields])
+        else: self.out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.out.flush()
+
+
+def scan_command(args, out):
+    """Scans args.path with one job per top-level subfolder and writes a record per directory."""
+    root_path = os.path.abspath(args.path)
+    if not os.path.isdir(root_path):
+        print(f"Error: not a directory: {root_path}", file=sys.stderr)
+        return 2
+
+    options = scan_options_from_args(args)
+    boundary = scan_options.ScanBoundary(options, root_path)
+    # One link set for the whole run, so a file hard-linked into several subfolders is counted
+    # once in the total (the first subfolder to reach it gets its bytes, as with du)
+    sizer = scan_options.FileSizer(options)
+
+    # The folder's own files are summed here; every subfolder becomes one scan job
+    own_bytes = own_files = 0
+    subfolders = []
+    skipped_dirs = 0 # Mount points the options keep the scan out of
+    try:
+        own_bytes += sizer.directory_bytes(os.stat(root_path))
+        with os.scandir(root_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        own_bytes += sizer.file_bytes(entry.stat(follow_symlinks=False))
+                        own_files += 1
+                    elif entry.is_dir(follow_symlinks=False):
+                        if boundary.allows(entry.path, entry.stat(follow_symlinks=False)): subfolders.append(entry.path)
+                        else: skipped_dirs += 1
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Error: cannot list {root_path}: {e}", file=sys.stderr)
+        return 1
+
+    writer = RecordWriter(out, args.format)
+    top_heap = [] # (size, path, record) of the N largest directories when --top is given
+    top_count = None if args.top is None else max(1, args.top)
+    child_depth_limit = None if args.max_depth is None else args.max_depth - 1
+
+    def emit(record):
+        if top_count is None:
+            writer.write(record)
+        elif len(top_heap) < top_count:
+            heapq.heappush(top_heap, (record["size"], record["path"], record))
+        elif record["size"] > top_heap[0][0]:
+            heapq.heapreplace(top_heap, (record["size"], record["path"], record))
+
+    # With the process backend each subfolder is scanned by every worker process in turn
+    pool = parallel_scan.ProcessScanPool(args.processes) if args.backend == "processes" else None
+    results = queue.Queue()
+    def scan_job(folder_path):
+        tree = None
+        try:
+            if pool: tree = pool.scan(folder_path, options=options, seen_links=sizer.seen_links)
+            elif args.backend == "asyncio":
+                tree = async_scan.scan_folder_tree(folder_path, options=options, seen_links=sizer.seen_links, concurrency=args.concurrency)
+            else: tree = utils.scan_folder_tree(folder_path, options=options, seen_links=sizer.seen_links)
+        finally: results.put(tree)
+
+    scheduler = scanner.ScanScheduler(max(1, args.jobs))
+    for folder_path in subfolders: scheduler.submit(scan_job, folder_path)
+
+    total_bytes, total_files, total_dirs = own_bytes, own_files, len(subfolders) + skipped_dirs
+    for _ in subfolders:
+        tree = results.get()
+        if tree is None: continue # Inaccessible subfolder
+        total_bytes += tree.total_size()
+        total_files += tree.file_count()
+        total_dirs += tree.dir_count()
+        if child_depth_limit is None or child_depth_limit >= 0:
+            for path, size, files, dirs, depth in tree.iter_directories(child_depth_limit):
+                emit({"path": path, "size": size, "files": files, "dirs": dirs, "depth": depth + 1})
+
+    if pool: pool.shutdown()
+    emit({"path": root_path, "size": total_bytes, "files": total_files, "dirs": total_dirs, "depth": 0})
+    for _size, _path, record in sorted(top_heap, reverse=True):
+        writer.write(record)
+    return 0
+
+
+def scan_single_tree(root_path, args, options, largest=None):
+    """Walks root_path as one tree with the backend chosen on the command line."""
+    if args.backend == "processes":
+        pool = parallel_scan.ProcessScanPool(args.processes)
+        try: return pool.scan(root_path, options=options, largest=largest)
+        finally: pool.shutdown()
+    if args.backend == "asyncio":
+        return async_scan.scan_folder_tree(root_path, options=options, largest=largest, concurrency=args.concurrency)
+    return utils.scan_folder_tree(root_path, options=options, largest=largest)
+
+
+def largest_command(args, out):
+    """Scans args.path once and writes its largest files, then its largest folders, largest first."""
+    root_path = os.path.abspath(args.path)
+    if not os.path.isdir(root_path):
+        print(f"Error: not a directory: {root_path}", file=sys.stderr)
+        return 2
+    largest = largest_items.LargestItems(args.top)
+    if scan_single_tree(root_path, args, scan_options_from_args(args), largest) is None:
+        print(f"Error: cannot scan {root_path}", file=sys.stderr)
+        return 1
+    writer = RecordWriter(out, args.format, LARGEST_FIELDS)
+    for kind, items in (("file", largest.files()), ("folder", largest.folders())):
+        for size, path in items: writer.write({"kind": kind, "path": path, "size": size})
+    return 0
+
+
+def snapshot_command(args):
+    """Scans args.path as a single walk and saves it as a snapshot file."""
+    root_path = os.path.abspath(args.path)
+    if not os.path.isdir(root_path):
+        print(f"Error: not a directory: {root_path}", file=sys.stderr)
+        return 2
+    tree = scan_single_tree(root_path, args, scan_options_from_args(args))
+    if tree is None:
+        print(f"Error: cannot scan {root_path}", file=sys.stderr)
+        return 1
+    try: count = snapshot.write_snapshot(tree, args.snapshot)
+    except OSError as e:
+        print(f"Error: cannot write {args.snapshot}: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.snapshot}: {count:,} directories, {utils.format_size(tree.total_size())} in {tree.file_count():,} files", file=sys.stderr)
+    return 0
+
+
+def export_command(args):
+    """Scans args.path as a single walk and saves the whole tree as a scan file."""
+    root_path = os.path.abspath(args.path)
+    if not os.path.isdir(root_path):
+        print(f"Error: not a directory: {root_path}", file=sys.stderr)
+        return 2
+    tree = scan_single_tree(root_path, args, scan_options_from_args(args))
+    if tree is None:
+        print(f"Error: cannot scan {root_path}", file=sys.stderr)
+        return 1
+    try: count = scan_file.write_scan_file(tree, args.scan_file)
+    except OSError as e:
+        print(f"Error: cannot write {args.scan_file}: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.scan_file}: {count:,} directories, {utils.format_size(tree.total_size())} in {tree.file_count():,} files", file=sys.stderr)
+    return 0
+
+
+def query_command(args, out):
+    """Writes folder totals read from a memory-mapped scan file: a folder and its subfolders, or its largest descendants."""
+    try: tree = scan_file.open_scan_file(args.scan_file)
+    except (OSError, scan_file.ScanFileError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    try:
+        # FOLDER may be absolute or relative to the scanned folder
+        index = 0 if args.folder is None else tree.find(os.path.join(tree.root_path, args.folder))
+        if index is None:
+            print(f"Error: {args.folder} is not in the scan of {tree.root_path}", file=sys.stderr)
+            return 2
+        writer = RecordWriter(out, args.format)
+        if args.top is not None:
+            for node in tree.top_folders(max(1, args.top), index):
+                depth, parent = 0, node
+                while parent != index:
+                    parent = tree.parents[parent]
+                    depth += 1
+                writer.write(_tree_record(tree, node, depth))
+            return 0
+        stack = [(index, 0)]
+        while stack:
+            node, depth = stack.pop()
+            writer.write(_tree_record(tree, node, depth))
+            if args.max_depth is None or depth < args.max_depth:
+                stack.extend((child, depth + 1) for child in reversed(tree.children(node)))
+        return 0
+    finally:
+        tree.close()
+
+
+def _tree_record(tree, index, depth):
+    return {"path": tree.path_of(index), "size": tree.total_size(index), "files": tree.file_count(index),
+            "dirs": tree.dir_count(index), "depth": depth}
+
+
+def diff_command(args, out):
+    """Streams two snapshots and writes the directories with the largest growth (or shrinkage)."""
+    try:
+        old_header, new_header = snapshot.read_header(args.old), snapshot.read_header(args.new)
+        if old_header["options"] != new_header["options"]:
+            print(f"Warning: snapshots were taken with different scan options ({old_header['options']} vs {new_header['options']})", file=sys.stderr)
+        changes = snapshot.top_changes(args.old, args.new, max(1, args.top), args.max_depth, shrinking=args.shrunk)
+    except (OSError, snapshot.SnapshotError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    writer = RecordWriter(out, args.format, DIFF_FIELDS)
+    root_path = new_header["root"]
+    for relative_path, before, after, delta in changes:
+        writer.write({"path": os.path.join(root_path, *relative_path.split("/")) if relative_path else root_path,
+                      "old_size": before[0] if before else None, "new_size": after[0] if after else None, "growth": delta,
+                      "old_files": before[1] if before else None, "new_files": after[1] if after else None})
+    return 0
+
+
+def main(argv=None):
+    """Entry point for `python main.py <command> ...`. Returns a process exit code."""
+    args = build_parser().parse_args(argv)
+    output = getattr(args, "output", "-")
+    out = sys.stdout if output == "-" else open(output, "w", newline="", encoding="utf-8")
+    try:
+        if args.command == "scan": return scan_command(args, out)
+        if args.command == "largest": return largest_command(args, out)
+        if args.command == "snapshot": return snapshot_command(args)
+        if args.command == "export": return export_command(args)
+        if args.command == "query": return query_command(args, out)
+        if args.command == "diff": return diff_command(args, out)
+        return 2
+    except BrokenPipeError:
+        return 0 # Output piped into e.g. `head`
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        if out is not sys.stdout: out.close()
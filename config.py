@@ -38,9 +38,105 @@ LIST_ANCHORS = {"name": "w", "size": "e"}
 LIST_WIDTHS = {"name": 400, "size": 100} # Adjusted name width
 LIST_STRETCH = {"name": True, "size": False} # Allow Name to stretch
 
+# Virtualized content views only create Tk items for the visible rows plus this margin
+VIRTUAL_VIEW_MARGIN_ROWS = 5
+VIRTUAL_VIEW_WHEEL_ROWS = 3 # Rows scrolled per mouse wheel notch
+
+
+# --- Scanning ---
+# Upper bound on concurrent folder size walks. Wide directories queue their work instead of
+# spawning one thread per subfolder, which would thrash the disk and the GIL.
+SCAN_MAX_WORKERS = max(2, min(8, os.cpu_count() or 2))
+# How folder walks run: "threads" (one walk per scan worker thread), "processes"
+# (each walk is split across a pool of SCAN_PROCESSES worker processes, which scales
+# past the GIL on many-core machines; see parallel_scan.py) or "asyncio" (each walk keeps
+# ASYNC_SCAN_CONCURRENCY directory reads in flight, for NFS/SMB/FUSE mounts where every
+# call waits on the network; see async_scan.py)
+SCAN_BACKEND = "threads"
+SCAN_PROCESSES = os.cpu_count() or 2
+ASYNC_SCAN_CONCURRENCY = 32 # Directory reads one asyncio walk keeps in flight
+ASYNC_SCAN_THREADS = 64 # Threads running those reads, shared by all asyncio walks
+ASYNC_SCAN_STAT_BATCH = 64 # Files of one directory stat'ed per job, so large directories are read in parallel too
+# What folder sizes measure: "apparent" (sum of file sizes) or "disk" (allocated blocks with
+# hard-linked files counted once, like du). Switchable at runtime under Tools.
+SIZE_MODE = "apparent"
+# Stay on the scanned folder's filesystem, like `du -x` (also under Tools)
+SCAN_ONE_FILE_SYSTEM = False
+# Mount points of these filesystem types are never descended into: their contents are
+# generated by the kernel, not stored on disk (Linux; read from /proc/self/mountinfo)
+SCAN_EXCLUDED_FS_TYPES = frozenset({
+    "proc", "sysfs", "devtmpfs", "devpts", "cgroup", "cgroup2", "debugfs", "tracefs", "securityfs",
+    "pstore", "bpf", "configfs", "fusectl", "mqueue", "hugetlbfs", "binfmt_misc", "autofs",
+    "efivarfs", "selinuxfs", "nsfs", "rpc_pipefs", "nfsd", "fuse.gvfsd-fuse", "fuse.portal",
+})
+
+# Scan diagnostics: metrics of the most recent folder size jobs are kept for the
+# diagnostics window, each with its slowest directories.
+METRICS_HISTORY = 500
+METRICS_SLOWEST_DIRS = 10
+# Profile every scan job with cProfile (also switchable under Tools > Profile Scans).
+# Stats files are written to SCAN_PROFILE_DIR.
+SCAN_PROFILE_ENABLED = False
+SCAN_PROFILE_DIR = os.path.join(os.path.expanduser("~"), ".folder_size_explorer", "profiles")
+
+# Directory listings are read off the main thread and shown in chunks of this many rows,
+# or whatever has been read after LISTING_FLUSH_INTERVAL seconds on a slow filesystem.
+LISTING_CHUNK_SIZE = 500
+LISTING_FLUSH_INTERVAL = 0.1
+# Seconds between running-total reports while a large folder is still being walked
+SCAN_PROGRESS_INTERVAL = 0.5
+# Results from scan workers are applied on the Tk main thread in batches: every
+# UI_PUMP_INTERVAL_MS, for at most UI_PUMP_BUDGET_MS per tick.
+UI_PUMP_INTERVAL_MS = 50
+UI_PUMP_BUDGET_MS = 15
+
+# --- Persistent Size Index ---
+# Aggregated folder sizes are kept in a local SQLite database so they survive restarts.
+SIZE_INDEX_ENABLED = True
+SIZE_INDEX_PATH = os.path.join(os.path.expanduser("~"), ".folder_size_explorer", "size_index.sqlite3")
+SIZE_INDEX_MAX_ENTRIES = 1000000 # Least recently used directories are evicted beyond this
+SIZE_INDEX_VALIDATE_SUBTREE = True # Also re-check the mtime of every indexed subfolder before trusting a size
+
+# --- Treemap View ---
+# Level of detail: nothing narrower than TREEMAP_MIN_SIDE pixels is laid out (small siblings
+# are merged into one block) and a layout stops after TREEMAP_MAX_RECTS rectangles.
+TREEMAP_MIN_SIDE = 4
+TREEMAP_MAX_RECTS = 4000
+TREEMAP_PADDING = 2 # Border between a folder's outline and its contents
+TREEMAP_HEADER = 14 # Caption strip above a folder's contents, when it fits
+TREEMAP_LABEL_MIN_WIDTH = 50 # Rectangles narrower than this get no caption
+TREEMAP_RELAYOUT_DELAY_MS = 150 # Wait for resizing to settle before laying out again
+# Top-level folders cycle through these colors; deeper levels are lighter shades
+TREEMAP_COLORS = ("#4e79a7", "#f28e2b", "#e15759", "#76b7b2", "#59a14f", "#edc948", "#b07aa1", "#ff9da7", "#9c755f", "#bab0ac")
+TREEMAP_FILES_COLOR = "#d9d9d9"
+TREEMAP_OTHER_COLOR = "#f0f0f0"
+
+# --- Largest Items ---
+# Entries listed by Tools > Largest Items (and the CLI's `largest` command); the walk keeps
+# only this many files and folders in memory however big the tree is.
+LARGEST_ITEMS_COUNT = 50
+
+# --- Snapshots ---
+# Saved scans (see snapshot.py) are gzip-compressed; 1-9, higher is smaller but slower to write
+SNAPSHOT_COMPRESS_LEVEL = 6
+SNAPSHOT_FILE_EXTENSION = ".fsesnap.gz"
+SNAPSHOT_DIFF_TOP = 100 # Directories listed when comparing snapshots
+
+# --- Scan Files ---
+# Complete scan results (see scan_file.py), memory-mapped when opened instead of being parsed
+SCAN_FILE_EXTENSION = ".fsescan"
+SCAN_FILE_MAX_CHILDREN = 2000 # Subfolders listed per folder in the scan file browser; the rest are summarized in one row
+
+# --- In-Memory Caches ---
+# Recently visited directories are kept in memory so Back/Up/re-selection is instantaneous.
+LISTING_CACHE_MAX_ENTRIES = 500000 # Total directory entries across all cached listings
+SIZE_CACHE_MAX_NODES = 5000000 # Total directories across all cached subtree walks
+NAV_CACHE_MAX_ENTRIES = 500000 # Total subfolder names across cached navigation tree listings
+NAV_PROBE_CACHE_MAX_ENTRIES = 200000 # Folders remembered as having / not having subfolders
 
 # --- Formatting ---
 SIZE_UNITS = ["B", "KB", "MB", "GB", "TB"]
+SIZE_GROWING_FORMAT = "≥ {size}…" # Partial size of a folder that is still being walked
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # --- UI Text ---
@@ -48,6 +144,7 @@ DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 DUMMY_NODE_TEXT = "..."
 STATUS_READY = "Ready"
 STATUS_LOADING = "Loading {name}..."
+STATUS_LISTING = "Loading {name}... {count:,} items"
 STATUS_CALCULATING = "Calculating {count} folder size{plural}..."
 STATUS_PERM_ERROR = "Ready (permission denied for some items)"
 STATUS_ACCESS_ERROR = "Ready (error accessing some items)"
@@ -67,3 +164,27 @@ WARN_BROKEN_LINK_TITLE = "Broken Link"
 WARN_BROKEN_LINK_MSG = "Could not resolve symbolic link target:\n{path}"
 INFO_SYMLINK_TITLE = "Symbolic Link Target"
 INFO_SYMLINK_MSG = "Target:\n{target_path}"
+CONFIRM_CLEAR_INDEX_TITLE = "Clear Size Index"
+CONFIRM_CLEAR_INDEX_MSG = "Delete all {count} stored folder sizes?\n\nFolders will be scanned again the next time they are shown."
+CACHE_STATS_TITLE = "Cache Statistics"
+INFO_INDEX_DISABLED_MSG = "The persistent size index is disabled or could not be opened."
+TREEMAP_SCANNING = "Scanning... {size} in {files:,} files, {dirs:,} folders"
+LARGEST_ITEMS_TITLE = "Largest Items"
+LARGEST_ITEMS_STATUS = "Scanning... {size} in {files:,} files, {dirs:,} folders"
+SNAPSHOT_SAVE_TITLE = "Save Scan Snapshot"
+SNAPSHOT_OPEN_OLD_TITLE = "Compare Snapshots: Older Snapshot"
+SNAPSHOT_OPEN_NEW_TITLE = "Compare Snapshots: Newer Snapshot"
+SNAPSHOT_DIFF_TITLE = "Snapshot Comparison"
+STATUS_SNAPSHOT_SCANNING = "Scanning {name} for snapshot..."
+STATUS_SNAPSHOT_SAVED = "Snapshot of {name} saved ({count:,} folders)"
+ERROR_SNAPSHOT_TITLE = "Snapshot Error"
+SCAN_FILE_SAVE_TITLE = "Save Scan File"
+SCAN_FILE_OPEN_TITLE = "Open Scan File"
+STATUS_SCAN_FILE_SCANNING = "Scanning {name} for scan file..."
+STATUS_SCAN_FILE_SAVED = "Scan file of {name} saved ({count:,} folders)"
+ERROR_SCAN_FILE_TITLE = "Scan File Error"
+DIAGNOSTICS_TITLE = "Scan Diagnostics"
+DIAGNOSTICS_EXPORT_TITLE = "Export Scan Metrics"
+DIAGNOSTICS_SUMMARY = ("{jobs:,} jobs ({walks:,} walks, {index_hits:,} from the size index, {cancelled:,} cancelled)   "
+                       "{dirs:,} dirs, {files:,} files, {size}\n{stat_calls:,} stat calls, {errors:,} errors, "
+                       "{wall:.2f} s wall, {cpu:.2f} s CPU")
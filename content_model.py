@@ -0,0 +1,181 @@
+# content_model.py
+from operator import attrgetter, itemgetter
+
+# Size sort keys for rows without a byte count; they sort below every real size
+SIZE_KEY_PENDING = -3 # Folder size still being calculated
+SIZE_KEY_ERROR = -2
+SIZE_KEY_UNKNOWN = -1 # Symlinks, inaccessible entries
+
+# Up to this many rows are moved with one list insert/delete each; larger batches are
+# merged in a single linear pass, which is cheaper once each insert's memmove adds up
+_SMALL_BATCH = 256
+
+class ContentRow:
+    """
+    One entry of the content view. Attribute names 'name', 'size', 'type' and 'modified'
+    match the content column identifiers from config and hold the display strings, so a
+    row can be rendered for any view. Alongside them the row keeps native sort keys
+    (raw bytes, mtime in ns, lower-cased text), so sorting never re-parses display strings.
+    """
+    __slots__ = ("path", "name", "size", "type", "modified", "tags",
+                 "name_key", "size_key", "type_key", "modified_key")
+
+    def __init__(self, path, name, size, type_, modified, tags=(), size_key=SIZE_KEY_UNKNOWN, mtime_ns=None):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.type = type_
+        self.modified = modified
+        self.tags = tags
+        self.name_key = name.lower()
+        self.size_key = size_key
+        self.type_key = type_.lower()
+        self.modified_key = mtime_ns if mtime_ns is not None else float("-inf")
+
+    def values_for(self, columns):
+        """Returns the display values for the given column identifiers, in order."""
+        return tuple(getattr(self, col) for col in columns)
+
+    def set_size(self, display_size, size_key):
+        self.size = display_size
+        self.size_key = size_key
+
+
+def sort_attribute(column):
+    """Returns the ContentRow attribute holding the sort key for a content column identifier."""
+    return f"{column}_key" if column in ("name", "size", "type", "modified") else "name_key"
+
+
+def _bisect(keys, key, descending, right):
+    """Binary search over 'keys' sorted ascending (or descending). Returns the leftmost/rightmost insertion point for 'key'."""
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        probe = keys[mid]
+        if descending: before = (key > probe) or (not right and key == probe)
+        else: before = (key < probe) or (not right and key == probe)
+        if before: hi = mid
+        else: lo = mid + 1
+    return lo
+
+
+class ContentModel:
+    """
+    In-memory list of every row in the current directory, in display order.
+    The widget showing it only materializes a window of these rows, so sorting and
+    updates here never touch Tk.
+
+    Once set_order() has been called the model stays sorted: a parallel list of key
+    snapshots allows new rows to be merged in and rows whose key changed (e.g. a folder
+    size arriving) to be moved by binary search instead of re-sorting everything.
+    Key changes are collected by update() and applied together by flush(), so many
+    updates in one UI tick cost one repositioning pass.
+    """
+    def __init__(self):
+        self.rows = []
+        self._keys = [] # Sort key snapshot of each row in self.rows (only while ordered)
+        self._by_path = {}
+        self._key_attr = None # None: rows stay in insertion order
+        self._descending = False
+        self._dirty = {} # row -> key snapshot it is filed under in self._keys
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, path):
+        return path in self._by_path
+
+    def clear(self):
+        """Drops every row; the current ordering stays in effect for rows added later."""
+        self.rows = []
+        self._keys = []
+        self._by_path = {}
+        self._dirty = {}
+
+    def get(self, path):
+        return self._by_path.get(path)
+
+    def position(self, path):
+        """Returns the display position of the row at 'path', or None."""
+        row = self._by_path.get(path)
+        if row is None: return None
+        if self._key_attr is not None and row not in self._dirty:
+            return self._find(row, getattr(row, self._key_attr))
+        try: return self.rows.index(row)
+        except ValueError: return None
+
+    def set_order(self, key_attr, descending=False):
+        """Fully sorts the rows by a ContentRow key attribute; later changes keep that order incrementally."""
+        self._key_attr = key_attr
+        self._descending = descending
+        self._dirty = {}
+        self.rows.sort(key=attrgetter(key_attr), reverse=descending)
+        self._keys = [getattr(row, key_attr) for row in self.rows]
+
+    def extend(self, rows):
+        """Adds rows, merging them into place if the model is ordered."""
+        new_rows = []
+        for row in rows:
+            if row.path in self._by_path: continue # Same entry listed twice (e.g. a reload raced a chunk)
+            self._by_path[row.path] = row
+            new_rows.append(row)
+        if self._key_attr is None:
+            self.rows.extend(new_rows)
+        else:
+            self._merge_in(new_rows)
+
+    def update(self, row, **changes):
+        """Sets attributes on a row; if its sort key changes, it is queued for repositioning by flush()."""
+        key_attr = self._key_attr
+        old_key = getattr(row, key_attr) if key_attr is not None else None
+        for attr, value in changes.items(): setattr(row, attr, value)
+        if key_attr is not None and row not in self._dirty and getattr(row, key_attr) != old_key:
+            self._dirty[row] = old_key
+
+    def has_pending_moves(self):
+        return bool(self._dirty)
+
+    def flush(self):
+        """Moves every row whose sort key changed since the last flush to its sorted position."""
+        if not self._dirty: return False
+        dirty, self._dirty = self._dirty, {}
+        # Take the moved rows out (by the key they are currently filed under), then merge them back in
+        positions = sorted(self._find(row, old_key) for row, old_key in dirty.items())
+        if len(positions) <= _SMALL_BATCH:
+            for position in reversed(positions):
+                del self.rows[position]; del self._keys[position]
+        else:
+            kept_rows, kept_keys, start = [], [], 0
+            for position in positions:
+                kept_rows.extend(self.rows[start:position]); kept_keys.extend(self._keys[start:position])
+                start = position + 1
+            kept_rows.extend(self.rows[start:]); kept_keys.extend(self._keys[start:])
+            self.rows, self._keys = kept_rows, kept_keys
+        self._merge_in(list(dirty))
+        return True
+
+    # --- Internals ---
+    def _find(self, row, key):
+        """Returns the position of 'row', which is filed under 'key' in self._keys."""
+        index = _bisect(self._keys, key, self._descending, right=False)
+        while self.rows[index] is not row: index += 1 # Walk past rows with an equal key
+        return index
+
+    def _merge_in(self, new_rows):
+        """Inserts rows at their sorted positions: one insert each for small batches, else one linear merge pass."""
+        if not new_rows: return
+        key_attr = self._key_attr
+        keyed = sorted(((getattr(row, key_attr), row) for row in new_rows), key=itemgetter(0), reverse=self._descending)
+        if len(keyed) <= _SMALL_BATCH:
+            for key, row in keyed:
+                position = _bisect(self._keys, key, self._descending, right=True)
+                self.rows.insert(position, row); self._keys.insert(position, key)
+            return
+        merged_rows, merged_keys, start = [], [], 0
+        for key, row in keyed:
+            position = _bisect(self._keys, key, self._descending, right=True)
+            merged_rows.extend(self.rows[start:position]); merged_keys.extend(self._keys[start:position])
+            merged_rows.append(row); merged_keys.append(key)
+            start = position
+        merged_rows.extend(self.rows[start:]); merged_keys.extend(self._keys[start:])
+        self.rows, self._keys = merged_rows, merged_keys
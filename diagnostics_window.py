@@ -0,0 +1,139 @@
+# diagnostics_window.py
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+import config # Import configuration constants
+import utils
+
+REFRESH_MS = 1000
+JOB_COLUMNS = (("path", "Folder", 260), ("outcome", "Result", 80), ("wall", "Wall", 70), ("cpu", "CPU", 70),
+               ("dirs", "Dirs", 70), ("files", "Files", 80), ("size", "Size", 80), ("stats", "Stat Calls", 80), ("errors", "Errors", 60))
+
+_open_window = None # Only one diagnostics window at a time
+
+
+def _format_seconds(seconds):
+    return "-" if seconds is None else f"{seconds:.2f} s"
+
+
+def show_diagnostics_window(parent_window, metrics_log):
+    """
+    Displays the (non-modal) Scan Diagnostics window for a scan_metrics.MetricsLog: totals over
+    recent folder size jobs, one row per job, and details of the selected job (errors by kind,
+    slowest directories, profile file). Refreshes itself while open.
+
+    Args:
+        parent_window: The parent tk.Tk or tk.Toplevel window.
+        metrics_log: The MetricsLog the application records its scan jobs in.
+    """
+    global _open_window
+    if _open_window is not None and _open_window.winfo_exists():
+        _open_window.deiconify(); _open_window.lift()
+        return
+
+    diag_win = tk.Toplevel(parent_window)
+    diag_win.title(config.DIAGNOSTICS_TITLE)
+    diag_win.geometry("900x520")
+    diag_win.transient(parent_window)
+    _open_window = diag_win
+
+    frame = ttk.Frame(diag_win, padding="10")
+    frame.pack(expand=True, fill=tk.BOTH)
+
+    # Totals
+    summary_var = tk.StringVar()
+    ttk.Label(frame, textvariable=summary_var, anchor=tk.W, justify=tk.LEFT).pack(fill=tk.X, pady=(0, 8))
+
+    # Jobs, most recent first
+    panes = ttk.PanedWindow(frame, orient=tk.VERTICAL)
+    panes.pack(expand=True, fill=tk.BOTH)
+    jobs_frame = ttk.Frame(panes)
+    panes.add(jobs_frame, weight=3)
+    jobs_tree = ttk.Treeview(jobs_frame, columns=[c[0] for c in JOB_COLUMNS], show="headings", selectmode="browse")
+    for col, heading, width in JOB_COLUMNS:
+        jobs_tree.heading(col, text=heading)
+        jobs_tree.column(col, width=width, stretch=(col == "path"), anchor=tk.W if col == "path" else tk.E)
+    jobs_vsb = ttk.Scrollbar(jobs_frame, orient="vertical", command=jobs_tree.yview)
+    jobs_tree.configure(yscrollcommand=jobs_vsb.set)
+    jobs_tree.grid(row=0, column=0, sticky="nsew")
+    jobs_vsb.grid(row=0, column=1, sticky="ns")
+    jobs_frame.grid_rowconfigure(0, weight=1)
+    jobs_frame.grid_columnconfigure(0, weight=1)
+
+    # Details of the selected job
+    details = tk.Text(panes, height=10, wrap="none", state=tk.DISABLED)
+    panes.add(details, weight=2)
+
+    shown = {} # iid -> ScanMetrics currently listed
+
+    def show_details(event=None):
+        selection = jobs_tree.selection()
+        metrics = shown.get(selection[0]) if selection else None
+        lines = []
+        if metrics is not None:
+            lines.append(metrics.path)
+            lines.append(f"Source: {metrics.source}   Backend: {metrics.backend or '-'}   Result: {metrics.outcome or 'running'}")
+            cpu = f"{metrics.cpu_s:.2f} s" if metrics.cpu_s is not None else "-"
+            if metrics.worker_cpu_s:
+                workers = "executor threads" if metrics.backend == "asyncio" else "worker processes"
+                cpu += f" (+ {metrics.worker_cpu_s:.2f} s in {workers})"
+            lines.append(f"Wall time: {_format_seconds(metrics.wall_s)}   CPU time: {cpu}")
+            lines.append(f"Directories: {metrics.dirs:,}   Files: {metrics.files:,}   Size: {utils.format_size(metrics.bytes)}   Stat calls: {metrics.stat_calls:,}")
+            if metrics.errors:
+                lines.append("Errors: " + ", ".join(f"{kind} × {count:,}" for kind, count in sorted(metrics.errors.items())))
+            if metrics.profile_path: lines.append(f"Profile: {metrics.profile_path}")
+            slowest = metrics.slowest_dirs()
+            if slowest:
+                lines.append("")
+                lines.append("Slowest directories:")
+                lines.extend(f"  {seconds * 1000:9.1f} ms  {path}" for seconds, path in slowest)
+        details.configure(state=tk.NORMAL)
+        details.delete("1.0", tk.END)
+        details.insert("1.0", "\n".join(lines))
+        details.configure(state=tk.DISABLED)
+
+    def refresh():
+        if not diag_win.winfo_exists(): return
+        summary = metrics_log.summary()
+        errors = sum(summary["errors"].values())
+        summary_var.set(config.DIAGNOSTICS_SUMMARY.format(jobs=summary["jobs"], walks=summary["walks"], index_hits=summary["index_hits"],
+                                                          cancelled=summary["cancelled"], dirs=summary["dirs"], files=summary["files"],
+                                                          size=utils.format_size(summary["bytes"]), stat_calls=summary["stat_calls"],
+                                                          errors=errors, wall=summary["wall_s"], cpu=summary["cpu_s"]))
+        selected = jobs_tree.selection()
+        scrolled_to = jobs_tree.yview()[0]
+        jobs_tree.delete(*jobs_tree.get_children(''))
+        shown.clear()
+        for metrics in metrics_log.snapshot():
+            iid = str(id(metrics))
+            shown[iid] = metrics
+            jobs_tree.insert("", tk.END, iid=iid, values=(metrics.path, metrics.outcome or "running", _format_seconds(metrics.wall_s),
+                                                           _format_seconds(metrics.total_cpu_s()), f"{metrics.dirs:,}", f"{metrics.files:,}",
+                                                           utils.format_size(metrics.bytes), f"{metrics.stat_calls:,}", sum(metrics.errors.values())))
+        if selected and selected[0] in shown: jobs_tree.selection_set(selected[0])
+        jobs_tree.yview_moveto(scrolled_to)
+        show_details()
+        diag_win.after(REFRESH_MS, refresh)
+
+    def export_json():
+        file_path = filedialog.asksaveasfilename(parent=diag_win, title=config.DIAGNOSTICS_EXPORT_TITLE, defaultextension=".json",
+                                                 filetypes=[("JSON", "*.json"), ("All files", "*.*")], initialfile="scan_metrics.json")
+        if not file_path: return
+        try: metrics_log.export_json(file_path)
+        except OSError as e: messagebox.showerror(config.DIAGNOSTICS_EXPORT_TITLE, f"Could not write {file_path}:\n{e}", parent=diag_win)
+
+    def clear():
+        metrics_log.clear()
+        jobs_tree.delete(*jobs_tree.get_children(''))
+        shown.clear()
+        show_details()
+
+    jobs_tree.bind("<<TreeviewSelect>>", show_details)
+
+    # Buttons
+    button_frame = ttk.Frame(frame)
+    button_frame.pack(fill=tk.X, pady=(8, 0))
+    ttk.Button(button_frame, text="Export JSON...", command=export_json).pack(side=tk.LEFT)
+    ttk.Button(button_frame, text="Clear", command=clear).pack(side=tk.LEFT, padx=(5, 0))
+    ttk.Button(button_frame, text="Close", command=diag_win.destroy).pack(side=tk.RIGHT)
+
+    refresh()
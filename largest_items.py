@@ -0,0 +1,82 @@
+# largest_items.py
+import heapq
+import threading
+import config # Import the configuration constants
+
+
+class LargestItems:
+    """
+    The N largest files and N largest folders found by a walk, kept in two bounded min-heaps
+    so memory stays O(N) however many entries the walked tree has.
+
+    Walks feed it as they go (see utils.scan_folder_tree and parallel_scan): files one by one,
+    folders from the finished ScanTree, since a folder's total is only known once its whole
+    subtree has been read (until then the UI may show folders from an older cached walk). file_threshold lets a walk skip the call for the vast majority of
+    files that cannot make the list. Thread-safe; the UI polls version and reads sorted copies.
+    """
+    def __init__(self, count=None):
+        self.count = max(1, count or config.LARGEST_ITEMS_COUNT)
+        self.file_threshold = -1 # Size a file must exceed to be kept once the file heap is full
+        self.version = 0 # Incremented on every change
+        self.progress = (0, 0, 0) # Running (bytes, files, dirs) of the walk, set by its progress callback
+        self.outcome = None # "done", "cancelled" or "failed" once the walk has ended
+        self._files = [] # Min-heap of (size, path)
+        self._folders = []
+        self._lock = threading.Lock()
+
+    def add_file(self, size, path):
+        if size <= self.file_threshold: return
+        with self._lock:
+            self._push(self._files, (size, path))
+            if len(self._files) >= self.count: self.file_threshold = self._files[0][0]
+            self.version += 1
+
+    def add_files(self, items):
+        """Adds (size, path) pairs, e.g. the list a worker process collected."""
+        for size, path in items: self.add_file(size, path)
+
+    def add_tree_folders(self, tree, index=0):
+        """
+        Sets the folder list to the largest folders below node 'index' of a finalized ScanTree (not
+        the folder itself), replacing any earlier list, e.g. one filled from an older cached walk.
+        """
+        # Select node indexes first; only the winners' paths need to be rebuilt
+        winners = tree.top_folders(self.count, index)
+        folders = []
+        for node in winners: self._push(folders, (tree.sizes[node], tree.path_of(node)))
+        with self._lock:
+            self._folders = folders
+            self.version += 1
+
+    def clear_files(self):
+        """Forgets the files found so far, for a walk that starts over."""
+        with self._lock:
+            self._files = []
+            self.file_threshold = -1
+            self.version += 1
+
+    def set_progress(self, size_bytes, file_count, dir_count):
+        self.progress = (size_bytes, file_count, dir_count)
+        self.version += 1
+
+    def finish(self, outcome):
+        self.outcome = outcome
+        self.version += 1
+
+    def files(self):
+        """The largest files so far as (size, path), largest first."""
+        with self._lock: return sorted(self._files, reverse=True)
+
+    def folders(self):
+        """The largest folders as (size, path), largest first."""
+        with self._lock: return sorted(self._folders, reverse=True)
+
+    def _push(self, heap, item):
+        if len(heap) < self.count: heapq.heappush(heap, item)
+        elif item > heap[0]: heapq.heapreplace(heap, item)
+
+
+def collect_file(heap, count, size, path):
+    """Bounded min-heap push for walks that keep their own heap of (size, path), such as worker processes."""
+    if len(heap) < count: heapq.heappush(heap, (size, path))
+    elif size > heap[0][0]: heapq.heapreplace(heap, (size, path))
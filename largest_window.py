@@ -0,0 +1,101 @@
+# largest_window.py
+import os
+import tkinter as tk
+from tkinter import ttk
+import config # Import configuration constants
+import utils
+
+REFRESH_MS = 250
+
+
+def show_largest_items_window(parent_window, folder_path, largest, on_close=None, on_open_folder=None):
+    """
+    Displays the (non-modal) Largest Items window for a walk of folder_path that is feeding a
+    largest_items.LargestItems. The lists are redrawn whenever the walk has added to them, so
+    the biggest files show up while the scan is still running; folders follow once it is done.
+
+    Args:
+        parent_window: The parent tk.Tk or tk.Toplevel window.
+        folder_path: The folder being walked.
+        largest: The LargestItems the walk reports to.
+        on_close: Optional callback when the window is closed (e.g. to cancel the walk).
+        on_open_folder: Optional callback(path) for double-clicking a row; files open their folder.
+    """
+    items_win = tk.Toplevel(parent_window)
+    items_win.title(f"{config.LARGEST_ITEMS_TITLE} - {folder_path}")
+    items_win.geometry("760x520")
+    items_win.transient(parent_window)
+
+    frame = ttk.Frame(items_win, padding="10")
+    frame.pack(expand=True, fill=tk.BOTH)
+
+    status_var = tk.StringVar()
+    ttk.Label(frame, textvariable=status_var, anchor=tk.W).pack(fill=tk.X, pady=(0, 8))
+
+    notebook = ttk.Notebook(frame)
+    notebook.pack(expand=True, fill=tk.BOTH)
+
+    def make_table(title):
+        tab = ttk.Frame(notebook)
+        notebook.add(tab, text=title)
+        table = ttk.Treeview(tab, columns=("size", "path"), show="headings", selectmode="browse")
+        table.heading("size", text="Size")
+        table.heading("path", text="Path")
+        table.column("size", width=90, stretch=False, anchor=tk.E)
+        table.column("path", width=600, stretch=True, anchor=tk.W)
+        vsb = ttk.Scrollbar(tab, orient="vertical", command=table.yview)
+        table.configure(yscrollcommand=vsb.set)
+        table.grid(row=0, column=0, sticky="nsew")
+        vsb.grid(row=0, column=1, sticky="ns")
+        tab.grid_rowconfigure(0, weight=1)
+        tab.grid_columnconfigure(0, weight=1)
+        return table
+
+    files_table = make_table("Files")
+    folders_table = make_table("Folders")
+    shown_version = [-1]
+
+    def fill(table, items):
+        selected = table.selection()
+        table.delete(*table.get_children(''))
+        for size, path in items:
+            table.insert("", tk.END, iid=path, values=(utils.format_size(size), path))
+        if selected and table.exists(selected[0]): table.selection_set(selected[0])
+
+    def refresh():
+        if not items_win.winfo_exists(): return
+        if largest.version != shown_version[0]:
+            shown_version[0] = largest.version
+            fill(files_table, largest.files())
+            fill(folders_table, largest.folders())
+            size_bytes, file_count, dir_count = largest.progress
+            if largest.outcome is None:
+                status_var.set(config.LARGEST_ITEMS_STATUS.format(size=utils.format_size(size_bytes), files=file_count, dirs=dir_count))
+            elif largest.outcome == "done":
+                status_var.set(f"{largest.count} largest files and folders below {folder_path}")
+            else:
+                status_var.set(f"Scan {largest.outcome}; showing what was found before it stopped")
+        if largest.outcome is None or largest.version != shown_version[0]:
+            items_win.after(REFRESH_MS, refresh)
+
+    def open_selected(event):
+        table = event.widget
+        selection = table.selection()
+        if not selection or on_open_folder is None: return
+        path = selection[0]
+        folder = path if table is folders_table else os.path.dirname(path)
+        if os.path.isdir(folder): on_open_folder(folder)
+
+    def close():
+        if on_close: on_close()
+        items_win.destroy()
+
+    files_table.bind("<Double-1>", open_selected)
+    folders_table.bind("<Double-1>", open_selected)
+    items_win.protocol("WM_DELETE_WINDOW", close)
+
+    button_frame = ttk.Frame(frame)
+    button_frame.pack(fill=tk.X, pady=(8, 0))
+    ttk.Button(button_frame, text="Close", command=close).pack(side=tk.RIGHT)
+
+    refresh()
@@ -1,10 +1,14 @@
 # main.py
-import tkinter as tk
-from tkinter import font
-from app import FolderExplorerApp # Import the main application class
-# import config # Only import if needed for main setup (e.g., initial font size)
+import sys
+# tkinter and the GUI modules are only imported when the GUI is started, so the
+# command-line mode (`python main.py scan PATH`) works on hosts without Tk or a display.
+
+
+def run_gui():
+    import tkinter as tk
+    from tkinter import font
+    from app import FolderExplorerApp # Import the main application class
 
-if __name__ == "__main__":
     # Create the main application window
     root = tk.Tk()
 
@@ -24,3 +28,11 @@ if __name__ == "__main__":
 
     # Start the Tkinter event loop to run the application
     root.mainloop()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Any arguments select the headless command-line mode
+        import cli
+        sys.exit(cli.main(sys.argv[1:]))
+    run_gui()
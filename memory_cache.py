@@ -0,0 +1,89 @@
+# memory_cache.py
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by total weight rather than key count.
+
+    weight_func(value) gives the cost of an entry (e.g. number of rows in a listing); once
+    the summed weight exceeds max_weight the least recently used entries are evicted.
+    Hit, miss and eviction counters are kept for inspection via stats().
+    """
+    def __init__(self, max_weight, weight_func=None, name="cache"):
+        self.name = name
+        self.max_weight = max_weight
+        self._weight_func = weight_func or (lambda value: 1)
+        self._entries = OrderedDict() # key -> (value, weight)
+        self._lock = threading.Lock()
+        self._total_weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, is_valid=None):
+        """
+        Returns the cached value for key, or None on a miss.
+        If is_valid is given and returns False for the cached value, the entry is dropped
+        and the lookup counts as a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and is_valid is not None and not is_valid(entry[0]):
+                self._remove_locked(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key):
+        """Returns the cached value without touching recency or the counters."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def record_miss(self):
+        """Counts a miss for lookups resolved outside get() (e.g. via peek())."""
+        with self._lock:
+            self.misses += 1
+
+    def put(self, key, value):
+        weight = self._weight_func(value)
+        with self._lock:
+            if key in self._entries: self._remove_locked(key)
+            if weight > self.max_weight: return # Would evict everything else and still not fit
+            self._entries[key] = (value, weight)
+            self._total_weight += weight
+            while self._total_weight > self.max_weight:
+                oldest_key = next(iter(self._entries))
+                self._remove_locked(oldest_key)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries: self._remove_locked(key)
+
+    def keys(self):
+        """Returns a snapshot list of the cached keys, least recently used first."""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_weight = 0
+
+    def stats(self):
+        """Returns a dict of counters describing the cache's current state."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"name": self.name, "entries": len(self._entries), "weight": self._total_weight,
+                    "max_weight": self.max_weight, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": (self.hits / lookups) if lookups else 0.0}
+
+    def _remove_locked(self, key):
+        _value, weight = self._entries.pop(key)
+        self._total_weight -= weight
@@ -0,0 +1,69 @@
+# mounts.py
+# Mount table access for mount-aware scanning. Only Linux exposes /proc/self/mountinfo; on
+# other systems the table is empty and scans rely on st_dev comparisons alone.
+import os
+import re
+
+MOUNTINFO_PATH = "/proc/self/mountinfo"
+
+# mountinfo escapes space, tab, newline and backslash in paths as \\ooo octal sequences
+_OCTAL_ESCAPE = re.compile(r"\\([0-7]{3})")
+
+
+class MountInfo:
+    """One line of /proc/self/mountinfo."""
+    __slots__ = ("mount_point", "fs_type", "source", "device")
+
+    def __init__(self, mount_point, fs_type, source, device):
+        self.mount_point = mount_point
+        self.fs_type = fs_type
+        self.source = source
+        self.device = device # "major:minor"
+
+    def __repr__(self):
+        return f"MountInfo({self.mount_point!r}, {self.fs_type!r}, {self.source!r})"
+
+
+def _unescape(field):
+    return _OCTAL_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+
+def parse_mountinfo(text):
+    """Parses the contents of a mountinfo file into a list of MountInfo, in mount order."""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split(" ")
+        try:
+            separator = fields.index("-", 6) # Optional fields end with a lone "-"
+            mounts.append(MountInfo(_unescape(fields[4]), fields[separator + 1], _unescape(fields[separator + 2]), fields[2]))
+        except (ValueError, IndexError):
+            continue # Malformed line
+    return mounts
+
+
+def read_mounts(path=MOUNTINFO_PATH):
+    """Returns the current mount table, or an empty list where mountinfo is unavailable."""
+    try:
+        with open(path, encoding="utf-8", errors="surrogateescape") as f: return parse_mountinfo(f.read())
+    except OSError:
+        return []
+
+
+def excluded_mount_points(fs_types, under=None, mounts=None):
+    """
+    Returns the set of mount points whose filesystem type is in fs_types, optionally only those
+    strictly below the folder 'under' (given as a real path). A walk skips these directories
+    entirely; the folder being scanned is never excluded itself.
+    A mount point that was later over-mounted by an allowed filesystem is not excluded.
+    """
+    if not fs_types: return frozenset()
+    mounts = read_mounts() if mounts is None else mounts
+    current_type = {}
+    for mount in mounts: current_type[mount.mount_point] = mount.fs_type # Later mounts shadow earlier ones
+    prefix = os.path.join(os.path.normpath(under), '') if under else None
+    excluded = set()
+    for mount_point, fs_type in current_type.items():
+        if fs_type not in fs_types: continue
+        if prefix is not None and not (mount_point.startswith(prefix) and len(mount_point) > len(prefix)): continue
+        excluded.add(mount_point)
+    return frozenset(excluded)
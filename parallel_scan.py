@@ -0,0 +1,301 @@
+# parallel_scan.py
+import os
+import time
+import heapq
+import queue
+import itertools
+import contextlib
+import threading
+import multiprocessing
+import config # Import the configuration constants
+import scan_tree
+import scan_options
+import largest_items
+
+# Records a worker buffers before sending them to the parent process
+_RECORD_BATCH = 1024
+# A worker only donates part of its stack once it holds at least this many directories
+_MIN_DONATION = 2
+# Stands in for os.scandir() on directories a worker does not enter
+_NO_ENTRIES = contextlib.nullcontext(())
+
+
+def _worker_main(task_queue, result_queue, active_scan, idle_workers):
+    """
+    (Worker Process) Walks work units forever. A unit is a list of directory paths; the
+    worker walks them depth-first with a local stack and sends back one record per directory
+    (path, own bytes, own file count, device, inode, mtime_ns, linked files).
+    In disk usage mode, files with several hard links are not summed by the worker but listed
+    as (device, inode, allocated bytes) so the parent can count each of them once per scan.
+
+    Alongside the records, each unit's 'done' message carries its counters for ScanMetrics:
+    stat calls, errors by kind, its slowest directories and the CPU time it used, and, when
+    the scan asks for its largest files, the unit's own bounded heap of (size, path).
+
+    Load balancing: whenever another worker sits idle, the busy worker donates the older
+    half of its stack (the shallowest, usually largest directories) to the shared task
+    queue as a new unit, so very uneven subtrees spread across all processes.
+    idle_workers counts the idle workers no task has been queued for yet: a worker adds
+    itself before waiting, and whoever queues a task (a donor or the parent) claims one,
+    so each idle worker gets exactly one donation however long it takes to dequeue it.
+
+    The visited set that stops bind mount cycles is per unit; _build_tree drops directories
+    that several units reached.
+    """
+    pid = os.getpid()
+    unit_counter = itertools.count()
+    while True:
+        with idle_workers.get_lock(): idle_workers.value += 1
+        task = task_queue.get()
+        if task is None: return # Pool shutdown
+        scan_id, unit_id, paths, settings = task
+        disk_usage, device, excluded, top_files = settings
+        if active_scan.value != scan_id: continue # Scan was cancelled or finished meanwhile
+
+        stack = list(paths)
+        visited = set()
+        records = []
+        spawned = []
+        stat_calls = 0
+        errors = {}
+        slowest = [] # Min-heap of (seconds, path)
+        largest = [] # Min-heap of (size, path), at most top_files long
+        cpu_started = time.thread_time()
+        while stack:
+            if active_scan.value != scan_id: break
+            # Hand work to idle workers before diving deeper
+            if idle_workers.value > 0 and len(stack) >= _MIN_DONATION and _claim_idle_worker(idle_workers):
+                half = len(stack) // 2
+                donated, stack = stack[:half], stack[half:]
+                child_id = (pid, next(unit_counter))
+                spawned.append(child_id)
+                task_queue.put((scan_id, child_id, donated, settings))
+
+            current_path = stack.pop()
+            own_bytes = own_files = 0
+            dev = ino = mtime_ns = None
+            linked = None
+            dir_started = time.perf_counter()
+            fd = None
+            try:
+                stat_calls += 1
+                fd, dir_stat = scan_options.open_directory(current_path)
+                # Same boundary rules as scan_options.ScanBoundary.allows, inlined to keep tasks plain tuples.
+                # Directories not entered still get a (zero) record, matching the thread walk's nodes.
+                identity = (dir_stat.st_dev, dir_stat.st_ino)
+                enter = ((device is None or dir_stat.st_dev == device) and not (excluded and current_path in excluded)
+                         and identity not in visited)
+                if enter:
+                    visited.add(identity)
+                    dev, ino, mtime_ns = dir_stat.st_dev, dir_stat.st_ino, dir_stat.st_mtime_ns
+                    if disk_usage: own_bytes += scan_options.allocated_size(dir_stat)
+                prefix = current_path if current_path.endswith(os.sep) else current_path + os.sep
+                with (os.scandir(current_path if fd is None else fd) if enter else _NO_ENTRIES) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_file(follow_symlinks=False):
+                                stat_calls += 1
+                                entry_stat = entry.stat(follow_symlinks=False)
+                                own_files += 1
+                                if top_files:
+                                    item_bytes = scan_options.allocated_size(entry_stat) if disk_usage else entry_stat.st_size
+                                    largest_items.collect_file(largest, top_files, item_bytes, prefix + entry.name)
+                                if not disk_usage: own_bytes += entry_stat.st_size
+                                elif entry_stat.st_nlink > 1 and entry_stat.st_ino:
+                                    if linked is None: linked = []
+                                    linked.append((entry_stat.st_dev, entry_stat.st_ino, scan_options.allocated_size(entry_stat)))
+                                else: own_bytes += scan_options.allocated_size(entry_stat)
+                            elif entry.is_dir(follow_symlinks=False):
+                                stack.append(prefix + entry.name)
+                        except OSError as e:
+                            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                            continue
+            except OSError as e:
+                # Unreadable directories still get a (zero) record so the tree keeps the node
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+            finally:
+                if fd is not None: os.close(fd)
+            elapsed = time.perf_counter() - dir_started
+            if len(slowest) < config.METRICS_SLOWEST_DIRS: heapq.heappush(slowest, (elapsed, current_path))
+            elif elapsed > slowest[0][0]: heapq.heapreplace(slowest, (elapsed, current_path))
+            records.append((current_path, own_bytes, own_files, dev, ino, mtime_ns, linked))
+            if len(records) >= _RECORD_BATCH:
+                result_queue.put(("records", scan_id, records))
+                records = []
+        # 'done' is always the last message for a unit, so the parent has every record once it arrives
+        counters = (stat_calls, errors, slowest, time.thread_time() - cpu_started)
+        result_queue.put(("done", scan_id, unit_id, spawned, records, counters, largest))
+
+
+def _claim_idle_worker(idle_workers):
+    """Takes one idle worker for a task about to be queued; returns False if none is left."""
+    with idle_workers.get_lock():
+        if idle_workers.value <= 0: return False
+        idle_workers.value -= 1
+        return True
+
+
+class ProcessScanPool:
+    """
+    Persistent pool of worker processes that scans one folder at a time using all of them,
+    sidestepping the GIL on many-core machines. Results are merged in the parent into the
+    same ScanTree that utils.scan_folder_tree produces.
+
+    Completion is tracked per work unit: each 'done' message lists the units its worker
+    donated, so the parent knows the scan is finished exactly when every unit it has heard
+    of is done, regardless of the order messages from different processes arrive in.
+    """
+    def __init__(self, processes=None):
+        self.processes = max(1, processes or config.SCAN_PROCESSES)
+        # Workers are started from scan threads of the GUI: forking a process with threads
+        # that may hold locks can deadlock the child, so they start from a fresh interpreter
+        ctx = multiprocessing.get_context("spawn")
+        self._task_queue = ctx.Queue()
+        self._result_queue = ctx.Queue()
+        self._active_scan = ctx.Value('q', -1, lock=False)
+        self._idle_workers = ctx.Value('i', 0)
+        self._scan_ids = itertools.count()
+        self._scan_lock = threading.Lock() # One scan at a time owns every process
+        self._workers = [ctx.Process(target=_worker_main, name=f"scan-process-{i + 1}", daemon=True,
+                                     args=(self._task_queue, self._result_queue, self._active_scan, self._idle_workers))
+                         for i in range(self.processes)]
+        for worker in self._workers: worker.start()
+
+    def scan(self, folder_path, cancel_token=None, progress_callback=None, metrics=None, options=None, seen_links=None, largest=None):
+        """
+        Scans folder_path across all worker processes and returns a finalized ScanTree,
+        or None if it is not a directory. Raises scanner.ScanCancelled if cancel_token is cancelled.
+        progress_callback(bytes, files, dirs) is called with running totals as records arrive.
+        metrics (a scan_metrics.ScanMetrics) receives the counters the workers report.
+        options and seen_links select the size mode as in utils.scan_folder_tree.
+        largest (a largest_items.LargestItems) receives each unit's largest files as units
+        finish, and every folder's total once the tree is built.
+        """
+        options = options or scan_options.ScanOptions()
+        root_path = os.path.normpath(str(folder_path))
+        if not os.path.isdir(root_path): return None
+        with self._scan_lock:
+            scan_id = next(self._scan_ids)
+            self._active_scan.value = scan_id
+            try:
+                boundary = scan_options.ScanBoundary(options, root_path)
+                settings = (options.disk_usage, boundary.device, boundary.excluded, largest.count if largest is not None else 0)
+                records = self._collect(scan_id, root_path, settings, cancel_token, progress_callback, metrics, largest)
+            finally:
+                self._active_scan.value = -1
+        tree = _build_tree(root_path, records, scan_options.FileSizer(options, seen_links), options.key())
+        if largest is not None: largest.add_tree_folders(tree)
+        if metrics is not None: metrics.set_totals(tree.total_size(), tree.file_count(), tree.dir_count())
+        return tree
+
+    def shutdown(self):
+        self._active_scan.value = -1
+        for _ in self._workers: self._task_queue.put(None)
+        for worker in self._workers: worker.join(timeout=1)
+
+    def _collect(self, scan_id, root_path, settings, cancel_token, progress_callback, metrics, largest=None):
+        """Seeds the root unit and gathers records until every unit has reported done."""
+        root_unit = ("parent", 0)
+        with self._idle_workers.get_lock(): self._idle_workers.value -= 1 # The root unit claims a worker, possibly before one is idle
+        self._task_queue.put((scan_id, root_unit, [root_path], settings))
+        pending = {root_unit}
+        done_early = set() # Units whose 'done' arrived before their donor's
+        records = []
+        progress = None
+        if progress_callback:
+            import utils # Deferred: utils pulls in the thread-based walks, not needed by workers
+            progress = utils.ScanProgress(progress_callback)
+        running_bytes = running_files = 0
+        while pending or done_early:
+            if cancel_token is not None: cancel_token.raise_if_cancelled()
+            try: message = self._result_queue.get(timeout=0.1)
+            except queue.Empty: continue
+            if message[1] != scan_id: continue # Leftovers from an earlier, cancelled scan
+            if message[0] == "records":
+                batch = message[2]
+            else:
+                _kind, _scan_id, unit_id, spawned, batch, counters, unit_largest = message
+                if metrics is not None: metrics.merge_worker_counters(*counters)
+                if largest is not None: largest.add_files(unit_largest)
+                if unit_id in pending: pending.discard(unit_id)
+                else: done_early.add(unit_id)
+                for child_id in spawned:
+                    if child_id in done_early: done_early.discard(child_id)
+                    else: pending.add(child_id)
+            records.extend(batch)
+            if progress:
+                running_bytes += sum(record[1] for record in batch)
+                running_files += sum(record[2] for record in batch)
+                progress.maybe_report(running_bytes, running_files, max(0, len(records) - 1))
+        return records
+
+
+def _build_tree(root_path, records, sizer, options_key):
+    """
+    Merges per-directory records from all workers into a finalized ScanTree, counting each
+    linked file once. A directory whose (device, inode) was already added (a bind mount
+    reached by another unit) is kept as an empty node without its subtree, as the thread walk does.
+    """
+    tree = scan_tree.ScanTree(root_path, options_key)
+    index_of = {tree.root_path: 0}
+    visited = set() # (device, inode) of directories added with their contents
+    duplicates = set() # Paths of directories kept empty, whose subtrees are dropped
+    root_record = None
+    others = []
+    for record in records:
+        if record[0] == tree.root_path: root_record = record
+        else: others.append(record)
+    # Parents have fewer separators than their children, so this order adds parents first
+    others.sort(key=lambda record: record[0].count(os.sep))
+    for record in [root_record] * (root_record is not None) + others:
+        path, own_bytes, own_files, dev, ino, mtime_ns, linked = record
+        index = index_of.get(path)
+        if index is None:
+            parent_path = os.path.dirname(path)
+            if parent_path in duplicates:
+                duplicates.add(path)
+                continue
+            parent_index = index_of.get(parent_path)
+            if parent_index is None: continue # Parent skipped as an already-visited inode
+            index = tree.add_directory(parent_index, os.path.basename(path))
+            index_of[path] = index
+        if mtime_ns is not None:
+            if (dev, ino) in visited:
+                duplicates.add(path)
+                continue
+            visited.add((dev, ino))
+        if linked:
+            for link_dev, link_ino, allocated in linked:
+                if sizer.seen_links.add(link_dev, link_ino): own_bytes += allocated
+        tree.add_files(index, own_files, own_bytes)
+        if mtime_ns is not None: tree.set_identity(index, dev, ino, mtime_ns)
+    tree.finalize()
+    return tree
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+def get_shared_pool():
+    """Returns the process pool shared by the whole application, starting it on first use."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None: _shared_pool = ProcessScanPool(config.SCAN_PROCESSES)
+        return _shared_pool
+
+
+def scan_folder_tree(folder_path, cancel_token=None, progress_callback=None, backend=None, metrics=None, options=None, largest=None):
+    """
+    Backend-selecting front end for folder walks: 'threads' runs utils.scan_folder_tree in the
+    calling thread, 'processes' runs the walk on the shared ProcessScanPool and 'asyncio' runs
+    async_scan.scan_folder_tree, which overlaps many directory reads.
+    Defaults to config.SCAN_BACKEND.
+    """
+    backend = backend or config.SCAN_BACKEND
+    if backend == "processes":
+        return get_shared_pool().scan(folder_path, cancel_token, progress_callback, metrics, options, largest=largest)
+    if backend == "asyncio":
+        import async_scan
+        return async_scan.scan_folder_tree(folder_path, cancel_token, progress_callback, metrics, options, largest=largest)
+    import utils
+    return utils.scan_folder_tree(folder_path, cancel_token, progress_callback, metrics, options, largest=largest)
@@ -0,0 +1,123 @@
+# scan_file.py
+# Complete scan results saved in a binary file that is memory-mapped when opened, so even a
+# multi-GB result is queryable at once without being parsed. Must not import tkinter (used by the command line).
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import scan_tree
+
+MAGIC = b"FSESCAN\0"
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct("<8sII") # Magic, format version, length of the JSON header
+_ALIGNMENT = 8
+
+
+class ScanFileError(Exception):
+    """A scan file is missing, malformed, or was written by an incompatible platform."""
+
+
+def _aligned(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def write_scan_file(tree, file_path):
+    """
+    Saves a complete ScanTree as a scan file and returns the number of directories written.
+
+    Layout: a fixed preamble (magic, version, header length), a UTF-8 JSON header (root,
+    options, created, byte order, node count, and the offset, length and type of every
+    column), then the tree's storage columns (see scan_tree.COLUMNS) copied byte for byte,
+    each starting on an 8-byte boundary. Columns are in native byte order; the child index
+    is included so a reader never has to build anything.
+    """
+    columns = tree.columns()
+    sections = {}
+    offset = 0 # Relative to the end of the header, fixed up below
+    for name in scan_tree.COLUMNS:
+        column = columns[name]
+        itemsize = getattr(column, "itemsize", 1)
+        typecode = getattr(column, "typecode", None) or getattr(column, "format", "B")
+        sections[name] = [offset, len(column) * itemsize, typecode, itemsize]
+        offset = _aligned(offset + len(column) * itemsize)
+    header = {"root": tree.root_path, "options": tree.options_key, "created": time.time(),
+              "byteorder": sys.byteorder, "nodes": len(tree),
+              "wide_identities": [[index, device, inode] for index, (device, inode) in tree.wide_identities().items()]}
+    # Column offsets depend on the header length, which depends on the offsets: pad the header instead
+    base = 0
+    while True:
+        header["sections"] = {name: [base + start, length, typecode, itemsize] for name, (start, length, typecode, itemsize) in sections.items()}
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8", "surrogatepass")
+        needed = _aligned(_PREAMBLE.size + len(header_bytes))
+        if needed <= base: break
+        base = needed
+    header_bytes = header_bytes.ljust(base - _PREAMBLE.size)
+    with open(file_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name in scan_tree.COLUMNS:
+            start = header["sections"][name][0]
+            f.write(b"\0" * (start - f.tell()))
+            f.write(columns[name])
+    return len(tree)
+
+
+def read_header(file_path):
+    """Returns the header dict of a scan file. Raises ScanFileError or OSError."""
+    with open(file_path, "rb") as f:
+        return _parse_header(f.read(_PREAMBLE.size), f.read, file_path)
+
+
+def _parse_header(preamble, read, file_path):
+    try:
+        magic, version, length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC: raise ValueError("not a scan file")
+        if version != FORMAT_VERSION: raise ValueError(f"unsupported scan file version {version}")
+        header = json.loads(bytes(read(length)).decode("utf-8", "surrogatepass"))
+    except (ValueError, struct.error) as e:
+        raise ScanFileError(f"{file_path}: {e}") from None
+    if header.get("byteorder") != sys.byteorder:
+        raise ScanFileError(f"{file_path}: written on a {header.get('byteorder')}-endian system")
+    return header
+
+
+def open_scan_file(file_path):
+    """
+    Memory-maps a scan file and returns a read-only ScanTree served straight from it.
+    Only the header is read; pages of the columns are loaded by the OS as queries touch them,
+    so opening takes the same time whatever the size of the file. The header dict is kept as
+    tree.header. Call close() on the tree when done with it. Raises ScanFileError or OSError.
+    """
+    with open(file_path, "rb") as f:
+        header = _parse_header(f.read(_PREAMBLE.size), f.read, file_path)
+        size = os.fstat(f.fileno()).st_size
+        sections = _check_sections(header, size, file_path)
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    columns = {}
+    for name, (start, length, typecode) in sections.items():
+        column = view[start:start + length]
+        columns[name] = column if typecode == "B" else column.cast(typecode)
+    view.release()
+    wide_identities = {index: (device, inode) for index, device, inode in header.get("wide_identities", ())}
+    tree = scan_tree.ScanTree.from_columns(header["root"], header["options"], columns, wide_identities, mapping)
+    tree.header = header
+    return tree
+
+
+def _check_sections(header, file_size, file_path):
+    """Validates the column table of a header against the file before anything is mapped; returns {name: (start, length, typecode)}."""
+    sections = {}
+    try:
+        for name in scan_tree.COLUMNS:
+            start, length, typecode, itemsize = header["sections"][name]
+            if struct.calcsize(typecode) != itemsize or length % itemsize: raise ValueError(f"incompatible {name} column")
+            if start % _ALIGNMENT or start + length > file_size: raise ValueError(f"truncated or misaligned {name} column")
+            sections[name] = (start, length, typecode)
+        if sections["parents"][1] // header["sections"]["parents"][3] != header["nodes"]: raise ValueError("node count mismatch")
+        if not isinstance(header["root"], str) or "options" not in header: raise ValueError("no root or options")
+    except (KeyError, TypeError, ValueError, struct.error) as e:
+        raise ScanFileError(f"{file_path}: malformed scan file ({e})") from None
+    return sections
@@ -0,0 +1,99 @@
+# scan_file_window.py
+import os
+import time
+import heapq
+import tkinter as tk
+from tkinter import ttk
+import config # Import configuration constants
+import utils
+
+BROWSER_COLUMNS = (("size", "Size", 90), ("share", "% of Parent", 80), ("files", "Files", 90), ("dirs", "Folders", 80))
+PLACEHOLDER = "placeholder" # Tag of the dummy row that makes an unexpanded folder expandable
+
+
+def show_scan_file_window(parent_window, tree, file_path, on_open_folder=None):
+    """
+    Displays the (non-modal) browser of a scan file opened with scan_file.open_scan_file.
+    Folders expand like a file manager's tree, largest first. Rows are only created for a
+    folder when it is expanded, and every value is read straight from the mapped tree, so
+    even a scan with millions of folders opens at once. The tree is closed with the window.
+
+    Args:
+        parent_window: The parent tk.Tk or tk.Toplevel window.
+        tree: The memory-mapped ScanTree.
+        file_path: The scan file, for the title.
+        on_open_folder: Optional callback(path) for double-clicking a folder that exists on this machine.
+    """
+    browse_win = tk.Toplevel(parent_window)
+    browse_win.title(f"{config.SCAN_FILE_OPEN_TITLE} - {os.path.basename(file_path)}")
+    browse_win.geometry("760x560")
+    browse_win.transient(parent_window)
+
+    frame = ttk.Frame(browse_win, padding="10")
+    frame.pack(expand=True, fill=tk.BOTH)
+
+    header = getattr(tree, "header", {})
+    created = time.strftime("%Y-%m-%d %H:%M", time.localtime(header["created"])) if "created" in header else "unknown date"
+    summary = (f"{tree.root_path}   scanned {created} ({tree.options_key})\n"
+               f"{utils.format_size(tree.total_size())} in {tree.file_count():,} files, {tree.dir_count():,} folders")
+    ttk.Label(frame, text=summary, anchor=tk.W, justify=tk.LEFT).pack(fill=tk.X, pady=(0, 8))
+
+    table_frame = ttk.Frame(frame)
+    table_frame.pack(expand=True, fill=tk.BOTH)
+    table = ttk.Treeview(table_frame, columns=[c[0] for c in BROWSER_COLUMNS], selectmode="browse")
+    table.heading("#0", text="Folder")
+    table.column("#0", width=320, stretch=True)
+    for col, heading, width in BROWSER_COLUMNS:
+        table.heading(col, text=heading)
+        table.column(col, width=width, stretch=False, anchor=tk.E)
+    vsb = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
+    table.configure(yscrollcommand=vsb.set)
+    table.grid(row=0, column=0, sticky="nsew")
+    vsb.grid(row=0, column=1, sticky="ns")
+    table_frame.grid_rowconfigure(0, weight=1)
+    table_frame.grid_columnconfigure(0, weight=1)
+
+    def insert_node(parent_item, node, text, parent_size):
+        size = tree.total_size(node)
+        share = f"{size / parent_size:.1%}" if parent_size else "-"
+        item = table.insert(parent_item, tk.END, iid=str(node), text=text,
+                            values=(utils.format_size(size), share, f"{tree.file_count(node):,}", f"{tree.dir_count(node):,}"))
+        if tree.dir_count(node): table.insert(item, tk.END, text="...", tags=(PLACEHOLDER,))
+
+    def expand(event=None):
+        item = table.focus()
+        if not item: return
+        rows = table.get_children(item)
+        if not rows or PLACEHOLDER not in table.item(rows[0], "tags"): return # Already filled
+        table.delete(*rows)
+        node = int(item)
+        children = tree.children(node)
+        parent_size = tree.total_size(node)
+        shown = heapq.nlargest(config.SCAN_FILE_MAX_CHILDREN, children, key=tree.sizes.__getitem__)
+        for child in shown: insert_node(item, child, tree.name_of(child), parent_size)
+        if len(children) > len(shown):
+            rest = parent_size - sum(tree.total_size(child) for child in shown)
+            table.insert(item, tk.END, text=f"({len(children) - len(shown):,} smaller folders)", values=(utils.format_size(rest), "", "", ""))
+
+    def open_selected(event=None):
+        selection = table.selection()
+        if not selection or on_open_folder is None or not selection[0].isdigit(): return
+        folder_path = tree.path_of(int(selection[0]))
+        if os.path.isdir(folder_path): on_open_folder(folder_path)
+
+    def close():
+        browse_win.destroy()
+        tree.close()
+
+    table.bind("<<TreeviewOpen>>", expand)
+    table.bind("<Double-1>", open_selected)
+    browse_win.protocol("WM_DELETE_WINDOW", close)
+
+    insert_node("", 0, tree.root_path, 0)
+    table.item("0", open=True)
+    table.focus("0")
+    expand()
+
+    button_frame = ttk.Frame(frame)
+    button_frame.pack(fill=tk.X, pady=(8, 0))
+    ttk.Button(button_frame, text="Close", command=close).pack(side=tk.RIGHT)
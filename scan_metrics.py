@@ -0,0 +1,143 @@
+# scan_metrics.py
+import os
+import json
+import time
+import heapq
+import threading
+import contextlib
+import collections
+import config # Import the configuration constants
+
+
+class ScanMetrics:
+    """
+    What one folder size job cost: directories/files visited, bytes, stat calls, errors by
+    exception type, wall and CPU time, and the slowest individual directories. Filled in by
+    the walk (see utils.scan_folder_tree and parallel_scan) and finished by the job.
+    """
+    def __init__(self, path, backend=None):
+        self.path = str(path)
+        self.backend = backend
+        self.source = "walk" # "walk" or "index" (answered from the persistent size index)
+        self.outcome = None # "done", "cancelled", "failed"
+        self.dirs = 0
+        self.files = 0
+        self.bytes = 0
+        self.stat_calls = 0
+        self.errors = {} # Exception class name -> count
+        self.wall_s = None
+        self.cpu_s = None
+        self.worker_cpu_s = 0.0 # CPU time spent in worker processes (process backend) or executor threads (asyncio backend)
+        self.profile_path = None
+        self.started_at = time.time()
+        self._slowest = [] # Min-heap of (seconds, path), at most config.METRICS_SLOWEST_DIRS long
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def count_error(self, kind, count=1):
+        self.errors[kind] = self.errors.get(kind, 0) + count
+
+    def note_directory_time(self, path, seconds):
+        """Keeps 'path' if it is among the slowest directories listed so far."""
+        if len(self._slowest) < config.METRICS_SLOWEST_DIRS: heapq.heappush(self._slowest, (seconds, path))
+        elif seconds > self._slowest[0][0]: heapq.heapreplace(self._slowest, (seconds, path))
+
+    def merge_worker_counters(self, stat_calls, errors, slowest, cpu_s):
+        """Adds the counters one worker process reported for a work unit."""
+        self.stat_calls += stat_calls
+        for kind, count in errors.items(): self.count_error(kind, count)
+        for seconds, path in slowest: self.note_directory_time(path, seconds)
+        self.worker_cpu_s += cpu_s
+
+    def set_totals(self, size_bytes, file_count, dir_count):
+        self.bytes, self.files, self.dirs = size_bytes, file_count, dir_count
+
+    def finish(self, outcome):
+        self.outcome = outcome
+        self.wall_s = time.perf_counter() - self._wall_start
+        self.cpu_s = time.thread_time() - self._cpu_start
+
+    def total_cpu_s(self):
+        """CPU time of the job's own thread plus that of the workers it used, or None while running."""
+        return None if self.cpu_s is None else self.cpu_s + self.worker_cpu_s
+
+    def slowest_dirs(self):
+        """Returns [(seconds, path)], slowest first."""
+        return sorted(self._slowest, reverse=True)
+
+    def to_dict(self):
+        return {"path": self.path, "backend": self.backend, "source": self.source, "outcome": self.outcome,
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "dirs": self.dirs, "files": self.files, "bytes": self.bytes, "stat_calls": self.stat_calls,
+                "errors": dict(self.errors), "wall_s": self.wall_s, "cpu_s": self.cpu_s, "worker_cpu_s": self.worker_cpu_s,
+                "slowest_dirs": [{"path": path, "seconds": seconds} for seconds, path in self.slowest_dirs()],
+                "profile_path": self.profile_path}
+
+
+class MetricsLog:
+    """Thread-safe record of the most recent ScanMetrics, shown by the diagnostics window."""
+    def __init__(self, max_entries=None):
+        self._entries = collections.deque(maxlen=max_entries or config.METRICS_HISTORY)
+        self._lock = threading.Lock()
+
+    def add(self, metrics):
+        with self._lock: self._entries.append(metrics)
+
+    def snapshot(self):
+        """Returns the recorded metrics, most recent first."""
+        with self._lock: return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock: self._entries.clear()
+
+    def summary(self):
+        """Totals over every recorded job."""
+        entries = self.snapshot()
+        errors = collections.Counter()
+        for metrics in entries: errors.update(metrics.errors)
+        return {"jobs": len(entries), "walks": sum(1 for m in entries if m.source == "walk"),
+                "index_hits": sum(1 for m in entries if m.source == "index"),
+                "cancelled": sum(1 for m in entries if m.outcome == "cancelled"),
+                "dirs": sum(m.dirs for m in entries), "files": sum(m.files for m in entries),
+                "bytes": sum(m.bytes for m in entries), "stat_calls": sum(m.stat_calls for m in entries),
+                "errors": dict(errors), "wall_s": sum(m.wall_s or 0.0 for m in entries),
+                "cpu_s": sum(m.total_cpu_s() or 0.0 for m in entries)}
+
+    def export_json(self, file_path):
+        document = {"summary": self.summary(), "jobs": [metrics.to_dict() for metrics in self.snapshot()]}
+        with open(file_path, "w", encoding="utf-8") as f: json.dump(document, f, indent=2)
+
+
+# Only one profiler can be active at a time (and on Python 3.12+ it is process-wide), so at
+# most one scan is profiled at once; jobs starting meanwhile simply run unprofiled.
+_profile_lock = threading.Lock()
+
+@contextlib.contextmanager
+def profiled(metrics, enabled):
+    """
+    Runs the enclosed scan under cProfile if 'enabled' and no other scan is being profiled.
+    The stats are written to config.SCAN_PROFILE_DIR (open them with pstats or snakeviz)
+    and their path is stored in metrics.profile_path.
+    """
+    if not enabled or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    try:
+        try: profiler.enable()
+        except ValueError: # Another profiling tool (e.g. a debugger) is already active
+            yield
+            return
+        try: yield
+        finally: profiler.disable()
+        name = os.path.basename(os.path.normpath(metrics.path)) or "root"
+        safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+        file_path = os.path.join(config.SCAN_PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}.prof")
+        try:
+            os.makedirs(config.SCAN_PROFILE_DIR, exist_ok=True)
+            profiler.dump_stats(file_path)
+            metrics.profile_path = file_path
+        except OSError as e: print(f"Could not write scan profile {file_path}: {e}")
+    finally:
+        _profile_lock.release()
@@ -0,0 +1,139 @@
+# scan_options.py
+import os
+import stat
+import config # Import the configuration constants
+import inode_set
+import mounts
+
+SIZE_MODE_APPARENT = "apparent" # Sum of st_size, what file managers usually show
+SIZE_MODE_DISK = "disk" # Allocated blocks, like du
+SIZE_MODES = (SIZE_MODE_APPARENT, SIZE_MODE_DISK)
+
+# st_blocks only exists on POSIX; elsewhere allocated size falls back to st_size
+_HAS_BLOCKS = hasattr(os.stat_result, "st_blocks")
+
+
+def allocated_size(st):
+    """Bytes actually allocated on disk for a stat result (st_blocks is in 512-byte units on every platform that has it)."""
+    return st.st_blocks * 512 if _HAS_BLOCKS else st.st_size
+
+
+class ScanOptions:
+    """
+    How a walk measures folders. Results from walks with different options are not
+    interchangeable, so caches and the size index are keyed by key().
+
+    size_mode: SIZE_MODE_APPARENT sums st_size. SIZE_MODE_DISK sums allocated blocks
+    (sparse files count only what is allocated, directories count their own blocks) and
+    counts each multiply-linked file once per walk, like du.
+    one_file_system: never descend into a directory on another device than the scanned
+    folder (du -x).
+    excluded_fs_types: filesystem types (from /proc/self/mountinfo) whose mount points
+    below the scanned folder are skipped, e.g. proc and sysfs.
+    """
+    __slots__ = ("size_mode", "one_file_system", "excluded_fs_types")
+
+    def __init__(self, size_mode=None, one_file_system=None, excluded_fs_types=None):
+        self.size_mode = size_mode or config.SIZE_MODE
+        if self.size_mode not in SIZE_MODES: raise ValueError(f"Unknown size mode: {self.size_mode!r}")
+        self.one_file_system = config.SCAN_ONE_FILE_SYSTEM if one_file_system is None else one_file_system
+        self.excluded_fs_types = frozenset(config.SCAN_EXCLUDED_FS_TYPES if excluded_fs_types is None else excluded_fs_types)
+
+    @property
+    def disk_usage(self):
+        return self.size_mode == SIZE_MODE_DISK
+
+    def key(self):
+        # The excluded types normally come from config and only differ between runs, so they
+        # are left out; the index is re-validated on disk anyway
+        return self.size_mode + ("-x" if self.one_file_system else "")
+
+    def replace(self, **changes):
+        """Returns a copy with some attributes changed (options are never mutated in place)."""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return ScanOptions(**values)
+
+    def __repr__(self):
+        return (f"ScanOptions(size_mode={self.size_mode!r}, one_file_system={self.one_file_system!r}, "
+                f"excluded_fs_types={sorted(self.excluded_fs_types)!r})")
+
+
+# Directories are read through a file descriptor where the platform supports it: the directory's
+# own stat is an fstat of that descriptor and DirEntry.stat() becomes an fstatat relative to it,
+# so the kernel never resolves the full path again per entry. Elsewhere (Windows, where DirEntry
+# carries the stat data anyway) scandir is given the path.
+SCANDIR_FD = os.scandir in os.supports_fd and os.stat in os.supports_fd
+_DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0) | getattr(os, "O_CLOEXEC", 0)
+
+
+def open_directory(path):
+    """
+    Opens the directory at path for a walk. Returns (fd, dir_stat): fd is an open descriptor
+    to pass to os.scandir (the caller closes it), or None where scandir needs the path. An
+    unreadable directory still returns its stat with fd None, so os.scandir(path) raises as before.
+    Raises OSError if path cannot be stat'ed or is not a directory.
+    """
+    if SCANDIR_FD:
+        try: fd = os.open(path, _DIR_OPEN_FLAGS)
+        except PermissionError: fd = None
+        else:
+            try: return fd, os.fstat(fd)
+            except OSError:
+                os.close(fd)
+                raise
+    dir_stat = os.stat(path) # Follows a symlinked scan root, as scandir will; links below it are never pushed
+    if not stat.S_ISDIR(dir_stat.st_mode): raise NotADirectoryError(path)
+    return None, dir_stat
+
+
+class ScanBoundary:
+    """
+    Per-walk helper that decides which directories a walk may enter under the given options:
+    with one_file_system only those on the scanned folder's device, and never the mount
+    points of excluded filesystem types below the scanned folder.
+    """
+    __slots__ = ("device", "excluded")
+
+    def __init__(self, options, root_path, root_stat=None):
+        root_path = os.path.normpath(str(root_path))
+        self.device = None
+        if options.one_file_system:
+            self.device = (root_stat or os.stat(root_path)).st_dev
+        self.excluded = frozenset()
+        if options.excluded_fs_types:
+            # mountinfo lists real paths; map them back onto the path the walk is using
+            real_root = os.path.realpath(root_path)
+            excluded = mounts.excluded_mount_points(options.excluded_fs_types, under=real_root)
+            self.excluded = frozenset(os.path.join(root_path, os.path.relpath(mount_point, real_root)) for mount_point in excluded)
+
+    def allows(self, path, dir_stat):
+        """
+        True if the walk may list the directory at 'path'. dir_stat is its stat with symlinks
+        followed (see open_directory): only a symlinked scan root can be one, since the walks
+        never push symlinks found below it, and its target's device is the one compared.
+        """
+        if self.device is not None and dir_stat.st_dev != self.device: return False
+        return not self.excluded or path not in self.excluded
+
+
+class FileSizer:
+    """
+    Per-walk helper that returns the bytes a file contributes under the given options.
+    In disk usage mode a file with several hard links is only counted the first time one of
+    its (device, inode) pairs is seen; pass a shared InodeSet to de-duplicate across walks.
+    """
+    __slots__ = ("disk_usage", "seen_links")
+
+    def __init__(self, options, seen_links=None):
+        self.disk_usage = options.disk_usage
+        self.seen_links = (seen_links if seen_links is not None else inode_set.InodeSet()) if self.disk_usage else None
+
+    def file_bytes(self, st):
+        if not self.disk_usage: return st.st_size
+        if st.st_nlink > 1 and st.st_ino and not self.seen_links.add(st.st_dev, st.st_ino): return 0
+        return allocated_size(st)
+
+    def directory_bytes(self, st):
+        """A directory's own allocation: counted in disk usage mode only."""
+        return allocated_size(st) if self.disk_usage else 0
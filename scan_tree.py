@@ -0,0 +1,297 @@
+# scan_tree.py
+import os
+import heapq
+from array import array
+import scan_options
+
+NO_MTIME = -(1 << 63) # Stored in mtimes for directories that were never stat'ed
+_NAME_ENCODING = ("utf-8", "surrogatepass") # Round-trips every str os.scandir can return
+
+# Storage columns of a finalized tree, in the order scan_file writes them
+COLUMNS = ("parents", "sizes", "file_counts", "dir_counts", "mtimes", "devices", "inodes",
+           "name_ids", "name_offsets", "name_bytes", "child_offsets", "children")
+
+
+class ScanTree:
+    """
+    Result of a single walk over a folder's subtree.
+
+    Every directory visited gets an integer index (the scanned folder itself is index 0) and
+    a parent index. While walking, sizes and counts hold each directory's *own* files only;
+    finalize() then sums them bottom-up so every node holds its subtree totals.
+    Parents are always added before their children, which is what makes that single reverse
+    pass sufficient. options_key records the scan options the sizes were measured with (see scan_options).
+
+    Storage is column-wise in typed arrays (parents, sizes, file_counts, dir_counts, mtimes,
+    devices, inodes, name ids), so a node costs about 60 bytes plus its name and no Python
+    object is kept per directory. Names are interned: each distinct name is stored once as
+    UTF-8 in one byte buffer. Children are found through a compressed (CSR) child index
+    that lists each node's children sorted by name. finalize() builds it, so the walk's
+    thread pays for it rather than whichever thread looks up a folder first.
+
+    Queries only index and slice the columns, so a tree can also be served straight from
+    memoryviews over a memory-mapped scan file (see from_columns and scan_file).
+    """
+    def __init__(self, root_path, options_key=scan_options.SIZE_MODE_APPARENT):
+        self.root_path = os.path.normpath(str(root_path))
+        self.options_key = options_key
+        self.parents = array('i')
+        self.sizes = array('Q')
+        self.file_counts = array('Q')
+        self.dir_counts = array('Q')
+        self.mtimes = array('q') # st_mtime_ns of each directory, NO_MTIME until it has been stat'ed
+        self.devices = array('Q')
+        self.inodes = array('Q')
+        self._wide_identities = {} # index -> (device, inode) for values that do not fit in 64 bits
+        self.name_ids = array('I')
+        self._name_bytes = bytearray() # Distinct names, UTF-8, back to back
+        self._name_offsets = array('Q', (0,)) # Name id i spans _name_bytes[offsets[i]:offsets[i + 1]]
+        self._name_to_id = {} # Only while building; dropped by finalize()
+        self._child_offsets = None # CSR child index: children of i are _children[offsets[i]:offsets[i + 1]]
+        self._children = None
+        self.finalized = False
+        self._mapping = None # Buffer the columns view, for trees built by from_columns
+        self.add_directory(-1, self.root_path)
+
+    @classmethod
+    def from_columns(cls, root_path, options_key, columns, wide_identities=None, mapping=None):
+        """
+        Builds a read-only, finalized tree over existing columns (a dict keyed by COLUMNS of
+        array-like buffers, e.g. memoryviews into a mapped file). Nothing is copied; mapping is
+        the object the buffers come from and is released by close().
+        """
+        tree = cls.__new__(cls)
+        tree.root_path = root_path
+        tree.options_key = options_key
+        for name in ("parents", "sizes", "file_counts", "dir_counts", "mtimes", "devices", "inodes", "name_ids"):
+            setattr(tree, name, columns[name])
+        tree._wide_identities = dict(wide_identities or {})
+        tree._name_bytes = columns["name_bytes"]
+        tree._name_offsets = columns["name_offsets"]
+        tree._name_to_id = None
+        tree._child_offsets = columns["child_offsets"]
+        tree._children = columns["children"]
+        tree.finalized = True
+        tree._mapping = mapping
+        return tree
+
+    def columns(self):
+        """The storage columns of the finalized tree keyed by COLUMNS, child index included."""
+        self.finalize()
+        if self._children is None: self._build_child_index()
+        return {"parents": self.parents, "sizes": self.sizes, "file_counts": self.file_counts, "dir_counts": self.dir_counts,
+                "mtimes": self.mtimes, "devices": self.devices, "inodes": self.inodes, "name_ids": self.name_ids,
+                "name_offsets": self._name_offsets, "name_bytes": self._name_bytes,
+                "child_offsets": self._child_offsets, "children": self._children}
+
+    def wide_identities(self):
+        """{index: (device, inode)} for the nodes whose identity does not fit the 64-bit device and inode columns."""
+        return dict(self._wide_identities)
+
+    def close(self):
+        """Releases the mapping behind a tree built by from_columns; the tree cannot be used afterwards."""
+        mapping, self._mapping = self._mapping, None
+        if mapping is None: return
+        for name in ("parents", "sizes", "file_counts", "dir_counts", "mtimes", "devices", "inodes", "name_ids",
+                     "_name_bytes", "_name_offsets", "_child_offsets", "_children"):
+            view = getattr(self, name)
+            if isinstance(view, memoryview): view.release()
+            setattr(self, name, None)
+        try: mapping.close()
+        except BufferError: pass # A slice handed out earlier is still alive; the mapping goes with it
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add_directory(self, parent, name):
+        """Adds a directory below node 'parent' and returns its index."""
+        index = len(self.parents)
+        self.parents.append(parent)
+        self.name_ids.append(self._intern(name))
+        self.sizes.append(0)
+        self.file_counts.append(0)
+        self.dir_counts.append(0)
+        self.mtimes.append(NO_MTIME)
+        self.devices.append(0)
+        self.inodes.append(0)
+        self._child_offsets = self._children = None
+        return index
+
+    def _intern(self, name):
+        if self._name_to_id is None: raise RuntimeError("ScanTree is finalized")
+        name_id = self._name_to_id.get(name)
+        if name_id is None:
+            name_id = len(self._name_offsets) - 1
+            self._name_bytes += name.encode(*_NAME_ENCODING)
+            self._name_offsets.append(len(self._name_bytes))
+            self._name_to_id[name] = name_id
+        return name_id
+
+    def add_files(self, index, count, size):
+        """Records 'count' files totalling 'size' bytes directly inside node 'index'."""
+        self.file_counts[index] += count
+        self.sizes[index] += size
+
+    def set_stat(self, index, dir_stat):
+        """Records the identity (device, inode) and st_mtime_ns of node 'index'."""
+        self.set_identity(index, dir_stat.st_dev, dir_stat.st_ino, dir_stat.st_mtime_ns)
+
+    def set_identity(self, index, device, inode, mtime_ns):
+        self.mtimes[index] = mtime_ns
+        try:
+            self.devices[index] = device
+            self.inodes[index] = inode
+        except OverflowError: # e.g. 128-bit ReFS file IDs
+            self._wide_identities[index] = (device, inode)
+
+    def finalize(self):
+        """Sums sizes and counts bottom-up so every node holds its subtree totals, and builds the child index."""
+        if self.finalized: return
+        parents, sizes, file_counts, dir_counts = self.parents, self.sizes, self.file_counts, self.dir_counts
+        for index in range(len(parents) - 1, 0, -1):
+            parent = parents[index]
+            sizes[parent] += sizes[index]
+            file_counts[parent] += file_counts[index]
+            dir_counts[parent] += dir_counts[index] + 1
+        self._name_to_id = None # No more names will be added
+        if self._children is None: self._build_child_index()
+        self.finalized = True
+
+    def nbytes(self):
+        """Approximate memory held by the tree's arrays and name table."""
+        arrays = (self.parents, self.sizes, self.file_counts, self.dir_counts, self.mtimes, self.devices,
+                  self.inodes, self.name_ids, self._name_offsets, self._child_offsets, self._children)
+        return len(self._name_bytes) + sum(len(a) * a.itemsize for a in arrays if a is not None)
+
+    # --- Queries ---
+    def name_of(self, index):
+        return self._name_of_id(self.name_ids[index])
+
+    def _name_of_id(self, name_id):
+        offsets = self._name_offsets
+        return str(self._name_bytes[offsets[name_id]:offsets[name_id + 1]], *_NAME_ENCODING)
+
+    def mtime_of(self, index):
+        """st_mtime_ns of node 'index', or None if the directory was never stat'ed."""
+        mtime_ns = self.mtimes[index]
+        return None if mtime_ns == NO_MTIME else mtime_ns
+
+    def identity_of(self, index):
+        """(device, inode) of node 'index'."""
+        wide = self._wide_identities.get(index) if self._wide_identities else None
+        return wide or (self.devices[index], self.inodes[index])
+
+    def path_of(self, index):
+        """Rebuilds the full path of node 'index'."""
+        parts = []
+        while index > 0:
+            parts.append(self.name_of(index))
+            index = self.parents[index]
+        return os.path.join(self.root_path, *reversed(parts))
+
+    def _build_child_index(self):
+        """Builds the CSR child index: all nodes sorted by (parent, name), then one offset per node."""
+        parents = self.parents
+        count = len(parents)
+        # Rank the distinct names once, so nodes sort on integers instead of decoded strings
+        name_of_id = self._name_of_id
+        ranks = array('Q', bytes(8 * (len(self._name_offsets) - 1)))
+        for rank, name_id in enumerate(sorted(range(len(ranks)), key=name_of_id)): ranks[name_id] = rank
+        keys = array('Q', (max(parent, 0) * len(ranks) + ranks[name_id] for parent, name_id in zip(parents, self.name_ids)))
+        children = array('i', sorted(range(1, count), key=keys.__getitem__))
+        offsets = array('Q', bytes(8 * (count + 1)))
+        for index in range(1, count): offsets[parents[index] + 1] += 1
+        total = 0
+        for index in range(count + 1):
+            total += offsets[index]
+            offsets[index] = total
+        self._child_offsets, self._children = offsets, children
+
+    def children(self, index):
+        """Indexes of the children of node 'index', sorted by name."""
+        if self._children is None: self._build_child_index()
+        return self._children[self._child_offsets[index]:self._child_offsets[index + 1]]
+
+    def find_child(self, index, name):
+        """Index of the child of node 'index' called 'name', or None (binary search over its sorted children)."""
+        if self._children is None: self._build_child_index()
+        children, name_of = self._children, self.name_of
+        start, end = self._child_offsets[index], self._child_offsets[index + 1]
+        while start < end:
+            middle = (start + end) // 2
+            if name_of(children[middle]) < name: start = middle + 1
+            else: end = middle
+        if start < self._child_offsets[index + 1] and name_of(children[start]) == name: return children[start]
+        return None
+
+    def find(self, path):
+        """Returns the index of the directory at 'path', or None if it is not in this tree."""
+        path = os.path.normpath(str(path))
+        if path == self.root_path: return 0
+        try: relative = os.path.relpath(path, self.root_path)
+        except ValueError: return None # Different drive on Windows
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep): return None
+        index = 0
+        for part in relative.split(os.sep):
+            index = self.find_child(index, part)
+            if index is None: return None
+        return index
+
+    def top_folders(self, count, index=0):
+        """Indexes of the 'count' largest folders below node 'index' (not 'index' itself), largest first."""
+        sizes = self.sizes
+        if index == 0:
+            candidates = range(1, len(sizes))
+        else:
+            candidates = []
+            stack = [index]
+            while stack:
+                children = self.children(stack.pop())
+                candidates.extend(children)
+                stack.extend(children)
+        return heapq.nlargest(count, candidates, key=sizes.__getitem__)
+
+    def total_size(self, index=0):
+        return self.sizes[index]
+
+    def file_count(self, index=0):
+        return self.file_counts[index]
+
+    def dir_count(self, index=0):
+        return self.dir_counts[index]
+
+    def iter_directories(self, max_depth=None):
+        """
+        Yields (path, size, file_count, dir_count, depth) for every directory in the tree, parents
+        before children. depth is 0 for the scanned folder; deeper directories are skipped if max_depth is given.
+        """
+        depths = array('I')
+        parents = self.parents
+        for index in range(len(parents)):
+            depth = depths[parents[index]] + 1 if index else 0
+            depths.append(depth)
+            if max_depth is not None and depth > max_depth: continue
+            yield self.path_of(index), self.sizes[index], self.file_counts[index], self.dir_counts[index], depth
+
+    def iter_sorted(self, index=0):
+        """
+        Yields (relative_path, size, file_count, dir_count) for node 'index' and everything below it,
+        depth-first with siblings in name order. relative_path joins names with "/" and is ""
+        for 'index' itself, so the sequence is sorted by path components (see snapshot.path_key).
+        """
+        stack = [(index, "")]
+        while stack:
+            node, relative = stack.pop()
+            yield relative, self.sizes[node], self.file_counts[node], self.dir_counts[node]
+            prefix = relative + "/" if relative else ""
+            # Pushed in reverse so the smallest name is popped first
+            for child in reversed(self.children(node)):
+                stack.append((child, prefix + self.name_of(child)))
+
+    def iter_stats(self):
+        """Yields (path, device, inode, mtime_ns, size, file_count, dir_count) for every directory that was stat'ed."""
+        for index in range(len(self.parents)):
+            if self.mtimes[index] == NO_MTIME: continue
+            device, inode = self.identity_of(index)
+            yield (self.path_of(index), device, inode, self.mtimes[index],
+                   self.sizes[index], self.file_counts[index], self.dir_counts[index])
@@ -0,0 +1,71 @@
+# scanner.py
+import threading
+import queue
+import config # Import the configuration constants
+
+# Number of directory entries a walk processes between cancellation checks
+CANCEL_CHECK_INTERVAL = 1024
+
+class ScanCancelled(Exception):
+    """Raised inside a walk when its cancellation token has been cancelled."""
+    pass
+
+class CancellationToken:
+    """
+    Cooperative cancellation flag shared by every scan job of one view.
+    cancel() is called from the main thread; walks poll 'cancelled' and stop early.
+    """
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def raise_if_cancelled(self):
+        if self.cancelled: raise ScanCancelled()
+
+class ScanScheduler:
+    """
+    Runs scan jobs on a bounded pool of daemon worker threads fed from a FIFO work queue.
+    Workers are started lazily up to max_workers, so the thread count stays flat no matter
+    how many jobs are submitted.
+    """
+    def __init__(self, max_workers=None):
+        self.max_workers = max(1, max_workers or config.SCAN_MAX_WORKERS)
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        self._idle_workers = 0
+
+    def submit(self, func, *args, cancel_token=None):
+        """
+        Queues func(*args) to run on a worker thread.
+        If cancel_token is cancelled before a worker picks the job up, the job is dropped unrun.
+        """
+        self._queue.put((func, args, cancel_token))
+        with self._lock:
+            # Only grow the pool when the queued work outnumbers the workers waiting for it
+            if len(self._workers) < self.max_workers and self._queue.qsize() > self._idle_workers:
+                worker = threading.Thread(target=self._worker_loop, name=f"scan-worker-{len(self._workers) + 1}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+
+    def pending_count(self):
+        """Returns the number of jobs still waiting for a worker."""
+        return self._queue.qsize()
+
+    def _worker_loop(self):
+        """(Thread Target) Pulls jobs off the queue forever."""
+        while True:
+            with self._lock: self._idle_workers += 1
+            func, args, cancel_token = self._queue.get()
+            with self._lock: self._idle_workers -= 1
+            try:
+                if cancel_token is None or not cancel_token.cancelled:
+                    func(*args)
+            except ScanCancelled:
+                pass
+            except Exception as e:
+                print(f"Unhandled error in scan job {getattr(func, '__name__', func)}: {e}")
+            finally:
+                self._queue.task_done()
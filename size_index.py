@@ -0,0 +1,165 @@
+# size_index.py
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+import config # Import the configuration constants
+import scan_options
+
+# Bumped whenever the table layout changes; older databases are simply rebuilt (it is a cache)
+_SCHEMA_VERSION = 2
+# What a failing index raises; callers treat these as a cache miss rather than a failed job
+ERRORS = (sqlite3.Error, UnicodeError)
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dir_sizes (
+    mode      TEXT NOT NULL,
+    path      BLOB NOT NULL,
+    dev       INTEGER NOT NULL,
+    ino       INTEGER NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    files     INTEGER NOT NULL,
+    dirs      INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (mode, path)
+);
+CREATE INDEX IF NOT EXISTS dir_sizes_last_used ON dir_sizes (last_used);
+"""
+
+class SizeIndex:
+    """
+    Persistent SQLite index of aggregated directory sizes, so sizes survive restarts.
+
+    Each row is keyed by the scan options key (see scan_options) and path, and carries the directory's device, inode and st_mtime_ns at
+    scan time. A lookup is only answered if those still match for the directory *and* for
+    every indexed directory below it: adding, removing or renaming anything in a folder
+    bumps that folder's mtime, so checking the subtree's directories (a stat each, no file
+    stats) catches structural changes anywhere underneath. In-place rewrites of existing
+    files do not touch directory mtimes and are not detected.
+
+    Paths are stored as their os.fsencode() bytes, so names that are not valid UTF-8 (which
+    Python decodes to lone surrogates on POSIX) are indexed like any other; BLOBs compare
+    bytewise, which keeps the subtree range queries of _subtree_range valid.
+    """
+    def __init__(self, db_path, max_entries=None, validate_subtree=True):
+        self.db_path = db_path
+        self.max_entries = max_entries or config.SIZE_INDEX_MAX_ENTRIES
+        self.validate_subtree = validate_subtree
+        self._lock = threading.Lock()
+        db_dir = os.path.dirname(db_path)
+        if db_dir: os.makedirs(db_dir, exist_ok=True)
+        # Shared by the scan workers and the main thread; every use is serialized by _lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            self._conn.execute("DROP TABLE IF EXISTS dir_sizes")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def lookup(self, folder_path, options_key=scan_options.SIZE_MODE_APPARENT):
+        """
+        Returns (size, file_count, dir_count) for folder_path if the entry indexed for options_key is still valid, else None.
+        The rows are read under the lock but checked against the disk without it, so a slow
+        validation of a large subtree does not hold up other workers' lookups and stores.
+        """
+        folder_path = os.path.normpath(folder_path)
+        folder_key = os.fsencode(folder_path)
+        low, high = _subtree_range(folder_path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dev, ino, mtime_ns, size, files, dirs FROM dir_sizes WHERE mode = ? AND path = ?", (options_key, folder_key)).fetchone()
+            if row is None: return None
+            below = self._conn.execute(
+                "SELECT path, dev, ino, mtime_ns FROM dir_sizes WHERE mode = ? AND path >= ? AND path < ?",
+                (options_key, low, high)).fetchall() if self.validate_subtree else ()
+        valid = self._matches_disk(folder_path, row[0], row[1], row[2]) and all(
+            self._matches_disk(path, dev, ino, mtime_ns) for path, dev, ino, mtime_ns in below)
+        with self._lock:
+            # A worker may have stored a fresh scan of this folder meanwhile; leave that one alone
+            current = self._conn.execute(
+                "SELECT dev, ino, mtime_ns, size, files, dirs FROM dir_sizes WHERE mode = ? AND path = ?", (options_key, folder_key)).fetchone()
+            if current != row: return None
+            if not valid:
+                self._forget(folder_path)
+                return None
+            # Touch the whole subtree so an ancestor is never evicted later than its descendants
+            self._conn.execute("UPDATE dir_sizes SET last_used = ? WHERE mode = ? AND (path = ? OR (path >= ? AND path < ?))",
+                               (time.time(), options_key, folder_key, low, high))
+            self._conn.commit()
+            return row[3], row[4], row[5]
+
+    def store_tree(self, tree):
+        """Writes every directory of a finished ScanTree into the index (under the tree's options key), then evicts if over budget."""
+        now = time.time()
+        rows = [(tree.options_key, os.fsencode(path), dev, ino, mtime_ns, size, files, dirs, now)
+                for path, dev, ino, mtime_ns, size, files, dirs in tree.iter_stats()]
+        if not rows: return
+        with self._lock:
+            # Indexed ancestors were summed from the old version of this subtree (in every mode)
+            self._conn.executemany("DELETE FROM dir_sizes WHERE path = ?", _ancestor_keys(tree.root_path))
+            self._conn.executemany("INSERT OR REPLACE INTO dir_sizes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._evict_locked()
+            self._conn.commit()
+
+    def entry_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dir_sizes").fetchone()[0]
+
+    def clear(self):
+        """Wipes every indexed size and shrinks the database file."""
+        with self._lock:
+            self._conn.execute("DELETE FROM dir_sizes")
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # --- Internals (call with _lock held, except _matches_disk) ---
+    def _matches_disk(self, path, dev, ino, mtime_ns):
+        try:
+            st = os.stat(path, follow_symlinks=False)
+        except OSError:
+            return False
+        return st.st_dev == dev and st.st_ino == ino and st.st_mtime_ns == mtime_ns
+
+    def _forget(self, folder_path):
+        """Drops a stale entry, everything indexed below it and every ancestor whose total included it, in every size mode."""
+        low, high = _subtree_range(folder_path)
+        self._conn.execute("DELETE FROM dir_sizes WHERE path = ? OR (path >= ? AND path < ?)", (os.fsencode(folder_path), low, high))
+        self._conn.executemany("DELETE FROM dir_sizes WHERE path = ?", _ancestor_keys(folder_path))
+        self._conn.commit()
+
+    def _evict_locked(self):
+        """Evicts least recently used rows down to 90% of max_entries once the budget is exceeded."""
+        count = self._conn.execute("SELECT COUNT(*) FROM dir_sizes").fetchone()[0]
+        if count <= self.max_entries: return
+        excess = count - int(self.max_entries * 0.9)
+        # Among equally old rows, evict ancestors (shorter paths) first: an ancestor must never
+        # outlive a descendant, otherwise subtree validation could miss a change below it.
+        self._conn.execute(
+            "DELETE FROM dir_sizes WHERE rowid IN (SELECT rowid FROM dir_sizes ORDER BY last_used, length(path) LIMIT ?)",
+            (excess,))
+
+
+def _subtree_range(folder_path):
+    """Returns (low, high) such that low <= key < high holds for exactly the path keys strictly below folder_path."""
+    prefix = os.fsencode(os.path.join(folder_path, ''))
+    return prefix, prefix[:-1] + bytes((prefix[-1] + 1,))
+
+
+def _ancestor_keys(folder_path):
+    """Parameter rows with the path key of every ancestor of folder_path."""
+    return [(os.fsencode(str(parent)),) for parent in Path(folder_path).parents]
+
+
+def open_default_index():
+    """Opens the index configured in config.py, or returns None if it is disabled or unusable."""
+    if not config.SIZE_INDEX_ENABLED: return None
+    try:
+        return SizeIndex(config.SIZE_INDEX_PATH, config.SIZE_INDEX_MAX_ENTRIES, config.SIZE_INDEX_VALIDATE_SUBTREE)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not open size index at {config.SIZE_INDEX_PATH}: {e}")
+        return None
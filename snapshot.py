@@ -0,0 +1,187 @@
+# snapshot.py
+# Scan snapshots: the per-directory totals of one scan saved to a file, and a streaming diff
+# of two snapshots to find what grew. Must not import tkinter (used by the command line).
+import gzip
+import json
+import time
+import heapq
+import config # Import the configuration constants
+
+MAGIC = "FSE-SNAPSHOT"
+FORMAT_VERSION = 1
+
+# Suffixes are written with these characters escaped so every record stays on one line
+_ESCAPES = {"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"}
+_UNESCAPES = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+
+
+class SnapshotError(Exception):
+    """A snapshot file is missing, malformed, or not sorted the way a diff needs."""
+
+
+def path_key(relative_path):
+    """
+    Sort key of a snapshot path: its "/"-separated components compared one by one. Replacing
+    the separator with NUL (which names cannot contain) gives that order with plain string
+    comparison, so "a/b" sorts before "a-b" and every folder comes right before its contents.
+    """
+    return relative_path.replace("/", "\0")
+
+
+def _escape(text):
+    if not any(ch in text for ch in _ESCAPES): return text
+    return "".join(_ESCAPES.get(ch, ch) for ch in text)
+
+
+def _unescape(text):
+    if "\\" not in text: return text
+    out = []
+    chars = iter(text)
+    for ch in chars:
+        out.append(_UNESCAPES.get(next(chars, ""), "") if ch == "\\" else ch)
+    return "".join(out)
+
+
+class SnapshotWriter:
+    """
+    Writes a snapshot: a gzip-compressed text file with one header line, then one line per
+    directory sorted by path_key. Paths are relative to the scanned folder ("" is the folder
+    itself) and front-coded: each line stores how many leading characters it shares with the
+    previous path, then the rest, then the directory's size, file count and folder count.
+
+        FSE-SNAPSHOT<TAB>1<TAB>{"root": ..., "options": ..., "created": ...}
+        0<TAB><TAB>1048576<TAB>120<TAB>14
+        0<TAB>docs<TAB>524288<TAB>40<TAB>2
+        4<TAB>/old<TAB>1024<TAB>3<TAB>0
+
+    Records must be written in path_key order; out-of-order records raise SnapshotError.
+    """
+    def __init__(self, file_path, root_path, options_key, compresslevel=None):
+        self.file_path = str(file_path)
+        level = config.SNAPSHOT_COMPRESS_LEVEL if compresslevel is None else compresslevel
+        self._file = gzip.open(self.file_path, "wt", encoding="utf-8", errors="surrogateescape", newline="\n", compresslevel=level)
+        header = {"root": str(root_path), "options": options_key, "created": time.time()}
+        self._file.write(f"{MAGIC}\t{FORMAT_VERSION}\t{json.dumps(header, ensure_ascii=False)}\n")
+        self._previous = None
+        self._previous_key = None
+        self.count = 0
+
+    def write(self, relative_path, size, file_count, dir_count):
+        key = path_key(relative_path)
+        previous = self._previous
+        if previous is None:
+            shared = 0
+        else:
+            if key <= self._previous_key: raise SnapshotError(f"Snapshot records out of order: {relative_path!r} after {previous!r}")
+            limit = min(len(previous), len(relative_path))
+            shared = 0
+            while shared < limit and previous[shared] == relative_path[shared]: shared += 1
+        self._file.write(f"{shared}\t{_escape(relative_path[shared:])}\t{size}\t{file_count}\t{dir_count}\n")
+        self._previous = relative_path
+        self._previous_key = key
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_snapshot(tree, file_path, index=0):
+    """Saves the subtree of a finalized ScanTree below node 'index' as a snapshot; returns the number of directories written."""
+    tree.finalize()
+    with SnapshotWriter(file_path, tree.path_of(index), tree.options_key) as writer:
+        for record in tree.iter_sorted(index): writer.write(*record)
+    return writer.count
+
+
+def read_header(file_path):
+    """Returns the header dict of a snapshot file (root, options, created). Raises SnapshotError or OSError."""
+    with gzip.open(file_path, "rt", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        return _parse_header(f)
+
+
+def _parse_header(f):
+    try:
+        magic, version, header = f.readline().rstrip("\n").split("\t", 2)
+        if magic != MAGIC: raise ValueError("not a snapshot file")
+        if int(version) != FORMAT_VERSION: raise ValueError(f"unsupported snapshot version {version}")
+        return json.loads(header)
+    except (ValueError, EOFError, gzip.BadGzipFile) as e:
+        raise SnapshotError(f"{getattr(f, 'name', 'snapshot')}: {e}") from None
+
+
+def iter_snapshot(file_path):
+    """
+    Streams the records of a snapshot file as (relative_path, size, file_count, dir_count),
+    in path_key order, without holding more than one record in memory.
+    Raises SnapshotError on a malformed or unsorted file.
+    """
+    for _key, record in _iter_keyed(file_path): yield record
+
+
+def _iter_keyed(file_path):
+    """iter_snapshot, with each record paired with its path_key: (key, record)."""
+    with gzip.open(file_path, "rt", encoding="utf-8", errors="surrogateescape", newline="\n") as f:
+        _parse_header(f)
+        previous = ""
+        previous_key = None
+        try:
+            for line_number, line in enumerate(f, 2):
+                shared, suffix, size, file_count, dir_count = line.rstrip("\n").split("\t")
+                relative_path = previous[:int(shared)] + _unescape(suffix)
+                key = path_key(relative_path)
+                if previous_key is not None and key <= previous_key:
+                    raise SnapshotError(f"{file_path}:{line_number}: records out of order")
+                yield key, (relative_path, int(size), int(file_count), int(dir_count))
+                previous, previous_key = relative_path, key
+        except (ValueError, EOFError, gzip.BadGzipFile) as e:
+            raise SnapshotError(f"{file_path}: {e}") from None
+
+
+def diff_snapshots(old_path, new_path, max_depth=None):
+    """
+    Merge-joins two snapshots and yields (relative_path, old, new) for every directory whose
+    size or counts differ, where old and new are (size, file_count, dir_count) tuples, or
+    None for a directory missing from that snapshot. Both files are streamed, so memory use
+    does not depend on their size. Directories deeper than max_depth below the root are skipped.
+    """
+    old_records = _iter_keyed(old_path)
+    new_records = _iter_keyed(new_path)
+    old_key, old = next(old_records, (None, None))
+    new_key, new = next(new_records, (None, None))
+    while old is not None or new is not None:
+        if new is None or (old is not None and old_key < new_key):
+            relative_path, before, after = old[0], old[1:], None
+            old_key, old = next(old_records, (None, None))
+        elif old is None or new_key < old_key:
+            relative_path, before, after = new[0], None, new[1:]
+            new_key, new = next(new_records, (None, None))
+        else:
+            relative_path, before, after = old[0], old[1:], new[1:]
+            old_key, old = next(old_records, (None, None))
+            new_key, new = next(new_records, (None, None))
+            if before == after: continue
+        if max_depth is not None and relative_path and relative_path.count("/") >= max_depth: continue
+        yield relative_path, before, after
+
+
+def top_changes(old_path, new_path, count, max_depth=None, shrinking=False):
+    """
+    Returns the 'count' directories that grew the most between two snapshots (or shrank the
+    most, with shrinking=True) as (relative_path, old, new, delta_bytes) tuples, largest
+    change first. Only a 'count'-sized heap is kept while the snapshots are streamed.
+    """
+    sign = -1 if shrinking else 1
+    heap = [] # (signed delta, path, old, new), smallest at heap[0]
+    for relative_path, before, after in diff_snapshots(old_path, new_path, max_depth):
+        delta = (after[0] if after else 0) - (before[0] if before else 0)
+        entry = (sign * delta, relative_path, before, after)
+        if entry[0] <= 0: continue
+        if len(heap) < count: heapq.heappush(heap, entry)
+        elif entry > heap[0]: heapq.heapreplace(heap, entry)
+    return [(relative_path, before, after, sign * signed) for signed, relative_path, before, after in sorted(heap, reverse=True)]
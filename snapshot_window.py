@@ -0,0 +1,110 @@
+# snapshot_window.py
+import os
+import threading
+import tkinter as tk
+from tkinter import ttk
+import config # Import configuration constants
+import snapshot
+import utils
+
+POLL_MS = 100
+DIFF_COLUMNS = (("path", "Folder", 380), ("old", "Before", 90), ("new", "After", 90), ("delta", "Change", 90), ("files", "Files", 90))
+
+
+def _signed_size(size_bytes):
+    return ("+" if size_bytes >= 0 else "-") + utils.format_size(abs(size_bytes))
+
+
+def show_snapshot_diff_window(parent_window, old_path, new_path, on_open_folder=None):
+    """
+    Displays the (non-modal) comparison of two snapshot files: the directories that grew the
+    most between them, or shrank the most. The diff streams both files on a background thread
+    (see snapshot.top_changes), so even very large snapshots do not block the window.
+
+    Args:
+        parent_window: The parent tk.Tk or tk.Toplevel window.
+        old_path, new_path: The older and newer snapshot files.
+        on_open_folder: Optional callback(path) for double-clicking a folder that still exists.
+    """
+    diff_win = tk.Toplevel(parent_window)
+    diff_win.title(f"{config.SNAPSHOT_DIFF_TITLE} - {os.path.basename(old_path)} → {os.path.basename(new_path)}")
+    diff_win.geometry("860x520")
+    diff_win.transient(parent_window)
+
+    frame = ttk.Frame(diff_win, padding="10")
+    frame.pack(expand=True, fill=tk.BOTH)
+
+    summary_var = tk.StringVar()
+    ttk.Label(frame, textvariable=summary_var, anchor=tk.W, justify=tk.LEFT).pack(fill=tk.X, pady=(0, 8))
+
+    table_frame = ttk.Frame(frame)
+    table_frame.pack(expand=True, fill=tk.BOTH)
+    table = ttk.Treeview(table_frame, columns=[c[0] for c in DIFF_COLUMNS], show="headings", selectmode="browse")
+    for col, heading, width in DIFF_COLUMNS:
+        table.heading(col, text=heading)
+        table.column(col, width=width, stretch=(col == "path"), anchor=tk.W if col == "path" else tk.E)
+    vsb = ttk.Scrollbar(table_frame, orient="vertical", command=table.yview)
+    table.configure(yscrollcommand=vsb.set)
+    table.grid(row=0, column=0, sticky="nsew")
+    vsb.grid(row=0, column=1, sticky="ns")
+    table_frame.grid_rowconfigure(0, weight=1)
+    table_frame.grid_columnconfigure(0, weight=1)
+
+    shrinking_var = tk.BooleanVar(value=False)
+    state = {"generation": 0, "result": None, "root": None}
+
+    def compute(generation, shrinking):
+        """(Diff Thread) Streams both snapshots; the result is picked up by poll()."""
+        try:
+            old_header, new_header = snapshot.read_header(old_path), snapshot.read_header(new_path)
+            changes = snapshot.top_changes(old_path, new_path, config.SNAPSHOT_DIFF_TOP, shrinking=shrinking)
+            result = (old_header, new_header, changes, None)
+        except (OSError, snapshot.SnapshotError) as e:
+            result = (None, None, [], e)
+        if state["generation"] == generation: state["result"] = result
+
+    def start():
+        state["generation"] += 1
+        state["result"] = None
+        table.delete(*table.get_children(''))
+        summary_var.set("Comparing snapshots...")
+        threading.Thread(target=compute, args=(state["generation"], shrinking_var.get()), name="snapshot-diff", daemon=True).start()
+        diff_win.after(POLL_MS, poll, state["generation"])
+
+    def poll(generation):
+        if not diff_win.winfo_exists() or state["generation"] != generation: return
+        if state["result"] is None:
+            diff_win.after(POLL_MS, poll, generation)
+            return
+        old_header, new_header, changes, error = state["result"]
+        if error is not None:
+            summary_var.set(f"Could not compare snapshots:\n{error}")
+            return
+        root_path = state["root"] = new_header["root"]
+        lines = [f"{root_path}   ({len(changes)} largest {'decreases' if shrinking_var.get() else 'increases'})"]
+        if old_header["root"] != new_header["root"]: lines.append(f"Note: the older snapshot is of {old_header['root']}")
+        if old_header["options"] != new_header["options"]:
+            lines.append(f"Note: different scan options ({old_header['options']} vs {new_header['options']})")
+        summary_var.set("\n".join(lines))
+        for relative_path, before, after, delta in changes:
+            old_files, new_files = (before[1] if before else 0), (after[1] if after else 0)
+            table.insert("", tk.END, iid=relative_path or ".", values=(
+                relative_path or ".", utils.format_size(before[0]) if before else "-", utils.format_size(after[0]) if after else "-",
+                _signed_size(delta), f"{new_files - old_files:+,}"))
+
+    def open_selected(event=None):
+        selection = table.selection()
+        if not selection or on_open_folder is None or state["root"] is None: return
+        relative_path = "" if selection[0] == "." else selection[0]
+        folder_path = os.path.join(state["root"], *relative_path.split("/")) if relative_path else state["root"]
+        if os.path.isdir(folder_path): on_open_folder(folder_path)
+
+    table.bind("<Double-1>", open_selected)
+
+    # Buttons
+    button_frame = ttk.Frame(frame)
+    button_frame.pack(fill=tk.X, pady=(8, 0))
+    ttk.Checkbutton(button_frame, text="Show largest decreases", variable=shrinking_var, command=start).pack(side=tk.LEFT)
+    ttk.Button(button_frame, text="Close", command=diff_win.destroy).pack(side=tk.RIGHT)
+
+    start()
@@ -0,0 +1,2 @@
+# tests/__init__.py
+# Test suite; run it with `python -m unittest` (or `python -m pytest`) from the project directory.
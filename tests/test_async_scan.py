@@ -0,0 +1,208 @@
+# tests/test_async_scan.py
+# The asyncio backend against the thread walk on generated trees, run through a filesystem
+# layer that injects latency so many reads really overlap.
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import config
+import utils
+import scanner
+import async_scan
+import scan_metrics
+import scan_options
+from benchmarks import treegen
+
+LATENCY_S = 0.0005 # Small, but enough for jobs to finish out of order
+
+
+def tree_contents(tree):
+    """Everything a walk is expected to agree on: every node's totals in path order, and every stat'ed identity."""
+    return list(tree.iter_sorted()), sorted(tree.iter_stats())
+
+
+class TrackingFileSystem(async_scan.LatencyFileSystem):
+    """LatencyFileSystem that records the descriptors it hands out and how many calls overlap."""
+    def __init__(self, latency_s=LATENCY_S, base=None):
+        super().__init__(latency_s, base)
+        self.open_fds = set()
+        self.opened = 0
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def open_directory(self, path):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        fd = None
+        try:
+            fd, dir_stat = super().open_directory(path)
+            return fd, dir_stat
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.opened += 1
+                if fd is not None: self.open_fds.add(fd)
+
+    def close(self, fd):
+        with self._lock: self.open_fds.discard(fd)
+        super().close(fd)
+
+    def leaked_fds(self, timeout=2.0):
+        """Descriptors still open once every open call has returned (a stopped walk may have left some running)."""
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline: time.sleep(0.01)
+        with self._lock: return set(self.open_fds)
+
+
+class AsyncScanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp(prefix="fse-test-")
+        self.addCleanup(treegen.remove_tree, self.base_dir)
+
+
+class MatchesThreadWalkTest(AsyncScanTestCase):
+    def assert_same_walk(self, root, options, **kwargs):
+        expected = utils.scan_folder_tree(root, options=options)
+        tree = async_scan.scan_folder_tree(root, options=options, fs=async_scan.LatencyFileSystem(LATENCY_S), **kwargs)
+        self.assertEqual(tree.options_key, expected.options_key)
+        self.assertEqual(tree_contents(tree), tree_contents(expected))
+
+    def test_generated_profiles(self):
+        for profile, scale in (("wide", 0.02), ("deep", 0.1), ("symlinks", 0.05), ("denied", 0.2)):
+            root = treegen.generate(self.base_dir, profile, scale)["root"]
+            for size_mode in scan_options.SIZE_MODES:
+                with self.subTest(profile=profile, size_mode=size_mode):
+                    self.assert_same_walk(root, scan_options.ScanOptions(size_mode=size_mode), concurrency=8)
+
+    def test_large_directory_split_into_stat_batches(self):
+        root = treegen.generate(self.base_dir, "wide", 0.02)["root"]
+        with mock.patch.object(config, "ASYNC_SCAN_STAT_BATCH", 7):
+            for size_mode in scan_options.SIZE_MODES:
+                with self.subTest(size_mode=size_mode):
+                    self.assert_same_walk(root, scan_options.ScanOptions(size_mode=size_mode), concurrency=16)
+
+    def test_hard_links_counted_once_in_disk_mode(self):
+        root = os.path.join(self.base_dir, "links")
+        folders = [os.path.join(root, name) for name in ("a", "b", "c")]
+        for folder in folders: os.makedirs(folder)
+        with open(os.path.join(folders[0], "shared.dat"), "wb") as f: f.write(os.urandom(64 * 1024))
+        for folder in folders[1:]: os.link(os.path.join(folders[0], "shared.dat"), os.path.join(folder, "shared.dat"))
+        options = scan_options.ScanOptions(size_mode=scan_options.SIZE_MODE_DISK)
+        expected = utils.scan_folder_tree(root, options=options)
+        with mock.patch.object(config, "ASYNC_SCAN_STAT_BATCH", 1):
+            tree = async_scan.scan_folder_tree(root, options=options, fs=async_scan.LatencyFileSystem(LATENCY_S), concurrency=4)
+        # Which folder is charged for the file depends on the order they are read in, as with du
+        self.assertEqual((tree.total_size(), tree.file_count()), (expected.total_size(), expected.file_count()))
+        sizes = sorted(tree.total_size(tree.find(folder)) for folder in folders)
+        self.assertEqual(sizes[0], sizes[1])
+        self.assertGreater(sizes[2], sizes[1])
+        self.assertEqual(sum(sizes), sum(expected.total_size(expected.find(folder)) for folder in folders))
+
+    def test_serial_walk(self):
+        root = treegen.generate(self.base_dir, "deep", 0.05)["root"]
+        self.assert_same_walk(root, scan_options.ScanOptions(), concurrency=1)
+
+    def test_not_a_directory(self):
+        file_path = os.path.join(self.base_dir, "file.dat")
+        with open(file_path, "wb"): pass
+        self.assertIsNone(async_scan.scan_folder_tree(file_path))
+        self.assertIsNone(async_scan.scan_folder_tree(os.path.join(self.base_dir, "missing")))
+
+
+class ConcurrencyTest(AsyncScanTestCase):
+    def test_reads_overlap_up_to_the_limit(self):
+        builder = treegen.TreeBuilder(os.path.join(self.base_dir, "flat"), seed=0)
+        for i in range(12): builder.fill(builder.make_dir(os.path.join(builder.root, f"dir{i:02d}")), 2, 0, 1024)
+        root = builder.root
+        for concurrency in (1, 3):
+            with self.subTest(concurrency=concurrency):
+                fs = TrackingFileSystem(0.005)
+                async_scan.scan_folder_tree(root, concurrency=concurrency, fs=fs)
+                self.assertLessEqual(fs.max_running, concurrency)
+                if concurrency > 1: self.assertGreater(fs.max_running, 1)
+                self.assertEqual(fs.leaked_fds(), set())
+
+
+class CancellationTest(AsyncScanTestCase):
+    def test_descriptors_released_when_cancelled(self):
+        builder = treegen.TreeBuilder(os.path.join(self.base_dir, "flat"), seed=0)
+        for i in range(200): builder.make_dir(os.path.join(builder.root, f"dir{i:03d}"))
+        root = builder.root
+        token = scanner.CancellationToken()
+
+        class CancellingFileSystem(TrackingFileSystem):
+            def open_directory(self, path):
+                result = super().open_directory(path)
+                if self.opened == 50: token.cancel()
+                return result
+
+        fs = CancellingFileSystem(0.005) # Long enough for other listings to be running when the walk stops
+        with self.assertRaises(scanner.ScanCancelled):
+            async_scan.scan_folder_tree(root, cancel_token=token, concurrency=16, fs=fs)
+        self.assertGreaterEqual(fs.opened, 50)
+        self.assertEqual(fs.leaked_fds(), set())
+
+    def test_cancelled_before_start(self):
+        root = treegen.generate(self.base_dir, "deep", 0.05)["root"]
+        token = scanner.CancellationToken()
+        token.cancel()
+        fs = TrackingFileSystem()
+        with self.assertRaises(scanner.ScanCancelled):
+            async_scan.scan_folder_tree(root, cancel_token=token, fs=fs)
+        self.assertEqual(fs.leaked_fds(), set())
+
+
+class VanishingTest(AsyncScanTestCase):
+    def test_directories_vanishing_during_the_walk(self):
+        root = treegen.generate(self.base_dir, "wide", 0.02)["root"]
+        victims = {os.path.join(root, "dir00003"), os.path.join(root, "dir00017")}
+        expected = utils.scan_folder_tree(root)
+        lost_bytes = sum(expected.total_size(expected.find(path)) for path in victims)
+
+        class VanishingFileSystem(TrackingFileSystem):
+            def open_directory(self, path):
+                # Listed by its parent, then removed before the walk gets to open it
+                if path in victims: shutil.rmtree(path)
+                return super().open_directory(path)
+
+        fs = VanishingFileSystem()
+        metrics = scan_metrics.ScanMetrics(root, "asyncio")
+        tree = async_scan.scan_folder_tree(root, metrics=metrics, concurrency=8, fs=fs)
+        for path in victims:
+            node = tree.find(path)
+            self.assertIsNotNone(node)
+            self.assertEqual((tree.total_size(node), tree.file_count(node)), (0, 0))
+            self.assertIsNone(tree.mtime_of(node))
+        self.assertEqual(tree.total_size(), expected.total_size() - lost_bytes)
+        self.assertEqual(metrics.errors.get("FileNotFoundError"), len(victims))
+        self.assertEqual(fs.leaked_fds(), set())
+
+    def test_files_vanishing_before_their_stat(self):
+        root = treegen.generate(self.base_dir, "wide", 0.02)["root"]
+        expected = utils.scan_folder_tree(root)
+        # Only the root holds files this far into the numbering, so a name identifies its path
+        victims = {name for name in os.listdir(root) if name.endswith("7.dat") and name > "f000100"}
+
+        class VanishingFileSystem(TrackingFileSystem):
+            def stat_entry(self, entry):
+                # Listed, then removed before the walk gets to stat it
+                if entry.name in victims: os.unlink(os.path.join(root, entry.name))
+                return super().stat_entry(entry)
+
+        fs = VanishingFileSystem()
+        metrics = scan_metrics.ScanMetrics(root, "asyncio")
+        with mock.patch.object(config, "ASYNC_SCAN_STAT_BATCH", 50):
+            tree = async_scan.scan_folder_tree(root, metrics=metrics, concurrency=8, fs=fs)
+        self.assertTrue(victims)
+        self.assertEqual(tree.file_count(), expected.file_count() - len(victims))
+        self.assertEqual(metrics.errors.get("FileNotFoundError"), len(victims))
+        self.assertEqual(list(tree.iter_sorted()), list(utils.scan_folder_tree(root).iter_sorted()))
+        self.assertEqual(fs.leaked_fds(), set())
+
+if __name__ == "__main__":
+    unittest.main()
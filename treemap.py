@@ -0,0 +1,114 @@
+# treemap.py
+# Squarified treemap layout over a ScanTree. Pure computation without tkinter, so it can run on
+# a worker thread while the window stays responsive; treemap_view.py draws the result.
+import heapq
+import itertools
+import config # Import the configuration constants
+
+# Kinds of rectangles in a layout
+KIND_FOLDER = 0 # A directory; node is its ScanTree index
+KIND_FILES = 1 # The files directly inside folder 'node', as one block
+KIND_OTHER = 2 # Children of folder 'node' too small to draw, merged into one block
+
+
+def _worst(row_sum, largest, smallest, side):
+    """Worst aspect ratio in a row of areas laid along 'side' (Bruls, Huizing, van Wijk 2000)."""
+    row_sq = row_sum * row_sum
+    side_sq = side * side
+    return max(side_sq * largest / row_sq, row_sq / (side_sq * smallest))
+
+
+def squarify(areas, x, y, width, height):
+    """
+    Splits the rectangle (x, y, width, height) into one rectangle per area, keeping them as
+    close to square as possible. areas must be positive, sorted largest first and sum to
+    width * height. Returns a list of (x, y, width, height) in the same order.
+    """
+    rects = []
+    count = len(areas)
+    start = 0
+    while start < count:
+        side = min(width, height)
+        if side <= 0:
+            rects.extend((x, y, 0, 0) for _ in range(start, count))
+            break
+        # Grow the row while that makes its worst aspect ratio better
+        row_sum = areas[start]
+        worst = _worst(row_sum, areas[start], areas[start], side)
+        end = start + 1
+        while end < count:
+            candidate = _worst(row_sum + areas[end], areas[start], areas[end], side)
+            if candidate > worst: break
+            row_sum += areas[end]
+            worst = candidate
+            end += 1
+        thickness = row_sum / side
+        offset = 0.0
+        if width >= height: # Row is a column along the left edge
+            for area in areas[start:end]:
+                length = area / thickness
+                rects.append((x, y + offset, thickness, length))
+                offset += length
+            x += thickness
+            width -= thickness
+        else: # Row runs along the top edge
+            for area in areas[start:end]:
+                length = area / thickness
+                rects.append((x + offset, y, length, thickness))
+                offset += length
+            y += thickness
+            height -= thickness
+        start = end
+    return rects
+
+
+def layout_tree(tree, index, width, height, cancel_token=None, min_side=None, max_rects=None):
+    """
+    Lays out the subtree of ScanTree node 'index' in a width x height canvas.
+
+    Returns a list of (x0, y0, x1, y1, depth, node, kind) tuples, parents before children.
+    Level of detail: folders are expanded largest-area first, nothing narrower than min_side
+    pixels is laid out (small siblings are merged into one KIND_OTHER block instead), and the
+    layout stops after max_rects rectangles. The cost therefore depends on the canvas size,
+    not on how many nodes the tree has. Raises scanner.ScanCancelled if cancel_token is cancelled.
+    """
+    min_side = config.TREEMAP_MIN_SIDE if min_side is None else min_side
+    max_rects = config.TREEMAP_MAX_RECTS if max_rects is None else max_rects
+    sizes = tree.sizes
+    padding = config.TREEMAP_PADDING
+    header = config.TREEMAP_HEADER
+    min_area = min_side * min_side
+    rects = []
+    order = itertools.count() # Tie-breaker so the heap never compares beyond the area
+    pending = [(-float(width * height), next(order), index, 0.0, 0.0, float(width), float(height), 0)]
+    while pending and len(rects) < max_rects:
+        if cancel_token is not None and len(rects) % 256 == 0: cancel_token.raise_if_cancelled()
+        _area, _order, node, x, y, w, h, depth = heapq.heappop(pending)
+        if node != index:
+            rects.append((x, y, x + w, y + h, depth, node, KIND_FOLDER))
+            # Children go inside a border, below a caption strip if there is room for one
+            x, y, w, h = x + padding, y + padding, w - 2 * padding, h - 2 * padding
+            if h >= header + min_side * 2: y, h = y + header, h - header
+        total = sizes[node]
+        if total <= 0 or w < min_side or h < min_side: continue
+        scale = (w * h) / total # Pixels per byte
+        min_bytes = min_area / scale
+        items = []
+        small_bytes = 0
+        child_bytes = 0
+        for child in tree.children(node):
+            size = sizes[child]
+            child_bytes += size
+            if size >= min_bytes: items.append((size, child, KIND_FOLDER))
+            elif size > 0: small_bytes += size
+        own_bytes = total - child_bytes
+        if own_bytes >= min_bytes: items.append((own_bytes, node, KIND_FILES))
+        elif own_bytes > 0: small_bytes += own_bytes
+        items.sort(key=lambda item: item[0], reverse=True)
+        if small_bytes > 0: items.append((small_bytes, node, KIND_OTHER)) # Drawn last, in the corner
+        if not items: continue
+        for (size, item_node, kind), (cx, cy, cw, ch) in zip(items, squarify([size * scale for size, _n, _k in items], x, y, w, h)):
+            if cw < min_side or ch < min_side: continue
+            if kind == KIND_FOLDER: heapq.heappush(pending, (-cw * ch, next(order), item_node, cx, cy, cw, ch, depth + 1))
+            elif len(rects) < max_rects: rects.append((cx, cy, cx + cw, cy + ch, depth + 1, item_node, kind))
+    return rects
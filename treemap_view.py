@@ -0,0 +1,151 @@
+# treemap_view.py
+import os
+import tkinter as tk
+from tkinter import ttk
+import config # Import the configuration constants
+import scanner
+import treemap
+import utils
+
+
+def _shade(color, depth):
+    """Mixes a '#rrggbb' color with white, more for deeper levels."""
+    mix = min(0.75, 0.18 * max(0, depth - 1))
+    channels = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join(f"{int(c + (255 - c) * mix):02x}" for c in channels)
+
+
+class TreemapView(ttk.Frame):
+    """
+    Content view that draws the subtree of the current folder as a squarified treemap on a
+    Canvas, from the aggregated sizes of a ScanTree.
+
+    Layouts are computed by treemap.layout_tree on a scheduler worker and handed back through
+    the UI pump, so resizing or switching folders never blocks the window; a newer request
+    cancels an older one still running. Clicking a folder calls on_open_folder(path) to
+    drill down; the caption line shows the folder under the mouse pointer.
+    """
+    def __init__(self, parent, scheduler, pump, on_open_folder=None):
+        super().__init__(parent)
+        self._scheduler = scheduler
+        self._pump = pump
+        self.on_open_folder = on_open_folder
+        self.caption_var = tk.StringVar()
+        ttk.Label(self, textvariable=self.caption_var, anchor=tk.W, padding=(2, 0)).grid(row=0, column=0, sticky="ew")
+        self.canvas = tk.Canvas(self, background="white", highlightthickness=0)
+        self.canvas.grid(row=1, column=0, sticky="nsew")
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self._tree = None
+        self._index = 0
+        self._root_path = None
+        self._items = {} # Canvas item id -> (node, kind)
+        self._layout_token = scanner.CancellationToken()
+        self._relayout_after = None
+        self._drawn_size = None
+
+        self.canvas.bind("<Configure>", self._on_configure)
+        self.canvas.bind("<Button-1>", self._on_click)
+        self.canvas.bind("<Motion>", self._on_motion)
+        self.canvas.bind("<Leave>", lambda e: self._show_caption(None))
+
+    # --- Content ---
+    def show_tree(self, tree, index, folder_path):
+        """Displays node 'index' of a finalized ScanTree (the folder at folder_path)."""
+        self._tree, self._index, self._root_path = tree, index, folder_path
+        self._drawn_size = None
+        self._request_layout()
+
+    def show_message(self, text):
+        """Clears the map and shows text instead (e.g. while the folder is still being scanned)."""
+        self._layout_token.cancel()
+        self._tree = None
+        self._items.clear()
+        self.canvas.delete("all")
+        self.canvas.create_text(self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2, text=text, fill="#606060", tags=("message",))
+        self.caption_var.set("")
+
+    # --- Layout ---
+    def _on_configure(self, event=None):
+        self.canvas.coords("message", self.canvas.winfo_width() // 2, self.canvas.winfo_height() // 2)
+        # Relayout once resizing settles, not for every intermediate size
+        if self._relayout_after is not None: self.after_cancel(self._relayout_after)
+        self._relayout_after = self.after(config.TREEMAP_RELAYOUT_DELAY_MS, self._request_layout)
+
+    def _request_layout(self):
+        self._relayout_after = None
+        if self._tree is None: return
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width < 2 or height < 2 or self._drawn_size == (width, height): return
+        self._layout_token.cancel()
+        token = self._layout_token = scanner.CancellationToken()
+        self._scheduler.submit(self._compute_layout, self._tree, self._index, width, height, token, cancel_token=token)
+
+    def _compute_layout(self, tree, index, width, height, token):
+        """(Layout Worker) Runs the squarified layout and posts the rectangles back."""
+        rects = treemap.layout_tree(tree, index, width, height, token)
+        self._pump.post(self._draw, token, tree, (width, height), rects, key=("treemap", id(self)))
+
+    def _draw(self, token, tree, size, rects):
+        """(Main Thread) Replaces the canvas contents with a computed layout."""
+        if token.cancelled or tree is not self._tree: return
+        self._drawn_size = size
+        canvas = self.canvas
+        canvas.delete("all")
+        self._items.clear()
+        parents = tree.parents
+        colors = config.TREEMAP_COLORS
+        top_color = {} # Top-level folder node -> color, by order of appearance (largest first)
+        for x0, y0, x1, y1, depth, node, kind in rects:
+            if kind == treemap.KIND_FOLDER:
+                top = node
+                while parents[top] != self._index and parents[top] >= 0: top = parents[top]
+                if top not in top_color: top_color[top] = colors[len(top_color) % len(colors)]
+                fill = _shade(top_color[top], depth)
+            else:
+                fill = config.TREEMAP_FILES_COLOR if kind == treemap.KIND_FILES else config.TREEMAP_OTHER_COLOR
+            item = canvas.create_rectangle(x0, y0, x1, y1, fill=fill, outline="#808080")
+            self._items[item] = (node, kind)
+            if kind == treemap.KIND_FOLDER and x1 - x0 >= config.TREEMAP_LABEL_MIN_WIDTH and y1 - y0 >= config.TREEMAP_HEADER:
+                canvas.create_text(x0 + 3, y0 + 1, text=tree.name_of(node), anchor=tk.NW, width=x1 - x0 - 6, font=("TkDefaultFont", 8), tags=("label",))
+
+    # --- Interaction ---
+    def _item_at(self, event):
+        """(node, kind) of the innermost rectangle under the pointer, or None."""
+        for item in reversed(self.canvas.find_overlapping(event.x, event.y, event.x, event.y)):
+            if item in self._items: return self._items[item]
+        return None
+
+    def _path_of(self, node):
+        if node == self._index: return self._root_path
+        relative = []
+        while node != self._index and node > 0:
+            relative.append(self._tree.name_of(node))
+            node = self._tree.parents[node]
+        return os.path.join(self._root_path, *reversed(relative))
+
+    def _show_caption(self, hit):
+        if self._tree is None: return
+        if hit is None:
+            node, kind = self._index, treemap.KIND_FOLDER
+        else:
+            node, kind = hit
+        tree = self._tree
+        if kind == treemap.KIND_FOLDER:
+            self.caption_var.set(f"{self._path_of(node)}   {utils.format_size(tree.sizes[node])}, {tree.file_counts[node]:,} files")
+        elif kind == treemap.KIND_FILES:
+            own = tree.sizes[node] - sum(tree.sizes[child] for child in tree.children(node))
+            self.caption_var.set(f"{self._path_of(node)}   files directly in this folder: {utils.format_size(own)}")
+        else:
+            self.caption_var.set(f"{self._path_of(node)}   smaller items")
+
+    def _on_motion(self, event):
+        self._show_caption(self._item_at(event))
+
+    def _on_click(self, event):
+        hit = self._item_at(event)
+        if hit is None or self.on_open_folder is None: return
+        node, kind = hit
+        # Drill into the folder clicked, or into the folder that owns a files/other block
+        if node != self._index: self.on_open_folder(self._path_of(node))
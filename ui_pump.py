@@ -0,0 +1,67 @@
+# ui_pump.py
+import threading
+import time
+import itertools
+from collections import OrderedDict
+import config # Import the configuration constants
+
+class UIUpdatePump:
+    """
+    Single channel for getting work from scan threads onto the Tk main thread.
+
+    Worker threads call post(); one periodic callback on the main thread drains the queue
+    in batches, stopping after budget_ms so a flood of results never blocks the event loop.
+    Posts that share a key are coalesced: only the latest pending (func, args) for a key is
+    applied, keeping its original place in the queue.
+    """
+    def __init__(self, root, interval_ms=None, budget_ms=None):
+        self.root = root
+        self.interval_ms = interval_ms or config.UI_PUMP_INTERVAL_MS
+        self.budget_ms = budget_ms or config.UI_PUMP_BUDGET_MS
+        self._lock = threading.Lock()
+        self._pending = OrderedDict() # key -> (func, args)
+        self._unique_keys = itertools.count()
+        self._running = False
+        self.applied_count = 0
+
+    def post(self, func, *args, key=None):
+        """(Any Thread) Queues func(*args) to run on the main thread. A non-None key replaces any pending post with the same key."""
+        with self._lock:
+            if key is None: key = ("_unique", next(self._unique_keys))
+            self._pending[key] = (func, args)
+
+    def discard(self, key):
+        """(Any Thread) Drops a pending keyed post, if any."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def start(self):
+        """(Main Thread) Starts the periodic drain loop."""
+        if not self._running:
+            self._running = True
+            self.root.after(self.interval_ms, self._pump)
+
+    def stop(self):
+        self._running = False
+
+    def _pump(self):
+        """(Main Thread) Applies queued updates until the time budget is spent, then reschedules itself."""
+        if not self._running: return
+        deadline = time.perf_counter() + self.budget_ms / 1000.0
+        while time.perf_counter() < deadline:
+            with self._lock:
+                batch = [self._pending.popitem(last=False) for _ in range(min(64, len(self._pending)))]
+            if not batch: break
+            for _key, (func, args) in batch:
+                try: func(*args)
+                except Exception as e: print(f"Error applying UI update {getattr(func, '__name__', func)}: {e}")
+            self.applied_count += len(batch)
+        try:
+            # Come back almost immediately if the budget ran out with work left over
+            self.root.after(1 if self.pending_count() else self.interval_ms, self._pump)
+        except Exception:
+            self._running = False # Root window destroyed
@@ -1,8 +1,13 @@
 # utils.py
 import os
+import stat
 import datetime
+import time
 from pathlib import Path
 import config # Import the configuration constants
+import scan_tree
+import scanner
+import scan_options
 
 def format_size(size_bytes):
     """Formats a size in bytes into a human-readable string (KB, MB, GB)."""
@@ -21,95 +26,231 @@ def format_size(size_bytes):
     formatted_size = f"{size_bytes:.2f}".rstrip('0').rstrip('.')
     return f"{formatted_size} {config.SIZE_UNITS[i]}"
 
-def get_folder_size(folder_path):
+class ScanProgress:
+    """Throttles running-total reports from a walk to at most one every 'interval' seconds."""
+    def __init__(self, callback, interval=None):
+        self.callback = callback
+        self.interval = config.SCAN_PROGRESS_INTERVAL if interval is None else interval
+        self._next_report = time.monotonic() + self.interval
+
+    def maybe_report(self, size_bytes, file_count, dir_count):
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._next_report = now + self.interval
+            self.callback(size_bytes, file_count, dir_count)
+
+def get_folder_size(folder_path, cancel_token=None, progress_callback=None, options=None, seen_links=None, largest=None):
+    """
+    Calculates the total size of a folder: a thin wrapper around scan_folder_tree, which
+    takes the same arguments, for callers that only need the total.
+    Returns size in bytes (that of the file itself if folder_path is a file) or None if the
+    top-level folder is inaccessible.
+    Raises scanner.ScanCancelled if cancel_token is cancelled during the walk.
     """
-    Calculates the total size of a folder iteratively (avoids deep recursion).
-    Returns size in bytes or None if the top-level folder is inaccessible.
-    Handles permission errors on sub-items gracefully by skipping them.
+    start_path = os.path.normpath(os.fspath(folder_path))
+    if not os.path.isdir(start_path):
+        # If it's a file, return its size. If it doesn't exist or isn't a dir, return None.
+        try:
+            start_stat = os.stat(start_path, follow_symlinks=False)
+        except OSError:
+            return None # Cannot stat the initial path
+        if not stat.S_ISREG(start_stat.st_mode): return None
+        return scan_options.FileSizer(options or scan_options.ScanOptions(), seen_links).file_bytes(start_stat)
+    tree = scan_folder_tree(start_path, cancel_token, progress_callback, options=options, seen_links=seen_links, largest=largest)
+    return None if tree is None else tree.total_size()
+
+
+def scan_folder_tree(folder_path, cancel_token=None, progress_callback=None, metrics=None, options=None, seen_links=None, largest=None):
     """
-    total_size = 0
+    Walks a folder once and returns a ScanTree with the aggregated size, file count and
+    subfolder count of every directory in its subtree, so any descendant's total can be
+    looked up later without touching the disk again.
+    Returns None if the top-level folder is inaccessible. Unreadable sub-items (permission
+    errors, entries vanishing during the walk) are skipped; symlinks are neither sized nor followed.
+    Raises scanner.ScanCancelled if cancel_token is cancelled during the walk.
+    If given, progress_callback(bytes, files, dirs) receives the running totals so far,
+    at most once every config.SCAN_PROGRESS_INTERVAL seconds.
+    If given, metrics (a scan_metrics.ScanMetrics) receives stat call and error counts,
+    per-directory timings and the final totals.
+    options (a scan_options.ScanOptions, default from config) selects apparent size or disk
+    usage and which mounts the walk may cross; in disk usage mode seen_links (an InodeSet)
+    can be shared to de-duplicate hard links across several walks. The tree records the options' key.
+    If given, largest (a largest_items.LargestItems) is offered every file as it is sized and
+    every folder's total once the walk is complete.
+
+    The loop only allocates what it keeps: entry types come from the d_type scandir reports
+    (no stat for a subdirectory), files are stat'ed relative to the open directory (see
+    scan_options.open_directory), and a path string is built for subdirectories only.
+    """
+    options = options or scan_options.ScanOptions()
+    sizer = scan_options.FileSizer(options, seen_links)
+    disk_usage = sizer.disk_usage
+    entries_seen = 0
+    stat_calls = 0
+    running_bytes = 0
+    running_files = 0
+    progress = ScanProgress(progress_callback) if progress_callback else None
     try:
-        start_path = Path(folder_path)
-        # Initial check if the starting path is actually a directory we can potentially scan
-        if not start_path.is_dir():
-             # If it's a file, return its size. If it doesn't exist or isn't a dir, return None.
-             try:
-                 if start_path.is_file(follow_symlinks=False):
-                     return start_path.stat(follow_symlinks=False).st_size
-                 else:
-                     return None # Not a file or dir we can handle initially
-             except OSError:
-                 return None # Cannot stat the initial path
-
-        stack = [start_path] # Use Path objects
-        visited = set() # Keep track of visited inodes to prevent cycles with symlinks
+        start_path = os.path.normpath(os.fspath(folder_path))
+        if not os.path.isdir(start_path):
+            return None
+        tree = scan_tree.ScanTree(start_path, options.key())
 
-        while stack:
-            current_path = stack.pop()
+        stack = [(0, start_path)] # (node index, path string)
+        visited = set() # (device, inode) of visited directories, to prevent cycles through bind mounts
+        boundary = scan_options.ScanBoundary(options, start_path)
 
+        while stack:
+            if cancel_token is not None: cancel_token.raise_if_cancelled()
+            index, current_path = stack.pop()
+            if metrics is not None: dir_started = time.perf_counter()
             try:
-                # Re-check if path exists and is a directory before proceeding (could change)
-                if not current_path.is_dir():
-                    # print(f"Debug: Path {current_path} is no longer a directory or doesn't exist.")
+                stat_calls += 1
+                fd, dir_stat = scan_options.open_directory(current_path)
+            except OSError as e:
+                # Vanished or replaced by a file since it was listed - skip this directory
+                if metrics is not None: metrics.count_error(type(e).__name__)
+                continue
+            try:
+                if not boundary.allows(current_path, dir_stat): continue # Other filesystem or pseudo filesystem
+                identity = (dir_stat.st_dev, dir_stat.st_ino)
+                if identity in visited:
                     continue
+                visited.add(identity)
+                tree.set_stat(index, dir_stat)
 
-                # Check for symlink loops using inode numbers
-                try:
-                    inode = current_path.stat(follow_symlinks=False).st_ino
-                    if inode in visited:
-                        # print(f"Warning: Symlink cycle detected or directory visited again: {current_path}")
-                        continue
-                    visited.add(inode)
-                except OSError as e:
-                    # print(f"Warning: Could not get inode for {current_path}: {e}")
-                    continue # Skip if inode check fails
-
-                # Use scandir for potentially better performance
-                with os.scandir(current_path) as it:
+                file_count = 0
+                file_bytes = sizer.directory_bytes(dir_stat) if disk_usage else 0
+                prefix = current_path if current_path.endswith(os.sep) else current_path + os.sep
+                with os.scandir(current_path if fd is None else fd) as it:
                     for entry in it:
+                        entries_seen += 1
+                        if entries_seen % scanner.CANCEL_CHECK_INTERVAL == 0:
+                            if cancel_token is not None: cancel_token.raise_if_cancelled()
+                            if progress: progress.maybe_report(running_bytes + file_bytes, running_files + file_count, len(tree) - 1)
                         try:
-                            entry_path = Path(entry.path) # Work with Path object
-                            # Important: Use follow_symlinks=False for size calculation consistency
-                            # Treat symlinks themselves as having size 0 in this context, don't follow them for size.
+                            # d_type answers both tests without a system call; symlinks (to files
+                            # or folders), sockets etc. are neither sized nor followed
                             if entry.is_file(follow_symlinks=False):
-                                total_size += entry.stat(follow_symlinks=False).st_size
+                                stat_calls += 1
+                                entry_stat = entry.stat(follow_symlinks=False)
+                                file_bytes += sizer.file_bytes(entry_stat) if disk_usage else entry_stat.st_size
+                                file_count += 1
+                                if largest is not None:
+                                    # Listed by their own size, even a hard link already counted elsewhere
+                                    item_bytes = scan_options.allocated_size(entry_stat) if disk_usage else entry_stat.st_size
+                                    if item_bytes > largest.file_threshold: largest.add_file(item_bytes, prefix + entry.name)
                             elif entry.is_dir(follow_symlinks=False):
-                                # Avoid adding symlinks pointing to directories to the stack unless explicitly desired
-                                if not entry.is_symlink():
-                                     stack.append(entry_path) # Add subdirectory Path object to the stack
-                            # else: it's a symlink (to file or dir), socket, etc. - ignore its size here.
-
+                                stack.append((tree.add_directory(index, entry.name), prefix + entry.name))
                         except OSError as e:
-                            # Skip files/dirs we can't access or that disappear during scan
-                            # print(f"Warning: Cannot access item {entry.path} during scan: {e}")
-                            continue # Continue scanning the rest of the current directory
-            except PermissionError:
-                # If we can't scan the current_path itself
-                # print(f"Warning: Permission denied accessing {current_path}.")
-                continue
-            except FileNotFoundError:
-                # If the directory disappears between popping and scanning
-                # print(f"Warning: Directory not found during scan: {current_path}")
-                continue
+                            if metrics is not None: metrics.count_error(type(e).__name__)
+                            continue
+                tree.add_files(index, file_count, file_bytes)
+                running_bytes += file_bytes
+                running_files += file_count
+                if progress: progress.maybe_report(running_bytes, running_files, len(tree) - 1)
+                if metrics is not None: metrics.note_directory_time(current_path, time.perf_counter() - dir_started)
             except OSError as e:
-                # Catch other potential OS errors during scandir or stat
-                # print(f"Warning: OS error processing {current_path}: {e}")
+                # Permission denied, vanished during the scan, etc. - skip this directory
+                if metrics is not None: metrics.count_error(type(e).__name__)
                 continue
+            finally:
+                if fd is not None: os.close(fd)
 
-        return total_size
+        tree.finalize()
+        if largest is not None: largest.add_tree_folders(tree)
+        if metrics is not None:
+            metrics.stat_calls += stat_calls
+            metrics.set_totals(tree.total_size(), tree.file_count(), tree.dir_count())
+        return tree
 
-    except PermissionError:
-        # print(f"Warning: Permission denied accessing the initial folder {folder_path}.")
-        return None # Indicate inaccessible top-level folder
-    except FileNotFoundError:
-        # print(f"Warning: Initial folder not found: {folder_path}")
-        return None # Indicate non-existent top-level folder
+    except scanner.ScanCancelled:
+        raise
+    except OSError:
+        return None # Inaccessible or non-existent top-level folder
     except Exception as e:
-        # Catch any other unexpected error during initial setup
-        # print(f"Error calculating size for {folder_path}: {e}")
+        print(f"Error scanning folder tree for {folder_path}: {e}")
         return None
 
 
+def describe_entry(entry):
+    """
+    Builds the listing record for one os.DirEntry: name, path, type, size and allocated size (files only),
+    formatted modification time and raw mtime_ns. Unreadable entries get type "Inaccessible"
+    or "Error" instead of raising.
+    """
+    info = {"name": entry.name, "path": entry.path, "is_symlink": entry.is_symlink()}
+    try:
+        stat_info = entry.stat(follow_symlinks=False)
+        is_dir = entry.is_dir(follow_symlinks=False)
+        if info["is_symlink"]: type_ = "Symbolic Link"
+        elif is_dir: type_ = "Folder"
+        else: type_ = "File"
+        size_bytes = allocated = None
+        if not is_dir and not info["is_symlink"]: size_bytes, allocated = stat_info.st_size, scan_options.allocated_size(stat_info)
+        mod_time = datetime.datetime.fromtimestamp(stat_info.st_mtime).strftime(config.DATE_FORMAT)
+        info.update({"is_dir": is_dir and not info["is_symlink"], "type": type_, "size": size_bytes, "allocated": allocated,
+                     "modified": mod_time, "mtime_ns": stat_info.st_mtime_ns})
+    except PermissionError:
+        info.update({"type": "Inaccessible", "size": None, "modified": "N/A", "is_dir": False})
+    except OSError as e:
+        print(f"Error stating {entry.path}: {e}")
+        info.update({"type": "Error", "size": None, "modified": "N/A", "is_dir": False})
+    return info
+
+
+def iter_directory_chunks(folder_path, chunk_size=None, cancel_token=None):
+    """
+    Lists a directory and yields its entries (see describe_entry) in lists of at most
+    chunk_size, so a caller can start showing rows long before a huge directory is fully read.
+    A partial chunk is also flushed once config.LISTING_FLUSH_INTERVAL seconds have passed.
+    cancel_token is checked before every entry, since each one costs a stat that may be a slow
+    round trip on a network mount. Errors opening the directory itself propagate as OSError.
+    """
+    chunk_size = chunk_size or config.LISTING_CHUNK_SIZE
+    chunk = []
+    flush_at = time.monotonic() + config.LISTING_FLUSH_INTERVAL
+    with os.scandir(folder_path) as it:
+        for entry in it:
+            if cancel_token is not None: cancel_token.raise_if_cancelled()
+            chunk.append(describe_entry(entry))
+            if len(chunk) >= chunk_size or (len(chunk) % 64 == 0 and time.monotonic() >= flush_at):
+                yield chunk
+                chunk = []
+                flush_at = time.monotonic() + config.LISTING_FLUSH_INTERVAL
+    if chunk:
+        yield chunk
+
+
+def list_subdirectories(folder_path, cancel_token=None):
+    """
+    Returns the names of the subfolders of folder_path (symbolic links excluded), sorted
+    case-insensitively. Only directory entries are read, no file is stat'ed where the platform
+    reports entry types. Errors opening the directory itself propagate as OSError.
+    """
+    names = []
+    with os.scandir(folder_path) as it:
+        for count, entry in enumerate(it, 1):
+            if cancel_token is not None and count % scanner.CANCEL_CHECK_INTERVAL == 0: cancel_token.raise_if_cancelled()
+            try:
+                if entry.is_dir(follow_symlinks=False): names.append(entry.name)
+            except OSError: continue
+    names.sort(key=str.lower)
+    return names
+
+
+def has_subdirectories(folder_path):
+    """True if folder_path contains at least one subfolder (not counting symbolic links). Stops reading at the first one; unreadable folders count as having none."""
+    try:
+        with os.scandir(folder_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False): return True
+                except OSError: continue
+    except OSError: pass
+    return False
+
+
 def get_modification_time(path):
     """Gets the last modification time of a file/folder."""
     try:
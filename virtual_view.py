@@ -0,0 +1,162 @@
+# virtual_view.py
+import tkinter as tk
+from tkinter import ttk
+import config # Import the configuration constants
+import content_model
+
+class VirtualTreeview(ttk.Frame):
+    """
+    A headings-only ttk.Treeview backed by a ContentModel that only holds Tk items for the
+    rows currently on screen, plus a small margin.
+
+    The widget owns its vertical scrollbar: scrolling (scrollbar, mouse wheel, keyboard)
+    moves a 'top' index into the model and re-materializes the visible window, so memory
+    use and scroll/sort latency do not grow with the number of entries.
+    Materialized items use the row path as their iid, so tree.focus()/selection() behave
+    as with a normal Treeview.
+    """
+    def __init__(self, parent, columns):
+        super().__init__(parent)
+        self.columns = tuple(columns)
+        self.model = content_model.ContentModel()
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", selectmode="browse")
+        self.vsb = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.vsb.grid(row=0, column=1, sticky="ns")
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self._top = 0
+        self._row_height = None
+        self._heading_height = None
+        self._materialized = set()
+        self._selected_path = None
+        self._render_pending = False
+
+        self.tree.bind("<Configure>", lambda e: self.refresh())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-config.VIRTUAL_VIEW_WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(config.VIRTUAL_VIEW_WHEEL_ROWS))
+        for key, handler in (("<Up>", lambda: self._move_selection(-1)), ("<Down>", lambda: self._move_selection(1)),
+                             ("<Prior>", lambda: self._move_selection(-self._visible_count())),
+                             ("<Next>", lambda: self._move_selection(self._visible_count())),
+                             ("<Home>", lambda: self._select_index(0)), ("<End>", lambda: self._select_index(len(self.model) - 1))):
+            self.tree.bind(key, lambda e, h=handler: (h(), "break")[1])
+
+    # --- Model access ---
+    def clear(self):
+        """Drops every row and renders the empty view immediately."""
+        self.model.clear()
+        self._top = 0
+        self._selected_path = None
+        self._render()
+
+    def append_rows(self, rows):
+        self.model.extend(rows)
+        self.refresh()
+
+    def update_row(self, path, **changes):
+        """
+        Changes attributes of the row at 'path'. Re-renders only if that row is on screen or
+        its sort key changed; repositioning is deferred to the next render, so every update
+        arriving in the same UI tick is applied in one pass.
+        """
+        row = self.model.get(path)
+        if row is None: return False
+        self.model.update(row, **changes)
+        if path in self._materialized or self.model.has_pending_moves(): self.refresh()
+        return True
+
+    def exists(self, path):
+        return path in self.model
+
+    def selected_path(self):
+        return self._selected_path
+
+    # --- Rendering ---
+    def refresh(self):
+        """Schedules one re-render of the visible window on the next idle moment."""
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _visible_count(self):
+        row_height = self._row_height or 20
+        heading_height = self._heading_height if self._heading_height is not None else 24
+        return max(1, (self.tree.winfo_height() - heading_height) // row_height)
+
+    def _render(self):
+        """Replaces the materialized items with the rows of the current window."""
+        self._render_pending = False
+        try:
+            if not self.tree.winfo_exists(): return
+            self.model.flush() # Move rows whose sort key changed since the last render
+            total = len(self.model)
+            visible = self._visible_count()
+            self._top = max(0, min(self._top, total - visible))
+            window = self.model.rows[self._top:self._top + visible + config.VIRTUAL_VIEW_MARGIN_ROWS]
+
+            existing = self.tree.get_children('')
+            if existing: self.tree.delete(*existing)
+            for row in window:
+                self.tree.insert("", tk.END, iid=row.path, text=row.name, values=row.values_for(self.columns), tags=row.tags)
+            self._materialized = {row.path for row in window}
+            self.tree.yview_moveto(0) # The window itself never scrolls; 'top' does
+
+            if self._selected_path in self._materialized:
+                self.tree.selection_set(self._selected_path)
+                self.tree.focus(self._selected_path)
+
+            if window and self._row_height is None:
+                bbox = self.tree.bbox(window[0].path)
+                if bbox:
+                    self._heading_height, self._row_height = bbox[1], max(1, bbox[3])
+                    if self._visible_count() != visible: self.refresh() # Estimate was off; fill the window properly
+
+            if total: self.vsb.set(self._top / total, min(1.0, (self._top + visible) / total))
+            else: self.vsb.set(0.0, 1.0)
+        except tk.TclError as e: print(f"Error rendering content view: {e}")
+
+    # --- Scrolling & Selection ---
+    def scroll_by(self, rows):
+        self._top += rows
+        self.refresh()
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        total = len(self.model)
+        if not total: return
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self._top += step * self._visible_count() if args[2] == "pages" else step
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        # Windows reports multiples of 120 per notch; macOS reports small raw deltas
+        if abs(event.delta) >= 120: rows = -int(event.delta / 120) * config.VIRTUAL_VIEW_WHEEL_ROWS
+        else: rows = -event.delta
+        return self.scroll_by(rows)
+
+    def _on_select(self, event=None):
+        selection = self.tree.selection()
+        if selection: self._selected_path = selection[0]
+
+    def _move_selection(self, delta):
+        self.model.flush()
+        position = self.model.position(self._selected_path) if self._selected_path else None
+        self._select_index((position if position is not None else -1) + delta)
+
+    def _select_index(self, index):
+        """Selects the row at display position 'index' and scrolls it into view."""
+        total = len(self.model)
+        if not total: return
+        index = max(0, min(index, total - 1))
+        self._selected_path = self.model.rows[index].path
+        visible = self._visible_count()
+        if index < self._top: self._top = index
+        elif index >= self._top + visible: self._top = index - visible + 1
+        self._render()
+        self.tree.event_generate("<<TreeviewSelect>>")